@@ -37,6 +37,10 @@ check_authentication = getattr(auth_module, "check_authentication", None)
 logout = auth_module.logout
 load_session = getattr(auth_module, "load_session", None)
 
+# O contexto vem do mesmo módulo importado pelas páginas (app.utils.database)
+from app.utils.database import ContextoDados
+from app.utils.assets import src_imagem
+
 # Configuração da página
 st.set_page_config(
     page_title="Coleta Seletiva Conectada - Itajubá",
@@ -80,15 +84,9 @@ def main():
             logo_path = os.path.join(base_dir, "app", "assets", "logo.jpg")
             
             if os.path.exists(logo_path):
-                # Função para converter imagem para base64
-                def get_base64_image(image_path):
-                    import base64
-                    with open(image_path, "rb") as img_file:
-                        return base64.b64encode(img_file.read()).decode('utf-8')
-                
-                # Exibe a imagem JPG como base64
+                # Exibe a imagem JPG pela URL publicada (nome com o hash do conteúdo, cache no navegador)
                 st.markdown(f"""<div style="text-align: center; margin-bottom: 1.5rem;">
-                            <img src="data:image/jpeg;base64,{get_base64_image(logo_path)}" 
+                            <img src="{src_imagem(logo_path)}" 
                                  style="max-width: 100px; height: auto; border-radius: 6px; box-shadow: 0 2px 8px rgba(0, 0, 0, 0.08);">
                             </div>""", unsafe_allow_html=True)
             else:
@@ -112,17 +110,29 @@ def main():
             user_name = st.session_state.user_data.get('nome', 'Usuário') if st.session_state.user_data else 'Usuário'
             st.success(f"{icon} Olá, {user_name}!")
         
-        # Renderiza a página de acordo com o tipo de usuário
-        if st.session_state.user_type == "morador":
-            render_morador_page(st.session_state.user_data)
-        elif st.session_state.user_type == "catador":
-            render_catador_page(st.session_state.user_data)
-        elif st.session_state.user_type == "admin":
-            render_admin_page(st.session_state.user_data)
-        else:
-            st.error("Tipo de usuário não reconhecido!")
-            logout()
-            st.rerun()
+        # Falha na gravação das alterações da execução anterior
+        if 'erro_gravacao' in st.session_state:
+            st.error(f"Não foi possível salvar as últimas alterações: {st.session_state.pop('erro_gravacao')}")
+        
+        # Renderiza a página de acordo com o tipo de usuário, com um contexto de dados
+        # por execução: cada tabela é lida uma vez e as alterações são gravadas ao final
+        contexto = ContextoDados()
+        try:
+            with contexto:
+                if st.session_state.user_type == "morador":
+                    render_morador_page(st.session_state.user_data, contexto)
+                elif st.session_state.user_type == "catador":
+                    render_catador_page(st.session_state.user_data, contexto)
+                elif st.session_state.user_type == "admin":
+                    render_admin_page(st.session_state.user_data, contexto)
+                else:
+                    st.error("Tipo de usuário não reconhecido!")
+                    logout()
+                    st.rerun()
+        finally:
+            # st.rerun() interrompe a execução: o erro é mostrado na próxima
+            if contexto.resultado is not None and not contexto.resultado[0]:
+                st.session_state.erro_gravacao = contexto.resultado[1]
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,66 @@
+"""
+Script de arquivamento das coletas encerradas
+
+Move as coletas concluídas e recusadas mais antigas que o limite para
+partições mensais compactadas em app/data/arquivo_coletas/, deixando em
+coletas.csv apenas o trabalho aberto e recente. O histórico dos usuários e os
+indicadores do administrador continuam incluindo as coletas arquivadas.
+
+Uso:
+    python app/arquivar_coletas.py                # arquiva com o limite padrão
+    python app/arquivar_coletas.py --dias 90      # arquiva coletas com mais de 90 dias
+    python app/arquivar_coletas.py --dry-run      # apenas mostra o que seria arquivado
+"""
+
+import os
+import sys
+import argparse
+
+# Ajustar o path para encontrar os módulos do aplicativo
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+# Importar funções do database
+from app.utils.database import (
+    ARQUIVAMENTO_DIAS, STATUS_ARQUIVAVEIS, STORAGE_BACKEND, arquivar_coletas,
+    listar_particoes_arquivo, load_coletas, _usar_sqlite
+)
+
+def executar_arquivamento(dias, dry_run=False):
+    """Arquiva as coletas encerradas e mostra o resumo das partições"""
+    print(f"Backend: {STORAGE_BACKEND}")
+    if _usar_sqlite():
+        print("O arquivamento se aplica apenas ao backend CSV (o SQLite já consulta por índices)")
+        return
+
+    print(f"Coletas ativas: {len(load_coletas())}")
+    print(f"Arquivando coletas {', '.join(STATUS_ARQUIVAVEIS)} com mais de {dias} dias")
+
+    resumo = arquivar_coletas(dias=dias, simular=dry_run)
+    if not resumo:
+        print("Nenhuma coleta para arquivar")
+        return
+
+    for periodo, quantidade in resumo.items():
+        print(f"  {periodo}: {quantidade} coletas")
+    print(f"Total: {sum(resumo.values())} coletas")
+
+    if dry_run:
+        print("Modo de simulação: nenhuma alteração gravada")
+        return
+
+    print(f"Coletas ativas após o arquivamento: {len(load_coletas())}")
+    print("Partições do arquivo:")
+    for periodo, particao in listar_particoes_arquivo().items():
+        print(f"  {periodo}: {particao['coletas']} coletas")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arquiva as coletas concluídas e recusadas antigas")
+    parser.add_argument('--dias', type=int, default=ARQUIVAMENTO_DIAS,
+                        help=f"idade mínima em dias (padrão: {ARQUIVAMENTO_DIAS})")
+    parser.add_argument('--dry-run', action='store_true', help="apenas mostra o que seria arquivado")
+    args = parser.parse_args()
+
+    print("="*50)
+    print("ARQUIVAMENTO DE COLETAS")
+    print("="*50)
+    executar_arquivamento(args.dias, dry_run=args.dry_run)
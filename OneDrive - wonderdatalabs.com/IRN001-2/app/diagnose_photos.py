@@ -1,89 +1,343 @@
 """
-Script de diagnóstico para identificar problemas com fotos de perfil
+Script de diagnóstico e reparo das fotos de perfil
+
+Verifica em paralelo (pool de threads) a foto referenciada por cada usuário:
+se o arquivo existe, se a imagem pode ser lida e se o manifesto e as
+miniaturas correspondem a ela. Também lista os arquivos órfãos em
+uploads/fotos_perfil (fotos e miniaturas que nenhum usuário referencia).
+
+Com --reparar, as miniaturas ausentes são geradas novamente, os caminhos
+foto_perfil incorretos são corrigidos no cadastro com uma única gravação e o
+manifesto é regravado de uma vez. O relatório pode ser gravado em JSON, com os
+tempos de cada etapa.
+
+Uso:
+    python app/diagnose_photos.py                          # apenas verifica
+    python app/diagnose_photos.py --reparar                # verifica e repara
+    python app/diagnose_photos.py --reparar --remover-orfaos
+    python app/diagnose_photos.py --json relatorio.json    # relatório em JSON ('-' para a saída padrão)
 """
 
 import os
-import pandas as pd
 import sys
+import glob
+import json
+import time
+import argparse
+import contextlib
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
 from PIL import Image
 
 # Ajustar o path para encontrar os módulos do aplicativo
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
-# Importar funções do database
-from app.utils.database import BASE_DIR, USERS_FILE, load_users
-
-def diagnose_profile_photos():
-    """Diagnostica problemas com fotos de perfil"""
-    print(f"BASE_DIR: {BASE_DIR}")
-    print(f"USERS_FILE: {USERS_FILE}")
-    
-    # Verificar diretório de uploads
-    uploads_dir = os.path.join(BASE_DIR, 'uploads')
-    print(f"Diretório de uploads: {uploads_dir}")
-    print(f"Diretório existe: {os.path.exists(uploads_dir)}")
-    
-    if not os.path.exists(uploads_dir):
-        os.makedirs(uploads_dir)
-        print("Diretório de uploads criado")
-    
-    # Verificar diretório de fotos de perfil
-    fotos_perfil_dir = os.path.join(uploads_dir, 'fotos_perfil')
-    print(f"Diretório de fotos de perfil: {fotos_perfil_dir}")
-    print(f"Diretório existe: {os.path.exists(fotos_perfil_dir)}")
-    
-    if not os.path.exists(fotos_perfil_dir):
-        os.makedirs(fotos_perfil_dir)
-        print("Diretório de fotos de perfil criado")
-    
-    # Listar arquivos no diretório de fotos de perfil
-    if os.path.exists(fotos_perfil_dir):
-        fotos = os.listdir(fotos_perfil_dir)
-        print(f"Fotos no diretório: {fotos}")
-    
-    # Verificar arquivo de usuários
-    print(f"Arquivo de usuários existe: {os.path.exists(USERS_FILE)}")
-    
-    # Carregar usuários
-    try:
-        users_df = load_users()
-        print(f"Usuários carregados: {len(users_df)} registros")
-        
-        # Verificar campo foto_perfil
-        if 'foto_perfil' in users_df.columns:
-            print("Campo foto_perfil encontrado na tabela de usuários")
-            
-            # Verificar usuários com foto de perfil
-            users_with_photo = users_df[users_df['foto_perfil'].notna() & (users_df['foto_perfil'] != '')]
-            print(f"Usuários com foto de perfil: {len(users_with_photo)}")
-            
-            # Detalhes de cada usuário com foto
-            for idx, user in users_with_photo.iterrows():
-                foto_perfil = user['foto_perfil']
-                user_id = user['id']
-                print(f"\nUsuário {user_id} ({user['nome']}):")
-                print(f"Caminho da foto: {foto_perfil}")
-                
-                # Verificar se o arquivo existe
-                full_path = os.path.join(BASE_DIR, foto_perfil.replace('\\', '/'))
-                print(f"Caminho completo: {full_path}")
-                print(f"Arquivo existe: {os.path.exists(full_path)}")
-                
-                # Tentar abrir a imagem
-                try:
-                    if os.path.exists(full_path):
-                        img = Image.open(full_path)
-                        print(f"Imagem carregada com sucesso: {img.format}, {img.size}")
-                except Exception as e:
-                    print(f"Erro ao carregar imagem: {str(e)}")
-        else:
-            print("Campo foto_perfil NÃO encontrado na tabela de usuários")
-    
-    except Exception as e:
-        print(f"Erro ao carregar usuários: {str(e)}")
+# Importar funções do database e do módulo de fotos
+from app.utils.database import USERS_FILE, load_users, update_many
+from app.utils.assets import hash_conteudo
+from app.utils.fotos import (
+    BASE_DIR, FOTOS_PERFIL_DIR, MINIATURAS_DIR, MANIFESTO_FILE, TAMANHOS_MINIATURA,
+    caminho_foto, carregar_manifesto, miniatura_path,
+    caminho_relativo, descrever_foto, regravar_manifesto
+)
+
+# Threads usadas na verificação das fotos
+DIAGNOSTICO_WORKERS = int(os.environ.get('COLETA_DIAGNOSTICO_WORKERS', 8))
+
+
+def _inspecionar_imagem(path):
+    """
+    Confere a integridade de uma imagem e retorna o formato e as dimensões.
+
+    Args:
+        path (str): Caminho da imagem
+
+    Returns:
+        tuple: (formato, largura, altura)
+
+    Raises:
+        Exception: Se o arquivo não for uma imagem válida
+    """
+    with Image.open(path) as imagem:
+        imagem.verify()
+    # Depois de verify() a imagem precisa ser aberta de novo
+    with Image.open(path) as imagem:
+        return imagem.format, imagem.size[0], imagem.size[1]
+
+
+def _candidatos(user_id, path, entrada):
+    """
+    Retorna os caminhos onde a foto de um usuário pode estar, em ordem de
+    preferência: o caminho do cadastro, o do manifesto e os nomes antigos
+    (user_{id}_foto_perfil.ext).
+    """
+    candidatos = []
+    if path is not None:
+        candidatos.append(path)
+    if entrada is not None:
+        candidatos.append(os.path.join(BASE_DIR, entrada['path']))
+    candidatos.extend(sorted(glob.glob(os.path.join(FOTOS_PERFIL_DIR, f'user_{user_id}_foto_perfil.*'))))
+    unicos = {}
+    for candidato in candidatos:
+        unicos.setdefault(os.path.normpath(candidato), candidato)
+    return list(unicos.values())
+
+
+def verificar_foto(user_id, foto_perfil, entrada):
+    """
+    Verifica a foto de um usuário (executada nas threads do pool).
+
+    Args:
+        user_id (int): ID do usuário
+        foto_perfil (str): Valor da coluna foto_perfil
+        entrada (dict): Entrada do manifesto do usuário (ou None)
+
+    Returns:
+        dict: Resultado da verificação; 'correcao' traz o novo valor de
+        foto_perfil quando o cadastro precisa ser corrigido ('' remove a referência)
+    """
+    inicio = time.perf_counter()
+    referencia = foto_perfil if isinstance(foto_perfil, str) and foto_perfil.strip() else None
+    resultado = {
+        'user_id': user_id,
+        'foto_perfil': referencia,
+        'status': 'sem_foto',
+        'path': None,
+        'erro': None,
+        'correcao': None,
+    }
+    path = caminho_foto(referencia)
+    candidatos = _candidatos(user_id, path, entrada)
+    if path is None and not candidatos:
+        resultado['ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+        return resultado
+
+    resultado['status'] = 'ausente'
+    for candidato in candidatos:
+        if not os.path.isfile(candidato):
+            continue
+        try:
+            formato, largura, altura = _inspecionar_imagem(candidato)
+        except Exception as e:
+            resultado['status'] = 'corrompida'
+            resultado['erro'] = str(e)
+            continue
+        hash_foto = hash_conteudo(candidato)
+        miniaturas_ok = all(os.path.isfile(miniatura_path(hash_foto, t)) for t in TAMANHOS_MINIATURA)
+        resultado.update({
+            'status': 'ok',
+            'path': caminho_relativo(candidato),
+            'erro': None,
+            'formato': formato,
+            'largura': largura,
+            'altura': altura,
+            'bytes': os.path.getsize(candidato),
+            'hash': hash_foto,
+            'manifesto_ok': entrada is not None and entrada['path'] == caminho_relativo(candidato) and entrada['hash'] == hash_foto,
+            'miniaturas_ok': miniaturas_ok,
+        })
+        break
+
+    if resultado['status'] == 'ok':
+        if resultado['path'] != referencia:
+            resultado['correcao'] = resultado['path']
+    elif referencia is not None:
+        # Nenhuma imagem válida: a referência é removida do cadastro
+        resultado['correcao'] = ''
+    resultado['ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+    return resultado
+
+
+def listar_orfaos(validos):
+    """
+    Lista as fotos e miniaturas em uploads/fotos_perfil que nenhum usuário referencia.
+
+    Args:
+        validos (list): Resultados de verificação com status 'ok'
+
+    Returns:
+        list: Caminhos relativos dos arquivos órfãos
+    """
+    fotos_usadas = {os.path.normpath(os.path.join(BASE_DIR, r['path'])) for r in validos}
+    miniaturas_usadas = {
+        os.path.normpath(miniatura_path(r['hash'], tamanho))
+        for r in validos for tamanho in TAMANHOS_MINIATURA
+    }
+    orfaos = []
+    for diretorio, usados in ((FOTOS_PERFIL_DIR, fotos_usadas), (MINIATURAS_DIR, miniaturas_usadas)):
+        if not os.path.isdir(diretorio):
+            continue
+        for nome in sorted(os.listdir(diretorio)):
+            path = os.path.join(diretorio, nome)
+            if not os.path.isfile(path) or nome.startswith(os.path.basename(MANIFESTO_FILE)):
+                continue
+            if os.path.normpath(path) not in usados:
+                orfaos.append(caminho_relativo(path))
+    return orfaos
+
+
+def diagnose_profile_photos(workers=DIAGNOSTICO_WORKERS, reparar=False, remover_orfaos=False):
+    """
+    Diagnostica (e opcionalmente repara) as fotos de perfil.
+
+    Args:
+        workers (int, optional): Threads do pool de verificação. Default é DIAGNOSTICO_WORKERS.
+        reparar (bool, optional): Regenera miniaturas, corrige o cadastro e
+            regrava o manifesto. Default é False.
+        remover_orfaos (bool, optional): Remove os arquivos órfãos. Default é False.
+
+    Returns:
+        dict: Relatório do diagnóstico (serializável em JSON)
+    """
+    tempos = {}
+    inicio_total = time.perf_counter()
+
+    inicio = time.perf_counter()
+    users_df = load_users()
+    manifesto = carregar_manifesto() if os.path.exists(MANIFESTO_FILE) else {}
+    ids = [int(user_id) for user_id in users_df['id']]
+    if 'foto_perfil' in users_df.columns:
+        referencias = users_df['foto_perfil'].tolist()
+    else:
+        referencias = [None] * len(ids)
+    tempos['carregar'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        resultados = list(pool.map(
+            verificar_foto, ids, referencias, [manifesto.get(str(user_id)) for user_id in ids]
+        ))
+    tempos['verificar'] = time.perf_counter() - inicio
+
+    validos = [r for r in resultados if r['status'] == 'ok']
+    correcoes = {r['user_id']: {'foto_perfil': r['correcao']} for r in resultados if r['correcao'] is not None}
+    pendentes = [r for r in validos if not (r['manifesto_ok'] and r['miniaturas_ok'])]
+    manifesto_divergente = pendentes or set(manifesto) != {str(r['user_id']) for r in validos}
+    miniaturas_regeneradas = 0
+
+    if reparar:
+        inicio = time.perf_counter()
+        # Miniaturas e entradas do manifesto geradas em paralelo
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            entradas = list(pool.map(
+                lambda r: descrever_foto(os.path.join(BASE_DIR, r['path']), r['hash']), pendentes
+            ))
+        miniaturas_regeneradas = sum(1 for r, e in zip(pendentes, entradas) if e is not None and not r['miniaturas_ok'])
+        tempos['miniaturas'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        if correcoes:
+            # Todas as correções do cadastro em uma única gravação
+            sucesso, mensagem = update_many({'usuarios': correcoes})
+            if not sucesso:
+                raise RuntimeError(mensagem)
+        if manifesto_divergente:
+            novas = {str(r['user_id']): e for r, e in zip(pendentes, entradas) if e is not None}
+            fotos = {
+                str(r['user_id']): novas.get(str(r['user_id']), manifesto.get(str(r['user_id'])))
+                for r in validos
+            }
+            regravar_manifesto({chave: entrada for chave, entrada in fotos.items() if entrada is not None})
+        tempos['gravar'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    orfaos = listar_orfaos(validos)
+    removidos = []
+    if remover_orfaos:
+        for relativo in orfaos:
+            try:
+                os.remove(os.path.join(BASE_DIR, relativo))
+                removidos.append(relativo)
+            except OSError as e:
+                print(f"Aviso: Não foi possível remover {relativo}: {e}")
+    tempos['orfaos'] = time.perf_counter() - inicio
+    tempos['total'] = time.perf_counter() - inicio_total
+
+    resumo = {'usuarios': len(resultados)}
+    for r in resultados:
+        resumo[r['status']] = resumo.get(r['status'], 0) + 1
+    resumo.update({
+        'manifesto_desatualizado': sum(1 for r in validos if not r['manifesto_ok']),
+        'miniaturas_ausentes': sum(1 for r in validos if not r['miniaturas_ok']),
+        'caminhos_a_corrigir': len(correcoes),
+        'orfaos': len(orfaos),
+        'bytes_orfaos': sum(os.path.getsize(os.path.join(BASE_DIR, o)) for o in orfaos if o not in removidos),
+    })
+
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'base_dir': BASE_DIR,
+        'users_file': USERS_FILE,
+        'workers': workers,
+        'reparado': reparar,
+        'tempos_s': {etapa: round(segundos, 4) for etapa, segundos in tempos.items()},
+        'resumo': resumo,
+        'reparos': {
+            'caminhos_corrigidos': len(correcoes) if reparar else 0,
+            'miniaturas_regeneradas': miniaturas_regeneradas,
+            'manifesto_regravado': bool(reparar and manifesto_divergente),
+            'orfaos_removidos': removidos,
+        },
+        'fotos': resultados,
+        'orfaos': orfaos,
+    }
+
+
+def imprimir_resumo(relatorio):
+    """Mostra o resumo do relatório no terminal"""
+    print(f"BASE_DIR: {relatorio['base_dir']}")
+    print(f"USERS_FILE: {relatorio['users_file']}")
+    print(f"Threads: {relatorio['workers']}")
+    for chave, valor in relatorio['resumo'].items():
+        print(f"  {chave}: {valor}")
+
+    for r in relatorio['fotos']:
+        if r['status'] in ('ausente', 'corrompida'):
+            print(f"Usuário {r['user_id']}: foto {r['status']} ({r['foto_perfil']}){' - ' + r['erro'] if r['erro'] else ''}")
+        elif r['correcao'] is not None:
+            print(f"Usuário {r['user_id']}: caminho {r['foto_perfil']} -> {r['correcao']}")
+    for orfao in relatorio['orfaos']:
+        print(f"Órfão: {orfao}")
+
+    reparos = relatorio['reparos']
+    if relatorio['reparado']:
+        print(f"Caminhos corrigidos: {reparos['caminhos_corrigidos']}")
+        print(f"Miniaturas geradas novamente: {reparos['miniaturas_regeneradas']}")
+        print(f"Manifesto regravado: {'sim' if reparos['manifesto_regravado'] else 'não'}")
+    else:
+        print("Modo de verificação: nenhuma alteração gravada (use --reparar)")
+    if reparos['orfaos_removidos']:
+        print(f"Órfãos removidos: {len(reparos['orfaos_removidos'])}")
+    print("Tempos (s): " + ", ".join(f"{etapa} {segundos}" for etapa, segundos in relatorio['tempos_s'].items()))
+
 
 if __name__ == "__main__":
-    print("="*50)
-    print("DIAGNÓSTICO DE FOTOS DE PERFIL")
-    print("="*50)
-    diagnose_profile_photos()
+    parser = argparse.ArgumentParser(description="Verifica e repara as fotos de perfil")
+    parser.add_argument('--workers', type=int, default=DIAGNOSTICO_WORKERS,
+                        help=f"threads da verificação (padrão: {DIAGNOSTICO_WORKERS})")
+    parser.add_argument('--reparar', action='store_true',
+                        help="regenera miniaturas, corrige caminhos e regrava o manifesto")
+    parser.add_argument('--remover-orfaos', action='store_true',
+                        help="remove fotos e miniaturas que nenhum usuário referencia")
+    parser.add_argument('--json', metavar='ARQUIVO',
+                        help="grava o relatório em JSON ('-' para a saída padrão)")
+    args = parser.parse_args()
+
+    # Com o JSON na saída padrão, as mensagens vão para a saída de erro
+    saida = contextlib.redirect_stdout(sys.stderr) if args.json == '-' else contextlib.nullcontext()
+    with saida:
+        print("="*50)
+        print("DIAGNÓSTICO DE FOTOS DE PERFIL")
+        print("="*50)
+        relatorio = diagnose_profile_photos(args.workers, reparar=args.reparar,
+                                            remover_orfaos=args.remover_orfaos)
+        imprimir_resumo(relatorio)
+
+    if args.json == '-':
+        json.dump(relatorio, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"Relatório gravado em {args.json}")
@@ -0,0 +1,98 @@
+"""
+Script de migração da tabela de coletas para o conjunto canônico de colunas
+
+Unifica as colunas equivalentes (data/data_coleta, hora/horario_coleta,
+tipo_material/tipos_materiais/materiais, endereco/endereco_coleta) e converte o
+texto livre de quantidade_estimada ("5kg") para o peso numérico em peso_kg.
+
+Uso:
+    python app/migrate_coletas.py             # migra (com cópia de segurança do CSV)
+    python app/migrate_coletas.py --dry-run   # apenas mostra o que seria alterado
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import pandas as pd
+from datetime import datetime
+
+# Ajustar o path para encontrar os módulos do aplicativo
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+# Importar funções do database
+from app.utils.database import (
+    COLETAS_FILE, STORAGE_BACKEND, compactar_tabela, save_coletas, _usar_sqlite
+)
+from app.utils import sqlite_backend
+from app.utils.schema import (
+    COLUNAS_EQUIVALENTES, COLUNA_PESO, COLUNA_PESO_TEXTO, aplicar_esquema, extrair_peso
+)
+
+def carregar_coletas_originais():
+    """Carrega as coletas sem a normalização do esquema (colunas como estão gravadas)"""
+    if _usar_sqlite():
+        return sqlite_backend.load_table('coletas')
+
+    # Incorporar as linhas anexadas antes de ler o CSV principal
+    compactar_tabela(COLETAS_FILE)
+    return pd.read_csv(COLETAS_FILE)
+
+def diagnosticar(coletas_df):
+    """Mostra as colunas antigas encontradas e os pesos que serão convertidos"""
+    print(f"Coletas: {len(coletas_df)} registros")
+    print(f"Colunas atuais: {list(coletas_df.columns)}")
+
+    for canonica, antigas in COLUNAS_EQUIVALENTES['coletas'].items():
+        for antiga in antigas:
+            if antiga in coletas_df.columns:
+                preenchidas = int(coletas_df[antiga].notna().sum())
+                print(f"  {antiga} -> {canonica}: {preenchidas} valores")
+
+    if COLUNA_PESO_TEXTO in coletas_df.columns:
+        texto = coletas_df[COLUNA_PESO_TEXTO]
+        convertidos = extrair_peso(texto)
+        sem_peso = coletas_df[COLUNA_PESO].isna() if COLUNA_PESO in coletas_df.columns else pd.Series(True, index=coletas_df.index)
+        print(f"  {COLUNA_PESO_TEXTO}: {int(texto.notna().sum())} valores, "
+              f"{int(convertidos.notna().sum())} com peso reconhecido, "
+              f"{int((sem_peso & convertidos.notna()).sum())} completam {COLUNA_PESO}")
+        nao_reconhecidos = texto[texto.notna() & convertidos.isna()].unique()
+        if len(nao_reconhecidos) > 0:
+            print(f"  Valores sem peso reconhecido: {list(nao_reconhecidos)[:10]}")
+
+def migrar_coletas(dry_run=False):
+    """Reescreve a tabela de coletas com as colunas canônicas"""
+    print(f"Backend: {STORAGE_BACKEND}")
+    coletas_df = carregar_coletas_originais()
+    diagnosticar(coletas_df)
+
+    migradas_df = aplicar_esquema(coletas_df, 'coletas')
+    removidas = [c for c in coletas_df.columns if c not in migradas_df.columns]
+    if not removidas and list(migradas_df.columns) == list(coletas_df.columns):
+        print("Tabela de coletas já está no formato canônico")
+        return
+
+    print(f"Colunas removidas: {removidas}")
+    print(f"Colunas após a migração: {list(migradas_df.columns)}")
+
+    if dry_run:
+        print("Modo de simulação: nenhuma alteração gravada")
+        return
+
+    if not _usar_sqlite():
+        backup = f"{COLETAS_FILE}.{datetime.now().strftime('%Y%m%d%H%M%S')}.bak"
+        shutil.copy2(COLETAS_FILE, backup)
+        print(f"Cópia de segurança: {backup}")
+
+    save_coletas(migradas_df)
+    print("Migração concluída")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra a tabela de coletas para as colunas canônicas")
+    parser.add_argument('--dry-run', action='store_true', help="apenas mostra o que seria alterado")
+    args = parser.parse_args()
+
+    print("="*50)
+    print("MIGRAÇÃO DA TABELA DE COLETAS")
+    print("="*50)
+    migrar_coletas(dry_run=args.dry_run)
@@ -26,11 +26,25 @@ except ImportError:
 import hashlib
 
 from app.utils.database import (
-    load_users, load_coletas, save_user, update_user, delete_user,
+    load_users, save_user, update_user, delete_user,
     load_conteudo_educativo, save_conteudo_educativo,
-    add_artigo, add_dica, save_notificacao, save_profile_photo
+    add_artigo, add_dica, save_notificacao, save_profile_photo, load_snapshot,
+    get_indicadores, get_indicadores_por_grupo, memorizar_por_versao, ContextoDados
 )
 from app.utils.auth import register_user
+from app.utils.fotos import foto_perfil_src
+
+@memorizar_por_versao('usuarios')
+def contar_usuarios_por_tipo():
+    """
+    Conta os usuários por tipo, recalculando só quando a tabela de usuários muda.
+    
+    Returns:
+        tuple: (total de usuários, Series com a quantidade por tipo)
+    """
+    # Carrega apenas a coluna usada nos indicadores (snapshot colunar)
+    users = load_snapshot('usuarios', ['tipo'])
+    return len(users), users['tipo'].value_counts()
 
 class AdminPage:
     """
@@ -38,14 +52,16 @@ class AdminPage:
     Implementa a separação entre lógica e layout.
     """
     
-    def __init__(self, user_data):
+    def __init__(self, user_data, contexto=None):
         """
         Inicializa a página do administrador
         
         Args:
             user_data (dict): Dados do usuário administrador logado
+            contexto (ContextoDados, optional): Contexto de dados da execução atual
         """
         self.user_data = user_data
+        self.contexto = contexto
         self.load_css()
         
     def load_css(self):
@@ -107,17 +123,18 @@ class AdminPage:
         """Exibe o dashboard principal com estatísticas e informações gerais"""
         st.header("Dashboard")
         
-        # Carrega dados necessários
-        users = load_users()
-        coletas = load_coletas()
+        # Contagem de usuários memorizada pela versão dos dados; datas das coletas do snapshot colunar
+        total_users, tipo_counts = contar_usuarios_por_tipo()
+        coletas = load_snapshot('coletas', ['data_solicitacao'])
+        
+        # Contadores de coletas mantidos a cada gravação (sem varrer a tabela)
+        indicadores = get_indicadores()
+        contagem_status = pd.Series(indicadores['status'], dtype='int64').sort_values(ascending=False)
         
         # Estatísticas principais
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            # Uso de value_counts() para contagem mais eficiente
-            tipo_counts = users['tipo'].value_counts()
-            total_users = len(users)
             moradores = tipo_counts.get('morador', 0)
             catadores = tipo_counts.get('catador', 0)
             admins = tipo_counts.get('admin', 0)
@@ -151,11 +168,11 @@ class AdminPage:
             """, unsafe_allow_html=True)
         
         with col2:
-            total_coletas = len(coletas)
+            total_coletas = indicadores['total']
             
-            # Uso de value_counts() para contagem mais eficiente e tratamento de NaN
-            if not coletas.empty and 'status' in coletas.columns:
-                status_counts = coletas['status'].value_counts()
+            # Contagem por status lida dos indicadores
+            if total_coletas > 0:
+                status_counts = contagem_status
                 agendadas = status_counts.get('agendada', 0)
                 em_andamento = status_counts.get('em_andamento', 0) + status_counts.get('pendente', 0)  # Considerar pendente também
                 concluidas = status_counts.get('realizada', 0) + status_counts.get('concluida', 0)  # Considerar os dois termos
@@ -198,10 +215,9 @@ class AdminPage:
             
             try:
                 if not coletas.empty and 'data_solicitacao' in coletas.columns:
-                    # Converter para datetime com tratamento de erros
-                    coletas['data_solicitacao_dt'] = pd.to_datetime(coletas['data_solicitacao'], errors='coerce')
+                    # data_solicitacao já é datetime64 (esquema da tabela)
                     data_limite = pd.Timestamp(datetime.now() - timedelta(days=7))
-                    coletas_ultimos_7_dias = len(coletas[coletas['data_solicitacao_dt'] > data_limite])
+                    coletas_ultimos_7_dias = int((coletas['data_solicitacao'] > data_limite).sum())
             except Exception as e:
                 st.warning(f"Erro ao calcular coletas recentes: {e}")
                 
@@ -237,17 +253,17 @@ class AdminPage:
         
         with col1:
             # Gráfico de status das coletas com tratamento para dados vazios
-            if not coletas.empty and 'status' in coletas.columns:
+            if total_coletas > 0:
                 try:
                     # Verificar se o módulo plotly está disponível
                     if not PLOTLY_AVAILABLE or px is None:
                         st.info("Gráficos não disponíveis. Biblioteca Plotly não instalada.")
                         # Mostrar dados em tabela como alternativa
-                        status_counts = coletas['status'].value_counts().reset_index()
+                        status_counts = contagem_status.reset_index()
                         status_counts.columns = ['Status', 'Quantidade']
                         st.dataframe(status_counts, use_container_width=True)
                     else:
-                        status_counts = coletas['status'].value_counts().reset_index()
+                        status_counts = contagem_status.reset_index()
                         status_counts.columns = ['Status', 'Quantidade']
                         
                         # Usar cores padrão se houver problemas com o esquema de cores
@@ -282,11 +298,11 @@ class AdminPage:
                 if not PLOTLY_AVAILABLE or px is None:
                     st.info("Gráficos não disponíveis. Biblioteca Plotly não instalada.")
                     # Mostrar dados em tabela como alternativa
-                    user_types = users['tipo'].value_counts().reset_index()
+                    user_types = tipo_counts.reset_index()
                     user_types.columns = ['Tipo', 'Quantidade']
                     st.dataframe(user_types, use_container_width=True)
                 else:
-                    user_types = users['tipo'].value_counts().reset_index()
+                    user_types = tipo_counts.reset_index()
                     user_types.columns = ['Tipo', 'Quantidade']
                     
                     # Usar cores padrão se houver problemas com o esquema de cores
@@ -342,7 +358,7 @@ class AdminPage:
             
             # Upload de foto de perfil
             st.markdown("<p>Foto de Perfil (JPG, PNG ou GIF)</p>", unsafe_allow_html=True)
-            uploaded_file = st.file_uploader("Foto de Perfil", type=["jpg", "jpeg", "png", "gif"], 
+            uploaded_file = st.file_uploader("Foto de Perfil", type=["jpg", "jpeg", "png", "gif", "webp"], 
                                            label_visibility="collapsed")
             
             # Preview da imagem se foi carregada
@@ -451,23 +467,17 @@ class AdminPage:
                 col1, col2 = st.columns([1, 3])
                 
                 with col1:
-                    # Verificar se o usuário tem foto de perfil
-                    foto_perfil = user.get('foto_perfil', '')
-                    # Converter para string para evitar problemas com tipos não string
-                    if foto_perfil is None or not isinstance(foto_perfil, str):
-                        foto_perfil = str(foto_perfil) if foto_perfil else ''
-                    
-                    # Normalizar o caminho (converter barras invertidas para barras normais)
-                    foto_perfil = foto_perfil.strip().replace('\\', '/')
+                    # Miniatura da foto de perfil por URL curta, nunca o arquivo original
+                    foto_src = foto_perfil_src(user['id'], 'preview')
                     
-                    # Verificar se a foto existe
-                    base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-                    full_img_path = os.path.join(base_path, foto_perfil) if foto_perfil else ""
-                    
-                    if foto_perfil and os.path.exists(full_img_path):
+                    if foto_src:
                         # Mostra a foto atual
-                        img = Image.open(full_img_path)
-                        st.image(img, caption="Foto atual", width=150)
+                        st.markdown(f"""
+                        <div style="width: 150px; text-align: center;">
+                            <img src="{foto_src}" style="width: 150px; height: 150px; object-fit: cover;">
+                            <p style="font-size: 0.85em; color: #808495; margin-top: 4px;">Foto atual</p>
+                        </div>
+                        """, unsafe_allow_html=True)
                     else:
                         # Mostrar placeholder se não tiver foto
                         st.markdown("<div class='profile-photo-placeholder' style='width:150px;height:150px;border-radius:50%;display:flex;justify-content:center;align-items:center;font-size:2rem;color:#adb5bd;background-color:#f8f9fa;'>👤</div>", unsafe_allow_html=True)
@@ -556,15 +566,21 @@ class AdminPage:
         </div>
         """, unsafe_allow_html=True)
         
-        # Carrega dados
-        users = load_users()
-        coletas = load_coletas()
+        # Contagem de usuários por tipo (recalculada só quando os usuários mudam)
+        total_users, tipo_counts = contar_usuarios_por_tipo()
+        
+        # Contadores de coletas (total, por status e por bairro) mantidos a cada gravação
+        indicadores = get_indicadores()
+        contagem_status = pd.Series(indicadores['status'], dtype='int64').sort_values(ascending=False)
+        contagem_bairros = pd.Series(
+            {bairro: grupo['total'] for bairro, grupo in get_indicadores_por_grupo('bairro').items()},
+            dtype='int64'
+        ).sort_values(ascending=False)
         
         # Métricas principais em cards estilizados
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            total_users = len(users) if not users.empty else 0
             st.markdown(f"""
             <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
                         padding: 30px; border-radius: 20px; color: white; text-align: center; 
@@ -576,7 +592,7 @@ class AdminPage:
             """, unsafe_allow_html=True)
         
         with col2:
-            moradores = len(users[users['tipo'] == 'morador']) if not users.empty else 0
+            moradores = tipo_counts.get('morador', 0)
             st.markdown(f"""
             <div style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%); 
                         padding: 30px; border-radius: 20px; color: white; text-align: center; 
@@ -588,7 +604,7 @@ class AdminPage:
             """, unsafe_allow_html=True)
         
         with col3:
-            catadores = len(users[users['tipo'] == 'catador']) if not users.empty else 0
+            catadores = tipo_counts.get('catador', 0)
             st.markdown(f"""
             <div style="background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%); 
                         padding: 30px; border-radius: 20px; color: white; text-align: center; 
@@ -600,7 +616,7 @@ class AdminPage:
             """, unsafe_allow_html=True)
         
         with col4:
-            total_coletas = len(coletas) if not coletas.empty else 0
+            total_coletas = indicadores['total']
             st.markdown(f"""
             <div style="background: linear-gradient(135deg, #fa709a 0%, #fee140 100%); 
                         padding: 30px; border-radius: 20px; color: white; text-align: center; 
@@ -612,11 +628,11 @@ class AdminPage:
             """, unsafe_allow_html=True)
         
         # Métricas adicionais de coletas
-        if not coletas.empty:
+        if total_coletas > 0:
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                pendentes = len(coletas[coletas['status'] == 'pendente'])
+                pendentes = contagem_status.get('pendente', 0)
                 st.markdown(f"""
                 <div style="background: linear-gradient(135deg, #ff9a9e 0%, #fecfef 100%); 
                             padding: 25px; border-radius: 15px; color: white; text-align: center; 
@@ -627,7 +643,7 @@ class AdminPage:
                 """, unsafe_allow_html=True)
             
             with col2:
-                concluidas = len(coletas[coletas['status'] == 'concluida'])
+                concluidas = contagem_status.get('concluida', 0)
                 st.markdown(f"""
                 <div style="background: linear-gradient(135deg, #a8edea 0%, #fed6e3 100%); 
                             padding: 25px; border-radius: 15px; color: #2d3748; text-align: center; 
@@ -649,24 +665,8 @@ class AdminPage:
                 """, unsafe_allow_html=True)
             
             with col4:
-                # Peso total coletado - usar tanto peso_kg quanto quantidade_estimada
-                peso_total = 0.0
-                if not coletas.empty:
-                    # Primeiro, tentar usar peso_kg
-                    if 'peso_kg' in coletas.columns:
-                        peso_kg_sum = coletas['peso_kg'].fillna(0).sum()
-                        if peso_kg_sum is not None:
-                            peso_total += float(peso_kg_sum)
-                    
-                    # Se não tiver peso_kg ou for zero, usar quantidade_estimada
-                    if peso_total == 0 and 'quantidade_estimada' in coletas.columns:
-                        # Converter quantidade_estimada para float, tratando strings
-                        for valor in coletas['quantidade_estimada']:
-                            try:
-                                if valor and str(valor).replace('.', '').replace(',', '').isdigit():
-                                    peso_total += float(str(valor).replace(',', '.'))
-                            except (ValueError, TypeError):
-                                continue
+                # Peso total coletado (peso_kg numérico, já normalizado no carregamento)
+                peso_total = indicadores['peso_kg']
                 
                 st.markdown(f"""
                 <div style="background: linear-gradient(135deg, #d299c2 0%, #fef9d7 100%); 
@@ -694,9 +694,9 @@ class AdminPage:
             </div>
             """, unsafe_allow_html=True)
             
-            if not users.empty:
+            if total_users > 0:
                 try:
-                    tipo_stats = users['tipo'].value_counts().reset_index()
+                    tipo_stats = tipo_counts.reset_index()
                     tipo_stats.columns = ['Tipo', 'Quantidade']
                     
                     if px is not None:
@@ -726,9 +726,9 @@ class AdminPage:
             </div>
             """, unsafe_allow_html=True)
             
-            if not coletas.empty:
+            if total_coletas > 0:
                 try:
-                    status_stats = coletas['status'].value_counts().reset_index()
+                    status_stats = contagem_status.reset_index()
                     status_stats.columns = ['Status', 'Quantidade']
                     
                     if px is not None:
@@ -750,7 +750,7 @@ class AdminPage:
                     st.error(f"Erro ao processar status das coletas: {e}")
         
         # Análise por bairros
-        if not coletas.empty and 'bairro' in coletas.columns:
+        if not contagem_bairros.empty:
             st.markdown("""
             <div style="background: rgba(255,255,255,0.05); padding: 25px; border-radius: 20px; 
                         margin: 20px 0; border: 1px solid rgba(255,255,255,0.1); 
@@ -762,7 +762,7 @@ class AdminPage:
             """, unsafe_allow_html=True)
             
             try:
-                bairro_stats = coletas['bairro'].value_counts().head(10).reset_index()
+                bairro_stats = contagem_bairros.head(10).reset_index()
                 bairro_stats.columns = ['Bairro', 'Quantidade']
                 
                 if px is not None:
@@ -941,13 +941,18 @@ class AdminPage:
                     st.write(f"**Incluí:** {material['descricao']}")
                     
 # Função global para renderizar a página do administrador (necessária para compatibilidade com app.py)
-def render_admin_page(user_data):
+def render_admin_page(user_data, contexto=None):
     """
     Função para renderizar a página do administrador.
     Mantida para compatibilidade com o restante do sistema.
     
     Args:
         user_data (dict): Dados do usuário administrador logado
+        contexto (ContextoDados, optional): Contexto de dados da execução atual
     """
-    admin_page = AdminPage(user_data)
+    if contexto is None:
+        # Chamada sem contexto: criar um para esta execução
+        with ContextoDados() as contexto:
+            return render_admin_page(user_data, contexto)
+    admin_page = AdminPage(user_data, contexto)
     admin_page.render()
@@ -11,17 +11,23 @@ import pandas as pd
 import os
 from datetime import datetime, timedelta
 import json
-import random
 from PIL import Image
 import base64
 import io
 
 from app.utils.database import (
-    load_users, load_coletas, update_coleta, get_coletas_by_catador,
-    get_coletas_disponiveis, load_notificacoes, marcar_notificacao_como_lida,
-    get_notificacoes_by_usuario, save_notificacao, load_conteudo_educativo,
-    save_notificacao, update_user, save_profile_photo, get_chat_messages, save_chat_message
+    load_users, load_coletas, get_coletas_by_catador,
+    get_coletas_abertas, contar_coletas_abertas, load_notificacoes, marcar_notificacao_como_lida,
+    get_notificacoes_by_usuario, load_conteudo_educativo,
+    update_user, save_profile_photo, save_chat_message,
+    get_coletas_with_morador, contar_nao_lidas, get_indicadores, claim_coleta, ContextoDados
 )
+from app.utils.fotos import foto_perfil_src, upload_data_uri
+from app.utils.schema import formatar_data
+from app.utils.chat import carregar_chat
+
+# Quantidade de solicitações disponíveis exibidas por página
+SOLICITACOES_POR_PAGINA = 10
 
 class CatadorPage:
     """
@@ -29,14 +35,16 @@ class CatadorPage:
     Implementa a separação entre lógica e layout.
     """
     
-    def __init__(self, user_data):
+    def __init__(self, user_data, contexto=None):
         """
         Inicializa a página do catador
         
         Args:
             user_data (dict): Dados do usuário catador logado
+            contexto (ContextoDados, optional): Contexto de dados da execução atual
         """
         self.user_data = user_data
+        self.contexto = contexto
         self.load_css()
         
     def load_css(self):
@@ -65,6 +73,11 @@ class CatadorPage:
             ["Início", "Solicitações Disponíveis", "Minhas Coletas", "Conteúdo Educativo", "Meu Perfil"]
         )
         
+        # Contador de notificações não lidas (lido do índice, sem carregar notificações)
+        nao_lidas = contar_nao_lidas(self.user_data['id'])
+        if nao_lidas:
+            st.sidebar.caption(f"🔔 {nao_lidas} notificação(ões) não lida(s)")
+        
         # Separador e botão de logout
         st.sidebar.markdown("---")
         if st.sidebar.button("🚪 Sair do Sistema", type="primary", use_container_width=True):
@@ -104,17 +117,15 @@ class CatadorPage:
             st.error("ID de catador não encontrado nos dados do usuário")
             return
             
-        coletas_df = get_coletas_by_catador(catador_id)
-        
-        # Converter DataFrame para lista de dicionários
-        coletas = coletas_df.to_dict('records') if not coletas_df.empty else []
+        # Contadores de coletas do catador (mantidos a cada gravação)
+        indicadores = get_indicadores('catador', catador_id)
         
-        total_coletas = len(coletas)
-        coletas_pendentes = len([c for c in coletas if c['status'] in ['pendente', 'agendada']])
-        coletas_concluidas = len([c for c in coletas if c['status'] == 'concluida'])
+        total_coletas = indicadores['total']
+        coletas_pendentes = indicadores['status'].get('pendente', 0) + indicadores['status'].get('agendada', 0)
+        coletas_concluidas = indicadores['status'].get('concluida', 0)
         
-        # Calcular peso total de resíduos coletados
-        peso_total = sum([float(c.get('peso_kg', 0)) for c in coletas if c['status'] == 'concluida'])
+        # Peso total de resíduos coletados
+        peso_total = indicadores['peso_concluido']
         
         with col1:
             st.markdown(f"""
@@ -155,45 +166,26 @@ class CatadorPage:
         areas_atuacao = self.user_data.get('areas_atuacao', '')
         bairros = [area.strip() for area in areas_atuacao.split(',')] if areas_atuacao else []
         
-        coletas_disponiveis_df = get_coletas_disponiveis(bairros)
+        # Apenas as 3 mais recentes (por data_criacao), lidas direto do índice por bairro
+        coletas_recentes_df = get_coletas_abertas(bairros, limite=3)
         
         # Verificar se o DataFrame está vazio usando .empty e converter para lista de dicionários se não estiver
-        if not coletas_disponiveis_df.empty:
-            # Converter DataFrame para lista de dicionários
-            coletas_disponiveis = coletas_disponiveis_df.to_dict('records')
-            
-            # Mostrar apenas as 3 mais recentes usando data_criacao (ou data se data_criacao não existir)
-            try:
-                if 'data_criacao' in coletas_disponiveis[0]:
-                    coletas_recentes = sorted(coletas_disponiveis, key=lambda x: x['data_criacao'], reverse=True)[:3]
-                else:
-                    # Usar o campo 'data' se 'data_criacao' não existir
-                    coletas_recentes = sorted(coletas_disponiveis, key=lambda x: x['data'], reverse=True)[:3]
-            except (KeyError, IndexError):
-                # Se houver qualquer erro, não aplicar ordenação
-                coletas_recentes = coletas_disponiveis[:3]
-            
-            # Carregar usuários para obter detalhes dos moradores
-            users = load_users()
+        if not coletas_recentes_df.empty:
+            # Juntar os dados dos moradores e converter para lista de dicionários
+            coletas_recentes = get_coletas_with_morador(coletas_recentes_df).to_dict('records')
             
             for coleta in coletas_recentes:
-                # Obter dados do morador
-                morador_row = users[users['id'] == coleta['morador_id']]
-                morador_nome = morador_row['nome'].iloc[0] if not morador_row.empty else "Morador não encontrado"
-                morador_endereco = morador_row['endereco'].iloc[0] if 'endereco' in morador_row.columns else "Endereço não especificado"
+                morador_nome = coleta['morador_nome']
                 
-                # Formatar quantidade estimada
-                quantidade_estimada = coleta.get('quantidade_estimada', coleta.get('peso_kg', 'Não especificada'))
-                if str(quantidade_estimada).replace('.', '').isdigit():
-                    quantidade_text = f"{quantidade_estimada} kg"
-                else:
-                    quantidade_text = str(quantidade_estimada)
+                # Formatar quantidade estimada (peso numérico em peso_kg)
+                peso_kg = coleta.get('peso_kg')
+                quantidade_text = f"{peso_kg:g} kg" if pd.notna(peso_kg) else "Não especificada"
                 
                 st.markdown(f"""
                 <div class='catador-solicitacao-card'>
                     <h4>Solicitação de {morador_nome}</h4>
-                    <p><strong>Data solicitada:</strong> {coleta['data_coleta']} às {coleta['horario_coleta']}</p>
-                    <p><strong>Materiais:</strong> {coleta.get('tipos_materiais', coleta.get('materiais', 'Não especificado'))}</p>
+                    <p><strong>Data solicitada:</strong> {formatar_data(coleta['data_coleta'])} às {coleta['horario_coleta']}</p>
+                    <p><strong>Materiais:</strong> {coleta.get('tipos_materiais', 'Não especificado')}</p>
                     <p><strong>Quantidade estimada:</strong> {quantidade_text}</p>
                 </div>
                 """, unsafe_allow_html=True)
@@ -201,47 +193,53 @@ class CatadorPage:
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button(f"Aceitar solicitação #{coleta['id']}", key=f"accept_{coleta['id']}"):
-                        # Preparar os dados para atualização
-                        update_data = {'status': 'agendada', 'catador_id': self.user_data['id']}
-                        # Atualizar status da coleta
-                        update_coleta(coleta['id'], update_data)
-                        
                         # Criar notificação para o morador
                         nova_notificacao = {
-                            "id": str(random.randint(10000, 99999)),
                             "usuario_id": coleta['morador_id'],
                             "tipo_usuario": "morador",
                             "titulo": "Solicitação de coleta aceita!",
-                            "mensagem": f"O catador {self.user_data['nome']} aceitou sua solicitação de coleta para o dia {coleta['data_coleta']} às {coleta['horario_coleta']}.",
+                            "mensagem": f"O catador {self.user_data['nome']} aceitou sua solicitação de coleta para o dia {formatar_data(coleta['data_coleta'])} às {coleta['horario_coleta']}.",
                             "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                             "lida": False
                         }
-                        save_notificacao(nova_notificacao)
                         
-                        st.success("Solicitação aceita com sucesso!")
-                        st.rerun()
+                        # Aceitar na hora com compare-and-set: falha se outro catador
+                        # já aceitou (ou alterou) a coleta desde que ela foi exibida
+                        sucesso, mensagem = claim_coleta(
+                            coleta['id'], self.user_data['id'], coleta.get('version', 0), nova_notificacao
+                        )
+                        if sucesso:
+                            st.success(mensagem)
+                            st.rerun()
+                        else:
+                            st.error(mensagem)
                 
                 with col2:
                     if st.button(f"Recusar solicitação #{coleta['id']}", key=f"reject_{coleta['id']}"):
                         # Preparar os dados para atualização
                         update_data = {'status': 'recusada'}
-                        # Atualizar status da coleta
-                        update_coleta(coleta['id'], update_data)
                         
                         # Criar notificação para o morador
                         nova_notificacao = {
-                            "id": str(random.randint(10000, 99999)),
                             "usuario_id": coleta['morador_id'],
                             "tipo_usuario": "morador",
                             "titulo": "Solicitação de coleta recusada",
-                            "mensagem": f"O catador {self.user_data['nome']} não pôde aceitar sua solicitação de coleta para o dia {coleta['data_coleta']}. Por favor, tente novamente com outro catador ou em outra data.",
+                            "mensagem": f"O catador {self.user_data['nome']} não pôde aceitar sua solicitação de coleta para o dia {formatar_data(coleta['data_coleta'])}. Por favor, tente novamente com outro catador ou em outra data.",
                             "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                             "lida": False
                         }
-                        save_notificacao(nova_notificacao)
                         
-                        st.info("Solicitação recusada.")
-                        st.rerun()
+                        # Atualizar a coleta e notificar o morador: as duas tabelas são
+                        # gravadas juntas, antes de confirmar a recusa
+                        self.contexto.update('coletas', coleta['id'], update_data)
+                        self.contexto.insert('notificacoes', nova_notificacao)
+                        sucesso, mensagem = self.contexto.commit()
+                        
+                        if sucesso:
+                            st.info("Solicitação recusada.")
+                            st.rerun()
+                        else:
+                            st.error(mensagem)
         else:
             st.info("Não há solicitações de coleta disponíveis no momento.")
     
@@ -432,42 +430,46 @@ class CatadorPage:
             st.info("Você não tem áreas de atuação configuradas. Entre em contato com o administrador.")
             bairros_filtrados = []
         
-        # Obtém as coletas disponíveis nos bairros de atuação do catador
-        coletas_disponiveis_df = get_coletas_disponiveis(bairros_filtrados)
+        # Conta as coletas disponíveis nos bairros de atuação do catador
+        total_disponiveis = contar_coletas_abertas(bairros_filtrados)
         
-        # Verificar se o DataFrame está vazio
-        if coletas_disponiveis_df.empty:
+        # Verificar se há coletas disponíveis
+        if total_disponiveis == 0:
             st.info("Não há solicitações de coleta disponíveis nas suas áreas de atuação no momento.")
             return
         
-        # Converter DataFrame para lista de dicionários
-        coletas_disponiveis = coletas_disponiveis_df.to_dict('records')
+        # Paginação: apenas a página escolhida é lida do índice (mais recentes primeiro)
+        total_paginas = (total_disponiveis + SOLICITACOES_POR_PAGINA - 1) // SOLICITACOES_POR_PAGINA
+        pagina = 1
+        if total_paginas > 1:
+            pagina = st.number_input(
+                f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1, step=1
+            )
+        coletas_disponiveis_df = get_coletas_abertas(
+            bairros_filtrados, limite=SOLICITACOES_POR_PAGINA,
+            inicio=(int(pagina) - 1) * SOLICITACOES_POR_PAGINA
+        )
         
-        # Carrega usuários para obter detalhes dos moradores
-        users = load_users()
+        # Juntar os dados dos moradores e converter para lista de dicionários
+        coletas_disponiveis = get_coletas_with_morador(coletas_disponiveis_df).to_dict('records')
         
         # Mostrar as coletas disponíveis em cards
         for coleta in coletas_disponiveis:
-            # Obter dados do morador
-            morador_row = users[users['id'] == coleta['morador_id']]
-            morador_nome = morador_row['nome'].iloc[0] if not morador_row.empty else "Morador não encontrado"
-            morador_endereco = morador_row['endereco'].iloc[0] if 'endereco' in morador_row.columns and not morador_row.empty else "Endereço não especificado"
-            morador_bairro = morador_row['bairro'].iloc[0] if 'bairro' in morador_row.columns and not morador_row.empty else "Bairro não especificado"
+            morador_nome = coleta['morador_nome']
+            morador_endereco = coleta['morador_endereco']
+            morador_bairro = coleta['morador_bairro']
             
-            # Formatar quantidade estimada
-            quantidade_estimada = coleta.get('quantidade_estimada', coleta.get('peso_kg', 'Não especificada'))
-            if str(quantidade_estimada).replace('.', '').isdigit():
-                quantidade_text = f"{quantidade_estimada} kg"
-            else:
-                quantidade_text = str(quantidade_estimada)
+            # Formatar quantidade estimada (peso numérico em peso_kg)
+            peso_kg = coleta.get('peso_kg')
+            quantidade_text = f"{peso_kg:g} kg" if pd.notna(peso_kg) else "Não especificada"
             
             st.markdown(f"""
             <div class='catador-solicitacao-card'>
                 <h4>Solicitação #{coleta['id']} - {morador_nome}</h4>
                 <div class='catador-solicitacao-info'>
                     <p><strong>Local:</strong> {morador_bairro} - {morador_endereco}</p>
-                    <p><strong>Data solicitada:</strong> {coleta['data_coleta']} às {coleta['horario_coleta']}</p>
-                    <p><strong>Materiais:</strong> {coleta.get('tipos_materiais', coleta.get('materiais', 'Não especificado'))}</p>
+                    <p><strong>Data solicitada:</strong> {formatar_data(coleta['data_coleta'])} às {coleta['horario_coleta']}</p>
+                    <p><strong>Materiais:</strong> {coleta.get('tipos_materiais', 'Não especificado')}</p>
                     <p><strong>Quantidade estimada:</strong> {quantidade_text}</p>
                 </div>
             </div>
@@ -476,47 +478,53 @@ class CatadorPage:
             col1, col2 = st.columns(2)
             with col1:
                 if st.button(f"Aceitar solicitação #{coleta['id']}", key=f"accept_disp_{coleta['id']}"):
-                    # Preparar os dados para atualização
-                    update_data = {'status': 'agendada', 'catador_id': self.user_data['id']}
-                    # Atualizar status da coleta
-                    update_coleta(coleta['id'], update_data)
-                    
                     # Criar notificação para o morador
                     nova_notificacao = {
-                        "id": str(random.randint(10000, 99999)),
                         "usuario_id": coleta['morador_id'],
                         "tipo_usuario": "morador",
                         "titulo": "Solicitação de coleta aceita!",
-                        "mensagem": f"O catador {self.user_data['nome']} aceitou sua solicitação de coleta para o dia {coleta['data_coleta']} às {coleta['horario_coleta']}.",
+                        "mensagem": f"O catador {self.user_data['nome']} aceitou sua solicitação de coleta para o dia {formatar_data(coleta['data_coleta'])} às {coleta['horario_coleta']}.",
                         "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                         "lida": False
                     }
-                    save_notificacao(nova_notificacao)
                     
-                    st.success("Solicitação aceita com sucesso!")
-                    st.rerun()
+                    # Aceitar na hora com compare-and-set: falha se outro catador
+                    # já aceitou (ou alterou) a coleta desde que ela foi exibida
+                    sucesso, mensagem = claim_coleta(
+                        coleta['id'], self.user_data['id'], coleta.get('version', 0), nova_notificacao
+                    )
+                    if sucesso:
+                        st.success(mensagem)
+                        st.rerun()
+                    else:
+                        st.error(mensagem)
             
             with col2:
                 if st.button(f"Recusar solicitação #{coleta['id']}", key=f"reject_disp_{coleta['id']}"):
                     # Preparar os dados para atualização
                     update_data = {'status': 'recusada'}
-                    # Atualizar status da coleta
-                    update_coleta(coleta['id'], update_data)
                     
                     # Criar notificação para o morador
                     nova_notificacao = {
-                        "id": str(random.randint(10000, 99999)),
                         "usuario_id": coleta['morador_id'],
                         "tipo_usuario": "morador",
                         "titulo": "Solicitação de coleta recusada",
-                        "mensagem": f"O catador {self.user_data['nome']} não pôde aceitar sua solicitação de coleta para o dia {coleta['data_coleta']}. Por favor, tente novamente com outro catador ou em outra data.",
+                        "mensagem": f"O catador {self.user_data['nome']} não pôde aceitar sua solicitação de coleta para o dia {formatar_data(coleta['data_coleta'])}. Por favor, tente novamente com outro catador ou em outra data.",
                         "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                         "lida": False
                     }
-                    save_notificacao(nova_notificacao)
                     
-                    st.info("Solicitação recusada.")
-                    st.rerun()
+                    # Atualizar a coleta e notificar o morador: as duas tabelas são
+                    # gravadas juntas, antes de confirmar a recusa
+                    self.contexto.update('coletas', coleta['id'], update_data)
+                    self.contexto.insert('notificacoes', nova_notificacao)
+                    sucesso, mensagem = self.contexto.commit()
+                    
+                    if sucesso:
+                        st.info("Solicitação recusada.")
+                        st.rerun()
+                    else:
+                        st.error(mensagem)
     
     def render_minhas_coletas(self):
         """Renderiza a página de coletas do catador"""
@@ -619,19 +627,19 @@ class CatadorPage:
         </style>
         """, unsafe_allow_html=True)
         
+        # Coletas antigas ficam no arquivo e só são lidas quando pedidas
+        incluir_arquivo = st.checkbox("Mostrar também coletas antigas (arquivadas)", key="catador_historico_arquivo")
+        
         # Obtém as coletas do catador
-        coletas_df = get_coletas_by_catador(self.user_data['id'])
+        coletas_df = get_coletas_by_catador(self.user_data['id'], incluir_arquivo=incluir_arquivo)
         
         # Verificar se há coletas atribuídas ao catador
         if coletas_df.empty:
             st.info("Você ainda não tem coletas atribuídas.")
             return
             
-        # Converter DataFrame para lista de dicionários
-        coletas = coletas_df.to_dict('records')
-        
-        # Carregar usuários para obter detalhes dos moradores
-        users = load_users()
+        # Juntar os dados dos moradores e converter para lista de dicionários
+        coletas = get_coletas_with_morador(coletas_df).to_dict('records')
         
         # Tabs para separar coletas por status
         tab1, tab2 = st.tabs(["Pendentes", "Aceitas"])
@@ -639,20 +647,19 @@ class CatadorPage:
         with tab1:
             # Filtrar coletas pendentes
             coletas_pendentes = [c for c in coletas if c['status'] == 'pendente']
-            self.mostrar_lista_coletas(coletas_pendentes, users, "Pendentes")
+            self.mostrar_lista_coletas(coletas_pendentes, "Pendentes")
             
         with tab2:
             # Filtrar coletas aceitas (concluídas)
             coletas_aceitas = [c for c in coletas if c['status'] == 'concluida']
-            self.mostrar_lista_coletas(coletas_aceitas, users, "Aceitas")
+            self.mostrar_lista_coletas(coletas_aceitas, "Aceitas")
     
-    def mostrar_lista_coletas(self, coletas, users, tipo):
+    def mostrar_lista_coletas(self, coletas, tipo):
         """
         Mostra uma lista de coletas
         
         Args:
-            coletas (list): Lista de coletas a serem exibidas
-            users (DataFrame): DataFrame com dados dos usuários
+            coletas (list): Lista de coletas (com os dados do morador) a serem exibidas
             tipo (str): Tipo de coletas (Pendentes, Agendadas, Concluídas)
         """
         if not coletas:
@@ -660,11 +667,9 @@ class CatadorPage:
             return
         
         for coleta in coletas:
-            # Obter dados do morador
-            morador_row = users[users['id'] == coleta['morador_id']]
-            morador_nome = morador_row['nome'].iloc[0] if not morador_row.empty else "Morador não encontrado"
-            morador_endereco = morador_row['endereco'].iloc[0] if 'endereco' in morador_row.columns and not morador_row.empty else "Endereço não especificado"
-            morador_bairro = morador_row['bairro'].iloc[0] if 'bairro' in morador_row.columns and not morador_row.empty else "Bairro não especificado"
+            morador_nome = coleta['morador_nome']
+            morador_endereco = coleta['morador_endereco']
+            morador_bairro = coleta['morador_bairro']
             
             status_class = {
                 'pendente': 'catador-coleta-pending',
@@ -682,9 +687,9 @@ class CatadorPage:
                 <div class='catador-coleta-info'>
                     <p><strong>Morador:</strong> {morador_nome}</p>
                     <p><strong>Local:</strong> {morador_bairro} - {morador_endereco}</p>
-                    <p><strong>Data:</strong> {coleta.get('data_coleta', 'Não especificada')} às {coleta.get('horario_coleta', 'Não especificado')}</p>
-                    <p><strong>Materiais:</strong> {coleta.get('tipos_materiais', coleta.get('materiais', 'Não especificado'))}</p>
-                    <p><strong>Quantidade estimada:</strong> {coleta.get('quantidade_estimada', coleta.get('peso_kg', 'Não especificada'))} kg</p>
+                    <p><strong>Data:</strong> {formatar_data(coleta.get('data_coleta'))} às {coleta.get('horario_coleta', 'Não especificado')}</p>
+                    <p><strong>Materiais:</strong> {coleta.get('tipos_materiais', 'Não especificado')}</p>
+                    <p><strong>Quantidade estimada:</strong> {f"{coleta['peso_kg']:g} kg" if pd.notna(coleta.get('peso_kg')) else 'Não especificada'}</p>
                 </div>
             </div>
             """, unsafe_allow_html=True)
@@ -700,12 +705,8 @@ class CatadorPage:
                             'data_conclusao': datetime.now().strftime("%Y-%m-%d")
                         }
                         
-                        # Atualizar status da coleta
-                        update_coleta(coleta['id'], update_data)
-                        
                         # Criar notificação para o morador
                         nova_notificacao = {
-                            "id": str(random.randint(10000, 99999)),
                             "usuario_id": coleta['morador_id'],
                             "tipo_usuario": "morador",
                             "titulo": "Coleta aceita!",
@@ -713,10 +714,18 @@ class CatadorPage:
                             "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                             "lida": False
                         }
-                        save_notificacao(nova_notificacao)
                         
-                        st.success("Coleta aceita com sucesso!")
-                        st.rerun()
+                        # Atualizar a coleta e notificar o morador: as duas tabelas são
+                        # gravadas juntas, antes de confirmar o aceite
+                        self.contexto.update('coletas', coleta['id'], update_data)
+                        self.contexto.insert('notificacoes', nova_notificacao)
+                        sucesso, mensagem = self.contexto.commit()
+                        
+                        if sucesso:
+                            st.success("Coleta aceita com sucesso!")
+                            st.rerun()
+                        else:
+                            st.error(mensagem)
             
             elif tipo == "Aceitas":
                 # Expandir para mostrar chat da coleta aceita
@@ -724,8 +733,8 @@ class CatadorPage:
                     # Mostrar informações básicas da coleta apenas uma vez
                     st.markdown(f"""
                     **📋 Coleta #{coleta['id']}** - Morador: {morador_nome}  
-                    **📅 Data:** {coleta.get('data_coleta', 'Não especificada')} às {coleta.get('horario_coleta', 'Não especificado')}  
-                    **📦 Materiais:** {coleta.get('tipos_materiais', coleta.get('materiais', 'Não especificado'))}
+                    **📅 Data:** {formatar_data(coleta.get('data_coleta'))} às {coleta.get('horario_coleta', 'Não especificado')}  
+                    **📦 Materiais:** {coleta.get('tipos_materiais', 'Não especificado')}
                     """)
                     
                     if coleta.get('observacoes'):
@@ -738,7 +747,7 @@ class CatadorPage:
                     
                     # Carregar mensagens do chat
                     
-                    chat_messages = get_chat_messages(coleta['id'])
+                    chat_messages = carregar_chat(coleta['id'])
                     
                     # Mostrar histórico de mensagens
                     if not chat_messages.empty:
@@ -1018,39 +1027,14 @@ class CatadorPage:
         with col1:
             st.markdown("<div class='profile-photo-container'>", unsafe_allow_html=True)
             
-            # Verificar se o usuário tem foto de perfil
-            foto_perfil = user_data.get('foto_perfil', '')
-            # Converter para string para evitar problemas com tipos não string
-            if foto_perfil is None or not isinstance(foto_perfil, str):
-                foto_perfil = str(foto_perfil) if foto_perfil else ''
-            
-            # Normalizar o caminho (converter barras invertidas para barras normais)
-            foto_perfil = foto_perfil.strip().replace('\\', '/')
-            
-            # Verificar se a foto existe
-            base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            full_img_path = os.path.join(base_path, foto_perfil) if foto_perfil else ""
-            
-            # Tratamento seguro para exibição da imagem em base64
+            # Tratamento seguro para exibição da foto de perfil
             try:
-                if foto_perfil and os.path.exists(full_img_path):
-                    # Converter imagem para base64 para evitar ícone de expandir
-                    import base64
-                    with open(full_img_path, "rb") as img_file:
-                        img_base64 = base64.b64encode(img_file.read()).decode()
-                    
-                    # Determinar o tipo MIME da imagem
-                    img_ext = os.path.splitext(full_img_path)[1].lower()
-                    mime_type = {
-                        '.jpg': 'image/jpeg',
-                        '.jpeg': 'image/jpeg',
-                        '.png': 'image/png',
-                        '.gif': 'image/gif'
-                    }.get(img_ext, 'image/jpeg')
-                    
+                # Miniatura de 300px da foto por URL curta, nunca o arquivo original
+                foto_src = foto_perfil_src(user_id, 'preview')
+                if foto_src:
                     st.markdown(f"""
                     <div style="text-align: center;">
-                        <img src="data:{mime_type};base64,{img_base64}" 
+                        <img src="{foto_src}" 
                              style="width: 180px; height: 180px; object-fit: cover; border-radius: 15px; 
                                     box-shadow: 0 8px 20px rgba(0,0,0,0.15); border: 3px solid rgba(0,0,0,0.1);">
                     </div>
@@ -1105,28 +1089,17 @@ class CatadorPage:
                 
                 # Upload de nova foto de perfil
                 st.markdown("<p>Foto de Perfil (JPG, PNG ou GIF)</p>", unsafe_allow_html=True)
-                nova_foto = st.file_uploader("Foto de Perfil", type=["jpg", "jpeg", "png", "gif"], label_visibility="collapsed")
+                nova_foto = st.file_uploader("Foto de Perfil", type=["jpg", "jpeg", "png", "gif", "webp"], label_visibility="collapsed")
                 
                 # Preview da nova foto se foi carregada
                 if nova_foto:
                     try:
-                        import base64
-                        # Converter para base64 para preview
-                        nova_foto_base64 = base64.b64encode(nova_foto.read()).decode()
-                        nova_foto.seek(0)  # Reset do buffer
-                        
-                        # Determinar tipo MIME
-                        img_ext = os.path.splitext(nova_foto.name)[1].lower()
-                        mime_type = {
-                            '.jpg': 'image/jpeg',
-                            '.jpeg': 'image/jpeg',
-                            '.png': 'image/png',
-                            '.gif': 'image/gif'
-                        }.get(img_ext, 'image/jpeg')
+                        # Miniatura da foto carregada para o preview (não envia o arquivo original)
+                        nova_foto_src = upload_data_uri(nova_foto, 'preview')
                         
                         st.markdown(f"""
                         <div style="text-align: center; margin: 15px 0;">
-                            <img src="data:{mime_type};base64,{nova_foto_base64}" 
+                            <img src="{nova_foto_src}" 
                                  style="width: 150px; height: 150px; object-fit: cover; border-radius: 10px; 
                                         box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
                             <p style="font-size: 0.9em; color: #666; margin-top: 8px;">Preview da nova foto</p>
@@ -1186,7 +1159,11 @@ class CatadorPage:
             st.experimental_rerun()
 
 # Função para renderizar a página do catador (função de ponto de entrada)
-def render_catador_page(user_data):
+def render_catador_page(user_data, contexto=None):
     """Renderiza a página do catador do sistema"""
-    catador = CatadorPage(user_data)
+    if contexto is None:
+        # Chamada sem contexto: criar um para esta execução
+        with ContextoDados() as contexto:
+            return render_catador_page(user_data, contexto)
+    catador = CatadorPage(user_data, contexto)
     catador.render()
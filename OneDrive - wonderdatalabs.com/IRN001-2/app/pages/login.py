@@ -8,6 +8,7 @@ de usuários (moradores, catadores e administradores).
 import streamlit as st
 import os
 from app.utils.auth import login
+from app.utils.assets import src_imagem
 
 class LoginPage:
     """
@@ -50,7 +51,7 @@ class LoginPage:
         
         if os.path.exists(logo_path):
             st.markdown(f"""<div class="logo-container">
-                           <img src="data:image/jpeg;base64,{self.get_base64_image(logo_path)}" 
+                           <img src="{src_imagem(logo_path)}" 
                                 class="logo-img" 
                                 style="max-width: 200px; height: auto; margin-bottom: 0;"
                                 alt="Logo Coleta Seletiva Conectada"/>
@@ -63,12 +64,6 @@ class LoginPage:
             </div>
             """, unsafe_allow_html=True)
     
-    def get_base64_image(self, image_path):
-        """Converte uma imagem para base64 para exibição inline no HTML"""
-        import base64
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode('utf-8')
-    
     def show_login_form(self):
         """Renderiza o formulário de login centralizado"""
 
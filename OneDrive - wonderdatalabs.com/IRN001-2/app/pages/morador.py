@@ -16,8 +16,12 @@ from app.utils.database import (
     load_users, load_coletas, save_coleta, get_coletas_by_morador, 
     load_notificacoes, marcar_notificacao_como_lida, get_notificacoes_by_usuario,
     load_conteudo_educativo, save_notificacao, update_user, save_profile_photo,
-    get_chat_messages, save_chat_message
+    save_chat_message, get_coletas_with_catador, contar_nao_lidas,
+    get_indicadores, ContextoDados
 )
+from app.utils.fotos import foto_perfil_src, upload_data_uri
+from app.utils.schema import formatar_data
+from app.utils.chat import carregar_chat
 
 class MoradorPage:
     """
@@ -25,14 +29,16 @@ class MoradorPage:
     Implementa a separação entre lógica e layout.
     """
     
-    def __init__(self, user_data):
+    def __init__(self, user_data, contexto=None):
         """
         Inicializa a página do morador
         
         Args:
             user_data (dict): Dados do usuário morador logado
+            contexto (ContextoDados, optional): Contexto de dados da execução atual
         """
         self.user_data = user_data
+        self.contexto = contexto
         self.load_css()
         
     def load_css(self):
@@ -54,6 +60,11 @@ class MoradorPage:
             ["Início", "Solicitar Coleta", "Minhas Coletas", "Conteúdo Educativo", "Meu Perfil"]
         )
         
+        # Contador de notificações não lidas (lido do índice, sem carregar notificações)
+        nao_lidas = contar_nao_lidas(self.user_data['id'])
+        if nao_lidas:
+            st.sidebar.caption(f"🔔 {nao_lidas} notificação(ões) não lida(s)")
+        
         # Separador e botão de logout
         st.sidebar.markdown("---")
         if st.sidebar.button("🚪 Sair do Sistema", type="primary", use_container_width=True):
@@ -86,30 +97,15 @@ class MoradorPage:
         # Mostrar estatísticas do morador
         col1, col2, col3 = st.columns(3)
         
-        # Obter dados de coletas do morador
-        coletas_df = get_coletas_by_morador(self.user_data['id'])
-        
-        # Verificar se coletas_df é um DataFrame válido
-        if not isinstance(coletas_df, pd.DataFrame):
-            coletas_df = pd.DataFrame()
+        # Obter os contadores de coletas do morador (mantidos a cada gravação)
+        indicadores = get_indicadores('morador', self.user_data['id'])
         
-        total_coletas = len(coletas_df)
-        coletas_pendentes = len(coletas_df[coletas_df['status'].isin(['pendente', 'agendada'])]) if 'status' in coletas_df.columns else 0
-        coletas_concluidas = len(coletas_df[coletas_df['status'] == 'concluida']) if 'status' in coletas_df.columns else 0
+        total_coletas = indicadores['total']
+        coletas_pendentes = indicadores['status'].get('pendente', 0) + indicadores['status'].get('agendada', 0)
+        coletas_concluidas = indicadores['status'].get('concluida', 0)
         
-        # Calcular peso total aproximado de resíduos
-        peso_total = 0.0
-        if isinstance(coletas_df, pd.DataFrame) and 'peso_kg' in coletas_df.columns and len(coletas_df) > 0:
-            # Converte para numérico apenas as coletas aceitas
-            coletas_concluidas_df = coletas_df[coletas_df['status'] == 'concluida']
-            if isinstance(coletas_concluidas_df, pd.DataFrame) and len(coletas_concluidas_df) > 0:
-                # Tratar possíveis valores não numéricos
-                for peso_str in coletas_concluidas_df['peso_kg']:
-                    try:
-                        peso_num = float(peso_str) if peso_str and str(peso_str).strip() not in ['', 'nan', 'NaN'] else 0.0
-                        peso_total += peso_num
-                    except (ValueError, TypeError):
-                        continue
+        # Peso total de resíduos das coletas concluídas
+        peso_total = indicadores['peso_concluido']
         
         with col1:
             st.markdown(f"""
@@ -526,17 +522,12 @@ class MoradorPage:
                         col1, col2 = st.columns([1, 2])
                         
                         with col1:
-                            # Foto do catador
-                            foto_path = f"uploads/fotos_perfil/user_{catador.get('id', 0)}_foto_perfil.png"
-                            if os.path.exists(foto_path):
-                                # Converter para base64
-                                with open(foto_path, "rb") as img_file:
-                                    import base64
-                                    img_base64 = base64.b64encode(img_file.read()).decode()
-                                    
+                            # Foto do catador (miniatura de 120px por URL curta com cache no navegador)
+                            foto_src = foto_perfil_src(catador.get('id', 0), 'avatar')
+                            if foto_src:
                                 st.markdown(f"""
                                 <div style="text-align: center; margin-bottom: 15px;">
-                                    <img src="data:image/png;base64,{img_base64}" 
+                                    <img src="{foto_src}" 
                                          style="width: 120px; height: 120px; border-radius: 50%; object-fit: cover; 
                                                 border: 3px solid #2e8b57; box-shadow: 0 4px 12px rgba(46, 139, 87, 0.2);">
                                 </div>
@@ -643,8 +634,7 @@ class MoradorPage:
                                         'status': 'pendente',
                                         'data_criacao': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                                         'bairro': self.user_data.get('bairro', ''),
-                                        'quantidade_estimada': f'{quantidade_estimada:.1f}',
-                                        'peso_kg': quantidade_estimada  # Para compatibilidade com cálculos existentes
+                                        'peso_kg': round(float(quantidade_estimada), 1)
                                     }
                                     
                                     success, message = save_coleta(coleta_data)
@@ -682,8 +672,13 @@ class MoradorPage:
         
         # Obter dados do morador
         try:
-            coletas_df = get_coletas_by_morador(self.user_data['id'])
-            users_df = load_users()
+            # Coletas antigas ficam no arquivo e só são lidas quando pedidas
+            incluir_arquivo = st.checkbox("Mostrar também coletas antigas (arquivadas)", key="morador_historico_arquivo")
+            
+            # Coletas do morador já com o nome do catador
+            coletas_df = get_coletas_with_catador(
+                get_coletas_by_morador(self.user_data['id'], incluir_arquivo=incluir_arquivo)
+            )
             
             # Verificar se há coletas
             if coletas_df.empty:
@@ -701,7 +696,7 @@ class MoradorPage:
                 st.markdown("### 🔄 Coletas Pendentes")
                 if not coletas_pendentes.empty:
                     st.info("Estas coletas foram solicitadas e estão aguardando confirmação dos catadores.")
-                    self.mostrar_lista_coletas(coletas_pendentes, users_df, "pendente")
+                    self.mostrar_lista_coletas(coletas_pendentes, "pendente")
                 else:
                     st.info("Você não possui coletas pendentes.")
             
@@ -709,20 +704,19 @@ class MoradorPage:
                 st.markdown("### ✅ Coletas Aceitas")
                 if not coletas_concluidas.empty:
                     st.info("Estas coletas foram aceitas pelos catadores.")
-                    self.mostrar_lista_coletas(coletas_concluidas, users_df, "concluida")
+                    self.mostrar_lista_coletas(coletas_concluidas, "concluida")
                 else:
                     st.info("Você não possui coletas aceitas.")
                     
         except Exception as e:
             st.error(f"Erro ao carregar coletas: {str(e)}")
     
-    def mostrar_lista_coletas(self, coletas, users, tipo):
+    def mostrar_lista_coletas(self, coletas, tipo):
         """
         Mostra uma lista de coletas
         
         Args:
-            coletas (DataFrame): DataFrame de coletas a serem exibidas
-            users (DataFrame): DataFrame com dados dos usuários
+            coletas (DataFrame): DataFrame de coletas (com o nome do catador) a serem exibidas
             tipo (str): Tipo de coletas (pendente, concluida)
         """
         if len(coletas) == 0:
@@ -735,15 +729,14 @@ class MoradorPage:
             # Obter dados do catador para coletas aceitas
             catador_nome = "Aguardando confirmação"
             if tipo == "concluida" and pd.notna(coleta.get('catador_id')):
-                catador_row = users[users['id'] == coleta['catador_id']]
-                catador_nome = catador_row['nome'].iloc[0] if not catador_row.empty else "Catador não encontrado"
+                catador_nome = coleta['catador_nome']
             
             # Acessar valores de forma segura
             coleta_id = coleta.get('id', 'N/A')
-            data_coleta = coleta.get('data_coleta', 'Não informada')
+            data_coleta = formatar_data(coleta.get('data_coleta'), 'Não informada')
             horario_coleta = coleta.get('horario_coleta', 'Não informado')
-            materiais = coleta.get('tipos_materiais', coleta.get('materiais', 'Não especificado'))
-            endereco = coleta.get('endereco_coleta', coleta.get('endereco', 'Não especificado'))
+            materiais = coleta.get('tipos_materiais', 'Não especificado')
+            endereco = coleta.get('endereco_coleta', 'Não especificado')
             observacoes = coleta.get('observacoes', '')
             
             # Container para cada coleta
@@ -771,12 +764,12 @@ class MoradorPage:
                 st.write(f"**Materiais:** {materiais}")
                 st.write(f"**Endereço:** {endereco}")
                 
-                # Mostrar quantidade estimada
-                quantidade_estimada = coleta.get('quantidade_estimada', coleta.get('peso_kg', 'Não especificada'))
-                if str(quantidade_estimada).replace('.', '').isdigit():
-                    st.write(f"**Quantidade estimada:** {quantidade_estimada} kg")
+                # Mostrar quantidade estimada (peso numérico em peso_kg)
+                peso_kg = coleta.get('peso_kg')
+                if pd.notna(peso_kg):
+                    st.write(f"**Quantidade estimada:** {peso_kg:g} kg")
                 else:
-                    st.write(f"**Quantidade estimada:** {quantidade_estimada}")
+                    st.write("**Quantidade estimada:** Não especificada")
                 
                 if observacoes:
                     st.write(f"**Observações:** {observacoes}")
@@ -791,7 +784,7 @@ class MoradorPage:
                         st.markdown("### 💬 Mensagens sobre a coleta")
                         
                         # Carregar mensagens do chat
-                        chat_messages = get_chat_messages(coleta_id)
+                        chat_messages = carregar_chat(coleta_id)
                         
                         # Mostrar histórico de mensagens
                         if not chat_messages.empty:
@@ -1073,39 +1066,14 @@ class MoradorPage:
         with col1:
             st.markdown("<div class='profile-photo-container'>", unsafe_allow_html=True)
             
-            # Verificar se o usuário tem foto de perfil
-            foto_perfil = user_data.get('foto_perfil', '')
-            # Converter para string para evitar problemas com tipos não string
-            if foto_perfil is None or not isinstance(foto_perfil, str):
-                foto_perfil = str(foto_perfil) if foto_perfil else ''
-            
-            # Normalizar o caminho (converter barras invertidas para barras normais)
-            foto_perfil = foto_perfil.strip().replace('\\', '/')
-            
-            # Verificar se a foto existe
-            base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            full_img_path = os.path.join(base_path, foto_perfil) if foto_perfil else ""
-            
-            # Tratamento seguro para exibição da imagem em base64
+            # Tratamento seguro para exibição da foto de perfil
             try:
-                if foto_perfil and os.path.exists(full_img_path):
-                    # Converter imagem para base64 para evitar ícone de expandir
-                    import base64
-                    with open(full_img_path, "rb") as img_file:
-                        img_base64 = base64.b64encode(img_file.read()).decode()
-                    
-                    # Determinar o tipo MIME da imagem
-                    img_ext = os.path.splitext(full_img_path)[1].lower()
-                    mime_type = {
-                        '.jpg': 'image/jpeg',
-                        '.jpeg': 'image/jpeg',
-                        '.png': 'image/png',
-                        '.gif': 'image/gif'
-                    }.get(img_ext, 'image/jpeg')
-                    
+                # Miniatura de 300px da foto por URL curta, nunca o arquivo original
+                foto_src = foto_perfil_src(user_id, 'preview')
+                if foto_src:
                     st.markdown(f"""
                     <div style="text-align: center;">
-                        <img src="data:{mime_type};base64,{img_base64}" 
+                        <img src="{foto_src}" 
                              style="width: 180px; height: 180px; object-fit: cover; border-radius: 15px; 
                                     box-shadow: 0 8px 20px rgba(0,0,0,0.15); border: 3px solid rgba(0,0,0,0.1);">
                     </div>
@@ -1162,28 +1130,17 @@ class MoradorPage:
                 
                 # Upload de nova foto de perfil
                 st.markdown("<p>Foto de Perfil (JPG, PNG ou GIF)</p>", unsafe_allow_html=True)
-                nova_foto = st.file_uploader("Foto de Perfil", type=["jpg", "jpeg", "png", "gif"], label_visibility="collapsed")
+                nova_foto = st.file_uploader("Foto de Perfil", type=["jpg", "jpeg", "png", "gif", "webp"], label_visibility="collapsed")
                 
                 # Preview da nova foto se foi carregada
                 if nova_foto:
                     try:
-                        import base64
-                        # Converter para base64 para preview
-                        nova_foto_base64 = base64.b64encode(nova_foto.read()).decode()
-                        nova_foto.seek(0)  # Reset do buffer
-                        
-                        # Determinar tipo MIME
-                        img_ext = os.path.splitext(nova_foto.name)[1].lower()
-                        mime_type = {
-                            '.jpg': 'image/jpeg',
-                            '.jpeg': 'image/jpeg',
-                            '.png': 'image/png',
-                            '.gif': 'image/gif'
-                        }.get(img_ext, 'image/jpeg')
+                        # Miniatura da foto carregada para o preview (não envia o arquivo original)
+                        nova_foto_src = upload_data_uri(nova_foto, 'preview')
                         
                         st.markdown(f"""
                         <div style="text-align: center; margin: 15px 0;">
-                            <img src="data:{mime_type};base64,{nova_foto_base64}" 
+                            <img src="{nova_foto_src}" 
                                  style="width: 150px; height: 150px; object-fit: cover; border-radius: 10px; 
                                         box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
                             <p style="font-size: 0.9em; color: #666; margin-top: 8px;">Preview da nova foto</p>
@@ -1237,13 +1194,18 @@ class MoradorPage:
                             st.error(f"Erro ao salvar alterações: {str(e)}")
     
 # Função para renderizar a página do morador a partir do módulo principal
-def render_morador_page(user_data):
+def render_morador_page(user_data, contexto=None):
     """
     Função principal para renderizar a página do morador.
     Esta função é chamada pelo app.py quando um usuário do tipo 'morador' faz login.
     
     Args:
         user_data (dict): Dados do usuário morador logado
+        contexto (ContextoDados, optional): Contexto de dados da execução atual
     """
-    page = MoradorPage(user_data)
+    if contexto is None:
+        # Chamada sem contexto: criar um para esta execução
+        with ContextoDados() as contexto:
+            return render_morador_page(user_data, contexto)
+    page = MoradorPage(user_data, contexto)
     page.render()
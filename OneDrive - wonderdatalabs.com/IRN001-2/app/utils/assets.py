@@ -0,0 +1,250 @@
+"""
+Arquivos estáticos do sistema Coleta Seletiva Conectada
+
+Este módulo publica as imagens exibidas nas páginas (logo de app/assets e as
+miniaturas das fotos de perfil) como arquivos estáticos com o hash do conteúdo
+no nome, para que as páginas emitam apenas URLs curtas que o navegador guarda
+em cache, em vez de embutir a imagem em base64 a cada execução.
+
+Os arquivos publicados ficam em static/ (na raiz do projeto) e são servidos:
+- pelo servidor estático do Streamlit (server.enableStaticServing, habilitado
+  em .streamlit/config.toml; URLs app/static/...), que permite revalidação
+  condicional pelo navegador; ou
+- por um pequeno servidor HTTP local (COLETA_ASSETS_PORTA, com o endereço
+  visto pelo navegador em COLETA_ASSETS_URL), que responde com
+  Cache-Control: public, max-age=31536000, immutable.
+Sem nenhum dos dois (ex.: servidor estático desabilitado), a imagem volta a
+ser embutida como data URI.
+"""
+
+import os
+import glob
+import base64
+import shutil
+import hashlib
+import functools
+import threading
+import http.server
+
+import streamlit as st
+
+# Diretório publicado como arquivos estáticos (static/ ao lado do script principal)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+# Prefixo das URLs do servidor estático do Streamlit
+STATIC_URL_STREAMLIT = 'app/static'
+
+# Servidor HTTP local com cabeçalhos de cache longos (0 desativa)
+ASSETS_PORTA = int(os.environ.get('COLETA_ASSETS_PORTA', 0))
+ASSETS_HOST = os.environ.get('COLETA_ASSETS_HOST', '127.0.0.1')
+# Endereço do servidor local visto pelo navegador (obrigatório com COLETA_ASSETS_PORTA)
+ASSETS_URL = os.environ.get('COLETA_ASSETS_URL', '').rstrip('/')
+# Validade (segundos) dos arquivos publicados: o nome muda quando o conteúdo muda
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+# Tipo MIME das imagens embutidas como data URI (quando não há servidor estático)
+TIPOS_MIME = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.svg': 'image/svg+xml',
+}
+
+# Arquivos já publicados: caminho de origem -> ((mtime_ns, tamanho) ou hash, caminho relativo publicado)
+_publicados = {}
+_publicados_lock = threading.Lock()
+
+_servidor = None
+_servidor_lock = threading.Lock()
+
+
+def hash_conteudo(path):
+    """Retorna os 16 primeiros dígitos do SHA-256 do conteúdo do arquivo."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()[:16]
+
+
+def hash_dados(dados):
+    """Retorna os 16 primeiros dígitos do SHA-256 de um conteúdo em memória."""
+    return hashlib.sha256(dados).hexdigest()[:16]
+
+
+def publicar(path, grupo='assets', hash_origem=None):
+    """
+    Copia um arquivo para static/<grupo>/<nome>.<hash>.<ext>, removendo as
+    versões anteriores do mesmo arquivo. O hash só é recalculado quando o
+    mtime ou o tamanho da origem mudam; se o hash já for conhecido (manifesto
+    das fotos), a origem nem é consultada depois da primeira publicação.
+
+    Args:
+        path (str): Caminho do arquivo de origem
+        grupo (str, optional): Subdiretório de static/. Default é 'assets'.
+        hash_origem (str, optional): Hash do conteúdo já calculado. Default é None.
+
+    Returns:
+        str: Caminho relativo a static/ (ex.: 'assets/logo.3f2a9c0d1e4b5a6f.jpg'),
+        ou None se a origem não existir
+    """
+    if hash_origem is not None:
+        assinatura = hash_origem
+        with _publicados_lock:
+            entrada = _publicados.get(path)
+        if entrada is not None and entrada[0] == assinatura and os.path.exists(os.path.join(STATIC_DIR, entrada[1])):
+            return entrada[1]
+    else:
+        try:
+            info = os.stat(path)
+        except OSError:
+            return None
+        assinatura = (info.st_mtime_ns, info.st_size)
+        with _publicados_lock:
+            entrada = _publicados.get(path)
+        if entrada is not None and entrada[0] == assinatura and os.path.exists(os.path.join(STATIC_DIR, entrada[1])):
+            return entrada[1]
+        hash_origem = hash_conteudo(path)
+
+    destino_dir = os.path.join(STATIC_DIR, grupo)
+    nome, ext = os.path.splitext(os.path.basename(path))
+    publicado = f'{nome}.{hash_origem}{ext.lower()}'
+    destino = os.path.join(destino_dir, publicado)
+    if not os.path.exists(destino):
+        os.makedirs(destino_dir, exist_ok=True)
+        # Gravar em arquivo temporário e substituir: o servidor nunca entrega o arquivo pela metade
+        temp_path = f'{destino}.{os.getpid()}.{threading.get_ident()}.tmp'
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, destino)
+        for antigo in glob.glob(os.path.join(destino_dir, f'{glob.escape(nome)}.*{ext.lower()}')):
+            if antigo != destino and os.path.basename(antigo).count('.') == 2:
+                try:
+                    os.remove(antigo)
+                except OSError:
+                    pass
+
+    relativo = f'{grupo}/{publicado}'
+    with _publicados_lock:
+        _publicados[path] = (assinatura, relativo)
+    return relativo
+
+
+class _HandlerEstaticos(http.server.SimpleHTTPRequestHandler):
+    """Serve static/ com cache longo: os nomes publicados mudam com o conteúdo."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=STATIC_DIR, **kwargs)
+
+    def send_response(self, code, message=None):
+        self._codigo = code
+        super().send_response(code, message)
+
+    def end_headers(self):
+        if getattr(self, '_codigo', None) == 200:
+            self.send_header('Cache-Control', f'public, max-age={CACHE_MAX_AGE}, immutable')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        super().end_headers()
+
+    def list_directory(self, path):
+        # Sem listagem de diretórios: só quem conhece o nome publicado acessa o arquivo
+        self.send_error(404, "File not found")
+        return None
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _iniciar_servidor():
+    """
+    Inicia (uma vez por processo) o servidor HTTP local dos arquivos estáticos.
+
+    Returns:
+        bool: True se o servidor local está disponível (False se a porta não
+        estiver configurada, se faltar COLETA_ASSETS_URL ou se a porta não
+        puder ser usada)
+    """
+    global _servidor
+    if not ASSETS_PORTA:
+        return False
+    with _servidor_lock:
+        if _servidor is None and not ASSETS_URL:
+            # Sem o endereço público, as URLs emitidas não chegariam ao servidor
+            print("COLETA_ASSETS_PORTA definida sem COLETA_ASSETS_URL: servidor de arquivos estáticos desativado")
+            _servidor = False
+        elif _servidor is None:
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            try:
+                _servidor = http.server.ThreadingHTTPServer((ASSETS_HOST, ASSETS_PORTA), _HandlerEstaticos)
+            except OSError as e:
+                # Porta em uso ou sem permissão: usar o servidor do Streamlit ou data URIs
+                print(f"Servidor de arquivos estáticos não iniciado na porta {ASSETS_PORTA}: {e}")
+                _servidor = False
+            else:
+                threading.Thread(target=_servidor.serve_forever, daemon=True).start()
+    return bool(_servidor)
+
+
+def _servico_streamlit_ativo():
+    """Indica se o servidor estático do Streamlit está habilitado."""
+    try:
+        return bool(st.get_option('server.enableStaticServing'))
+    except Exception:
+        return False
+
+
+def url_asset(path, grupo='assets', hash_origem=None):
+    """
+    Publica um arquivo e retorna a URL curta (com o hash do conteúdo) dele.
+
+    Args:
+        path (str): Caminho do arquivo
+        grupo (str, optional): Subdiretório de static/. Default é 'assets'.
+        hash_origem (str, optional): Hash do conteúdo já calculado. Default é None.
+
+    Returns:
+        str: URL do arquivo, ou None se ele não existir ou se não houver
+        servidor de arquivos estáticos
+    """
+    if _iniciar_servidor():
+        base = ASSETS_URL
+    elif _servico_streamlit_ativo():
+        base = STATIC_URL_STREAMLIT
+    else:
+        return None
+    try:
+        relativo = publicar(path, grupo, hash_origem)
+    except OSError as e:
+        print(f"Erro ao publicar {path}: {e}")
+        return None
+    return f'{base}/{relativo}' if relativo else None
+
+
+@functools.lru_cache(maxsize=64)
+def _data_uri(path, mtime_ns):
+    """Monta o data URI de um arquivo (memorizado pelo caminho e mtime)."""
+    mime_type = TIPOS_MIME.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+    with open(path, 'rb') as f:
+        return f"data:{mime_type};base64,{base64.b64encode(f.read()).decode()}"
+
+
+def src_imagem(path, grupo='assets'):
+    """
+    Retorna o valor do atributo src de uma imagem: a URL publicada ou, sem
+    servidor de arquivos estáticos, o data URI da imagem.
+
+    Args:
+        path (str): Caminho da imagem
+        grupo (str, optional): Subdiretório de static/. Default é 'assets'.
+
+    Returns:
+        str: URL ou data URI, ou None se a imagem não existir
+    """
+    url = url_asset(path, grupo)
+    if url is not None:
+        return url
+    try:
+        return _data_uri(path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
@@ -5,13 +5,13 @@ Este módulo contém funções para autenticação, login e verificação de per
 """
 
 import streamlit as st
-import pandas as pd
 import os
 import hashlib
 import json
 from datetime import datetime
 
-from app.utils.database import load_users, save_user, check_user_exists
+from app.utils.database import load_users, save_user, update_user, check_user_exists
+from app.utils.schema import valores_nativos
 
 # Caminho para o arquivo de usuários
 USERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'usuarios.csv')
@@ -62,8 +62,8 @@ def authenticate(email, password, user_type=None):
         
         # Verifica se encontrou o usuário
         if not user_query.empty:
-            # Converte a linha do DataFrame para um dicionário
-            user_data = user_query.iloc[0].to_dict()
+            # Converte a linha do DataFrame para um dicionário com tipos nativos (JSON)
+            user_data = valores_nativos(user_query.iloc[0].to_dict())
             return True, user_data
         else:
             return False, None
@@ -146,9 +146,7 @@ def login(email, password, user_type=None):
         save_session(user_data)
         
         # Registra o último login (opcional)
-        users_df = load_users()
-        users_df.loc[users_df['email'] == email, 'ultimo_login'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        users_df.to_csv(USERS_FILE, index=False)
+        update_user(user_data['id'], {'ultimo_login': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
         
         return True
     else:
@@ -196,9 +194,8 @@ def register_user(nome, email, senha, tipo, bairro, telefone=None, areas_atuacao
         if check_user_exists(email):
             return False, "Usuário já existe com este email"
         
-        # Cria um novo usuário
+        # Cria um novo usuário (o ID é gerado por save_user)
         new_user = {
-            'id': pd.read_csv(USERS_FILE)['id'].max() + 1 if os.path.exists(USERS_FILE) and not pd.read_csv(USERS_FILE).empty else 1,
             'nome': nome,
             'email': email,
             'senha': hash_password(senha),
@@ -234,12 +231,12 @@ def reset_password(email, new_password):
         users_df = load_users()
         
         # Verifica se o usuário existe
-        if users_df[users_df['email'] == email].empty:
+        user_row = users_df[users_df['email'] == email]
+        if user_row.empty:
             return False
         
         # Atualiza a senha
-        users_df.loc[users_df['email'] == email, 'senha'] = hash_password(new_password)
-        users_df.to_csv(USERS_FILE, index=False)
+        update_user(user_row['id'].iloc[0], {'senha': hash_password(new_password)})
         
         return True
     
@@ -0,0 +1,46 @@
+"""
+Conversas das coletas no sistema Coleta Seletiva Conectada
+
+Este módulo reúne o carregamento incremental do chat usado pelas páginas do
+morador e do catador: as mensagens já lidas ficam no estado da sessão e, a
+cada rerun, apenas as mensagens gravadas depois do último cursor são lidas
+do log da conversa.
+"""
+
+import pandas as pd
+import streamlit as st
+
+from app.utils.database import CHAT_COLUNAS, get_chat_messages
+
+
+def carregar_chat(coleta_id):
+    """
+    Carrega a conversa de uma coleta, lendo do log apenas as mensagens novas
+    desde o último rerun.
+
+    Args:
+        coleta_id (int): ID da coleta
+
+    Returns:
+        DataFrame: Mensagens da conversa, em ordem de envio (vazio se o log
+        não puder ser lido; o erro é mostrado na página)
+    """
+    chave = f'chat_cache_{coleta_id}'
+    anterior = st.session_state.get(chave)
+    try:
+        novas = get_chat_messages(coleta_id, since=anterior['cursor'] if anterior else None)
+    except (OSError, ValueError) as e:
+        st.error(f"Não foi possível carregar a conversa: {e}")
+        return anterior['mensagens'] if anterior else pd.DataFrame(columns=CHAT_COLUNAS)
+
+    if anterior is not None and novas.attrs.get('desde') == anterior['cursor']:
+        # Mesmo log: acrescentar as mensagens novas às já carregadas
+        if novas.empty:
+            mensagens = anterior['mensagens']
+        else:
+            mensagens = pd.concat([anterior['mensagens'], novas], ignore_index=True)
+    else:
+        mensagens = novas
+
+    st.session_state[chave] = {'cursor': novas.attrs.get('cursor', 0), 'mensagens': mensagens}
+    return mensagens
@@ -8,9 +8,44 @@ usuários, coletas, notificações e conteúdo educativo.
 import pandas as pd
 import os
 import sys
+import io
+import csv
 import json
+import threading
+import contextlib
+import copy
+import functools
+import bisect
+import heapq
+import itertools
+import queue
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from datetime import datetime
 
+# Travas de arquivo entre processos (fcntl no Linux/macOS, msvcrt no Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from app.utils import sqlite_backend
+from app.utils.schema import ESQUEMAS, COLUNA_VERSAO, aplicar_esquema, preparar_valor, normalizar_registro
+
+# Importações do pyarrow (snapshot Parquet) com tratamento de erro
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pa = None
+    pq = None
+    PARQUET_AVAILABLE = False
+
 # Definições de caminhos base para facilitar referências a arquivos
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
@@ -18,93 +53,323 @@ USERS_FILE = os.path.join(DATA_DIR, 'usuarios.csv')
 COLETAS_FILE = os.path.join(DATA_DIR, 'coletas.csv')
 NOTIFICACOES_FILE = os.path.join(DATA_DIR, 'notificacoes.csv')
 CONTEUDO_FILE = os.path.join(DATA_DIR, 'conteudo_educativo.json')
+SQLITE_FILE = os.path.join(DATA_DIR, 'coleta_seletiva.db')
+
+# Backend de armazenamento: 'csv' (padrão) ou 'sqlite'
+STORAGE_BACKEND = os.environ.get('COLETA_STORAGE_BACKEND', 'csv').strip().lower()
+
+# Arquivos CSV de cada tabela (origem da importação para o SQLite)
+TABELAS_CSV = {
+    'usuarios': USERS_FILE,
+    'coletas': COLETAS_FILE,
+    'notificacoes': NOTIFICACOES_FILE,
+}
+_TABELA_POR_ARQUIVO = {path: tabela for tabela, path in TABELAS_CSV.items()}
+
+_sqlite_lock = threading.Lock()
+_sqlite_pronto = False
+
+# Escrita incremental: novas coletas e notificações são anexadas a um arquivo
+# auxiliar (<tabela>.append.csv) e incorporadas ao CSV principal pela compactação
+APPEND_MODE = os.environ.get('COLETA_APPEND_MODE', '1') != '0'
+# Tamanho do arquivo auxiliar (bytes) a partir do qual a compactação é disparada
+APPEND_COMPACT_MAX_BYTES = int(os.environ.get('COLETA_APPEND_COMPACT_MAX_BYTES', 256 * 1024))
+
+# Tabelas com compactação em segundo plano já disparada (uma por vez por tabela)
+_compactacoes_pendentes = set()
+_compactacao_lock = threading.Lock()
+
+_table_locks = {}
+_table_locks_guard = threading.Lock()
+
+# Cache de leitura compartilhado entre as sessões: caminho -> (assinatura, DataFrame)
+_cache_tabelas = {}
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0}
+# Índices derivados das tabelas (ex.: usuários por ID): caminho -> (assinatura, DataFrame)
+_cache_indices = {}
+# Resultados memorizados por versão dos dados: (função, argumentos) -> (versões, resultado)
+_cache_por_versao = {}
+
+# Snapshots colunares (Parquet) usados pelas estatísticas do administrador
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'snapshots')
+# Segundos entre uma escrita e a regravação do snapshot (agrupa escritas seguidas)
+SNAPSHOT_INTERVALO = float(os.environ.get('COLETA_SNAPSHOT_INTERVALO', 5))
+# Chave dos metadados Parquet com a assinatura da origem do snapshot
+SNAPSHOT_META_KEY = b'coleta_seletiva_origem'
+
+_snapshot_timers = {}
+_snapshot_lock = threading.Lock()
+
+# Contexto de dados da execução atual da página (uma thread por sessão no Streamlit)
+_contexto_local = threading.local()
+
+# Índices JSON derivados das tabelas já lidos: caminho -> (assinatura, conteúdo)
+_indices_json_cache = {}
+
+# Caixas de entrada: uma cópia das notificações de cada destinatário
+# (caixas_notificacoes/usuario_<id>.csv) e um índice com os contadores de não lidas
+CAIXAS_DIR = os.path.join(DATA_DIR, 'caixas_notificacoes')
+INDICE_CAIXAS_FILE = os.path.join(CAIXAS_DIR, 'indice.json')
+
+# Contadores de coletas por morador, catador, bairro e no total (painéis de KPIs)
+INDICADORES_FILE = os.path.join(DATA_DIR, 'indicadores_coletas.json')
+# Escopo -> coluna das coletas que define o grupo
+ESCOPOS_INDICADORES = {
+    'geral': 'geral',
+    'morador': 'morador_id',
+    'catador': 'catador_id',
+    'bairro': 'bairro',
+}
+
+# Arquivo das coletas encerradas: partições mensais compactadas
+# (arquivo_coletas/coletas_<AAAA-MM>.csv.gz) e um índice com o resumo de cada uma
+ARQUIVO_COLETAS_DIR = os.path.join(DATA_DIR, 'arquivo_coletas')
+INDICE_ARQUIVO_FILE = os.path.join(ARQUIVO_COLETAS_DIR, 'indice.json')
+# Idade mínima (em dias) de uma coleta encerrada para ir para o arquivo
+ARQUIVAMENTO_DIAS = int(os.environ.get('COLETA_ARQUIVAMENTO_DIAS', 180))
+# Status das coletas encerradas, que podem ser arquivadas
+STATUS_ARQUIVAVEIS = ['concluida', 'recusada']
+# Datas usadas (em ordem de preferência) para a idade e a partição da coleta
+COLUNAS_DATA_ARQUIVO = ['data_conclusao', 'data_coleta', 'data_criacao', 'data_solicitacao']
+
+# Edição pontual: alterações de uma linha que mantêm o tamanho dela em bytes
+# (ex.: 'lida', 'status') sobrescrevem só a linha no CSV, localizada pelo índice
+# de posições (<tabela>.pos.json: id -> deslocamento e tamanho da linha)
+EDICAO_NO_LUGAR = os.environ.get('COLETA_EDICAO_NO_LUGAR', '1') != '0'
+
+# Leitura em blocos: consultas a tabelas a partir deste tamanho (bytes, CSV
+# principal + anexos) leem o arquivo em blocos de linhas e filtram cada bloco,
+# sem carregar a tabela inteira na memória
+STREAMING_MIN_BYTES = int(os.environ.get('COLETA_STREAMING_MIN_BYTES', 64 * 1024 * 1024))
+# Linhas por bloco na leitura em blocos
+STREAMING_BLOCO_LINHAS = int(os.environ.get('COLETA_STREAMING_BLOCO_LINHAS', 50000))
+
+# Índice em memória das coletas abertas (sem catador), por bairro e da mais
+# recente para a mais antiga; atualizado a cada escrita nas coletas
+_coletas_abertas = None
+_coletas_abertas_lock = threading.Lock()
+
+# Gravação agrupada (group commit): as mutações das sessões vão para uma fila e
+# um único escritor em segundo plano grava juntas as que chegam na mesma janela
+GROUP_COMMIT = os.environ.get('COLETA_GROUP_COMMIT', '1') != '0'
+# Janela (milissegundos) para reunir mutações concorrentes numa só gravação
+GROUP_COMMIT_JANELA_MS = float(os.environ.get('COLETA_GROUP_COMMIT_JANELA_MS', 5))
+# Máximo de lotes reunidos numa mesma gravação
+GROUP_COMMIT_MAX_LOTES = int(os.environ.get('COLETA_GROUP_COMMIT_MAX_LOTES', 256))
+# Tempo máximo (segundos) que uma sessão aguarda o escritor
+GROUP_COMMIT_TIMEOUT = float(os.environ.get('COLETA_GROUP_COMMIT_TIMEOUT', 30))
+_fila_gravacao = queue.Queue()
+_escritor = None
+_gravacao_lock = threading.Lock()
+_gravacao_stats = {'lotes': 0, 'gravacoes': 0}
+
+# Conversas do chat: um log somente de inclusão por coleta (chats/coleta_<id>.csv)
+CHAT_DIR = os.path.join(DATA_DIR, 'chats')
+CHAT_COLUNAS = [
+    'id', 'coleta_id', 'remetente_id', 'remetente_tipo',
+    'destinatario_id', 'destinatario_tipo', 'mensagem', 'data'
+]
+
+# Funções de contexto de dados por execução (rerun) da página
+
+def contexto_atual():
+    """Retorna o ContextoDados ativo na thread atual (ou None fora de uma execução da página)."""
+    return getattr(_contexto_local, 'contexto', None)
+
+def _memorizar_no_contexto(chave):
+    """
+    Decora uma função de carga para que o resultado seja reaproveitado enquanto
+    houver um ContextoDados ativo (no máximo uma leitura por execução da página).
+    
+    Args:
+        chave (str): Nome sob o qual o resultado é guardado no contexto
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def carregar():
+            contexto = contexto_atual()
+            if contexto is None:
+                return funcao()
+            if chave not in contexto.tabelas:
+                contexto.tabelas[chave] = funcao()
+            return _visao_somente_leitura(contexto.tabelas[chave])
+        return carregar
+    return decorador
+
+def _sem_contexto(funcao):
+    """
+    Decora funções que precisam ler as tabelas gravadas, e não as memorizadas
+    no contexto da execução (ex.: reconstrução de índices derivados).
+    """
+    @functools.wraps(funcao)
+    def executar(*args, **kwargs):
+        contexto = contexto_atual()
+        if contexto is None:
+            return funcao(*args, **kwargs)
+        _contexto_local.contexto = None
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            _contexto_local.contexto = contexto
+    return executar
+
+def _escrita(funcao):
+    """
+    Decora funções de escrita: leem as tabelas gravadas e, ao terminar,
+    descartam as tabelas memorizadas no contexto da execução.
+    """
+    sem_contexto = _sem_contexto(funcao)
+    
+    @functools.wraps(funcao)
+    def executar(*args, **kwargs):
+        try:
+            return sem_contexto(*args, **kwargs)
+        finally:
+            contexto = contexto_atual()
+            if contexto is not None:
+                contexto.tabelas.clear()
+    return executar
+
+# Funções do backend SQLite
+
+def importar_csv_para_sqlite(substituir=True):
+    """
+    Importa os arquivos app/data/*.csv para o banco SQLite.
+    
+    Args:
+        substituir (bool, optional): Se True, substitui o conteúdo atual das tabelas. Default é True.
+        
+    Returns:
+        dict: Nome da tabela -> quantidade de linhas importadas
+    """
+    # Incorporar linhas anexadas antes de ler os CSV
+    compactar_tabelas()
+    sqlite_backend.configure(SQLITE_FILE)
+    importadas = sqlite_backend.import_csv_files(TABELAS_CSV, substituir=substituir)
+    for tabela in importadas:
+        _registrar_escrita(tabela)
+    return importadas
+
+def _usar_sqlite():
+    """
+    Indica se o backend SQLite está ativo. Na primeira chamada, cria o banco
+    importando os CSV existentes.
+    
+    Returns:
+        bool: True se os dados devem ser lidos/gravados no SQLite
+    """
+    global _sqlite_pronto
+    if STORAGE_BACKEND != 'sqlite':
+        return False
+    if not _sqlite_pronto:
+        with _sqlite_lock:
+            if not _sqlite_pronto:
+                sqlite_backend.configure(SQLITE_FILE)
+                if not sqlite_backend.database_exists():
+                    importar_csv_para_sqlite()
+                _sqlite_pronto = True
+    return True
 
 # Funções de carregamento de dados
 
+@_memorizar_no_contexto('usuarios')
 def load_users():
     """
-    Carrega os usuários do arquivo CSV.
+    Carrega os usuários do armazenamento (CSV ou SQLite).
     
     Returns:
         DataFrame: DataFrame com os usuários
     """
-    if os.path.exists(USERS_FILE):
-        return pd.read_csv(USERS_FILE)
-    else:
-        # Criar arquivo se não existir
-        os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-        df = pd.DataFrame({
-            'id': [1, 2, 3, 4, 5],
-            'tipo': ['admin', 'catador', 'catador', 'morador', 'morador'],
-            'username': ['admin', 'catador1', 'catador2', 'morador1', 'morador2'],
-            'senha': ['admin', 'admin', 'admin', 'admin', 'admin'],
-            'nome': ['Administrador', 'João Silva', 'Maria Santos', 'Ana Oliveira', 'Carlos Pereira'],
-            'email': ['admin@prefeitura.gov.br', 'joao@email.com', 'maria@email.com', 'ana@email.com', 'carlos@email.com'],
-            'telefone': ['123456789', '987654321', '912345678', '998765432', '987651234'],
-            'endereco': ['Prefeitura Municipal', 'Rua das Flores 123', 'Av Principal 456', 'Rua dos Ipês 789', 'Av das Palmeiras 321'],
-            'bairro': ['Centro', 'Jardim Primavera', 'Vila Nova', 'Centro', 'Jardim Primavera'],
-            'areas_atuacao': ['', 'Zona Norte;Centro', 'Zona Sul;Jardim Primavera', '', ''],
-            'status': ['ativo', 'ativo', 'ativo', 'ativo', 'ativo'],
-            'data_cadastro': ['2023-01-01', '2023-01-01', '2023-01-01', '2023-01-01', '2023-01-01'],
-            'ultimo_login': ['', '', '', '', ''],
-            'foto_perfil': ['', '', '', '', '']
-        })
-        df.to_csv(USERS_FILE, index=False)
-        return df
+    if _usar_sqlite():
+        if sqlite_backend.table_exists('usuarios'):
+            return aplicar_esquema(sqlite_backend.load_table('usuarios'), 'usuarios')
+    elif os.path.exists(USERS_FILE):
+        return _read_csv_table(USERS_FILE)
+    
+    # Criar dados padrão se não existirem
+    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
+    df = pd.DataFrame({
+        'id': [1, 2, 3, 4, 5],
+        'tipo': ['admin', 'catador', 'catador', 'morador', 'morador'],
+        'username': ['admin', 'catador1', 'catador2', 'morador1', 'morador2'],
+        'senha': ['admin', 'admin', 'admin', 'admin', 'admin'],
+        'nome': ['Administrador', 'João Silva', 'Maria Santos', 'Ana Oliveira', 'Carlos Pereira'],
+        'email': ['admin@prefeitura.gov.br', 'joao@email.com', 'maria@email.com', 'ana@email.com', 'carlos@email.com'],
+        'telefone': ['123456789', '987654321', '912345678', '998765432', '987651234'],
+        'endereco': ['Prefeitura Municipal', 'Rua das Flores 123', 'Av Principal 456', 'Rua dos Ipês 789', 'Av das Palmeiras 321'],
+        'bairro': ['Centro', 'Jardim Primavera', 'Vila Nova', 'Centro', 'Jardim Primavera'],
+        'areas_atuacao': ['', 'Zona Norte;Centro', 'Zona Sul;Jardim Primavera', '', ''],
+        'status': ['ativo', 'ativo', 'ativo', 'ativo', 'ativo'],
+        'data_cadastro': ['2023-01-01', '2023-01-01', '2023-01-01', '2023-01-01', '2023-01-01'],
+        'ultimo_login': ['', '', '', '', ''],
+        'foto_perfil': ['', '', '', '', '']
+    })
+    save_users(df)
+    return aplicar_esquema(df, 'usuarios')
 
+@_memorizar_no_contexto('coletas')
 def load_coletas():
     """
-    Carrega as coletas do arquivo CSV.
+    Carrega as coletas do armazenamento (CSV ou SQLite).
     
     Returns:
         DataFrame: DataFrame com as coletas
     """
-    if os.path.exists(COLETAS_FILE):
-        return pd.read_csv(COLETAS_FILE)
-    else:
-        # Criar arquivo se não existir
-        os.makedirs(os.path.dirname(COLETAS_FILE), exist_ok=True)
-        df = pd.DataFrame({
-            'id': [1, 2],
-            'morador_id': [4, 5],
-            'catador_id': [2, 3],
-            'data': ['2025-07-01', '2025-07-02'],
-            'hora': ['10:00', '15:00'],
-            'endereco': ['Rua dos Ipês 789', 'Av das Palmeiras 321'],
-            'bairro': ['Centro', 'Jardim Primavera'],
-            'status': ['pendente', 'pendente'],
-            'tipo_material': ['Plástico;Papel', 'Vidro;Metal'],
-            'volume_estimado': ['Médio', 'Pequeno'],
-            'observacoes': ['', ''],
-            'avaliacao': [0, 0],
-            'data_criacao': ['2025-06-01', '2025-06-01']
-        })
-        df.to_csv(COLETAS_FILE, index=False)
-        return df
+    if _usar_sqlite():
+        if sqlite_backend.table_exists('coletas'):
+            return aplicar_esquema(sqlite_backend.load_table('coletas'), 'coletas')
+    elif os.path.exists(COLETAS_FILE):
+        return _read_csv_table(COLETAS_FILE)
+    
+    # Criar dados padrão se não existirem
+    os.makedirs(os.path.dirname(COLETAS_FILE), exist_ok=True)
+    df = pd.DataFrame({
+        'id': [1, 2],
+        'morador_id': [4, 5],
+        'catador_id': [2, 3],
+        'data_coleta': ['2025-07-01', '2025-07-02'],
+        'horario_coleta': ['10:00', '15:00'],
+        'endereco_coleta': ['Rua dos Ipês 789', 'Av das Palmeiras 321'],
+        'bairro': ['Centro', 'Jardim Primavera'],
+        'status': ['pendente', 'pendente'],
+        'tipos_materiais': ['Plástico, Papel', 'Vidro, Metal'],
+        'peso_kg': [None, None],
+        'volume_estimado': ['Médio', 'Pequeno'],
+        'observacoes': ['', ''],
+        'avaliacao': [0, 0],
+        'data_criacao': ['2025-06-01', '2025-06-01']
+    })
+    save_coletas(df)
+    return aplicar_esquema(df, 'coletas')
 
+@_memorizar_no_contexto('notificacoes')
 def load_notificacoes():
     """
-    Carrega as notificações do arquivo CSV.
+    Carrega as notificações do armazenamento (CSV ou SQLite).
     
     Returns:
         DataFrame: DataFrame com as notificações
     """
-    if os.path.exists(NOTIFICACOES_FILE):
-        return pd.read_csv(NOTIFICACOES_FILE)
-    else:
-        # Criar arquivo se não existir
-        os.makedirs(os.path.dirname(NOTIFICACOES_FILE), exist_ok=True)
-        df = pd.DataFrame({
-            'id': [1, 2],
-            'para_usuario_id': [2, 3],
-            'de_usuario_id': [4, 5],
-            'mensagem': ['Tenho materiais recicláveis para coleta.', 'Por favor passe para coletar materiais recicláveis.'],
-            'data': ['2025-07-01', '2025-07-02'],
-            'lida': [False, False],
-            'tipo': ['coleta', 'coleta']
-        })
-        df.to_csv(NOTIFICACOES_FILE, index=False)
-        return df
+    if _usar_sqlite():
+        if sqlite_backend.table_exists('notificacoes'):
+            return aplicar_esquema(sqlite_backend.load_table('notificacoes'), 'notificacoes')
+    elif os.path.exists(NOTIFICACOES_FILE):
+        return _read_csv_table(NOTIFICACOES_FILE)
+    
+    # Criar dados padrão se não existirem
+    os.makedirs(os.path.dirname(NOTIFICACOES_FILE), exist_ok=True)
+    df = pd.DataFrame({
+        'id': [1, 2],
+        'para_usuario_id': [2, 3],
+        'de_usuario_id': [4, 5],
+        'mensagem': ['Tenho materiais recicláveis para coleta.', 'Por favor passe para coletar materiais recicláveis.'],
+        'data': ['2025-07-01', '2025-07-02'],
+        'lida': [False, False],
+        'tipo': ['coleta', 'coleta']
+    })
+    save_notificacoes(df)
+    return aplicar_esquema(df, 'notificacoes')
 
 def load_conteudo_educativo():
     """
@@ -152,47 +417,2149 @@ def load_conteudo_educativo():
             json.dump(conteudo_default, f, ensure_ascii=False, indent=4)
         return conteudo_default
 
+# Função que carrega cada tabela
+FUNCOES_CARGA = {
+    'usuarios': load_users,
+    'coletas': load_coletas,
+    'notificacoes': load_notificacoes,
+}
+
+# Tabelas com snapshot colunar e a função que carrega cada uma
+SNAPSHOT_TABELAS = {
+    'coletas': load_coletas,
+    'usuarios': load_users,
+}
+
 # Funções de salvamento de dados
 
+@_escrita
 def save_users(df):
     """
-    Salva os usuários no arquivo CSV.
+    Salva os usuários no armazenamento (CSV ou SQLite).
     
     Args:
         df (DataFrame): DataFrame com os usuários
     """
-    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-    df.to_csv(USERS_FILE, index=False)
+    if _usar_sqlite():
+        sqlite_backend.replace_table('usuarios', aplicar_esquema(df, 'usuarios'))
+        _registrar_escrita('usuarios')
+        return
+    _write_csv_table(USERS_FILE, df)
 
+@_escrita
 def save_coletas(df):
     """
-    Salva as coletas no arquivo CSV.
+    Salva as coletas no armazenamento (CSV ou SQLite).
     
     Args:
         df (DataFrame): DataFrame com as coletas
     """
-    os.makedirs(os.path.dirname(COLETAS_FILE), exist_ok=True)
-    df.to_csv(COLETAS_FILE, index=False)
+    if _usar_sqlite():
+        sqlite_backend.replace_table('coletas', aplicar_esquema(df, 'coletas'))
+        _registrar_escrita('coletas')
+        return
+    _write_csv_table(COLETAS_FILE, df)
 
-def save_notificacoes(df):
+@_escrita
+def save_notificacoes(df, destinatarios=None):
     """
-    Salva as notificações no arquivo CSV.
+    Salva as notificações no armazenamento (CSV ou SQLite).
     
     Args:
         df (DataFrame): DataFrame com as notificações
+        destinatarios (set, optional): IDs dos destinatários cujas notificações
+            mudaram; sem eles, todas as caixas de entrada são conferidas.
     """
-    os.makedirs(os.path.dirname(NOTIFICACOES_FILE), exist_ok=True)
-    df.to_csv(NOTIFICACOES_FILE, index=False)
+    if _usar_sqlite():
+        sqlite_backend.replace_table('notificacoes', aplicar_esquema(df, 'notificacoes'))
+        _registrar_escrita('notificacoes')
+        return
+    _write_csv_table(NOTIFICACOES_FILE, df, destinatarios=destinatarios)
 
 def save_conteudo_educativo(df):
     """
     Salva o conteúdo educativo no arquivo CSV.
     
-    Args:
-        df (DataFrame): DataFrame com o conteúdo educativo
-    """
-    os.makedirs(os.path.dirname(CONTEUDO_FILE), exist_ok=True)
-    df.to_csv(CONTEUDO_FILE, index=False)
+    Args:
+        df (DataFrame): DataFrame com o conteúdo educativo
+    """
+    os.makedirs(os.path.dirname(CONTEUDO_FILE), exist_ok=True)
+    df.to_csv(CONTEUDO_FILE, index=False)
+
+# Funções de cache de leitura
+
+def _assinatura_arquivo(path):
+    """Retorna (mtime_ns, tamanho) do arquivo, ou None se ele não existir."""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+def _assinatura_tabela(path):
+    """
+    Identifica a versão em disco de uma tabela: CSV principal e linhas anexadas.
+    
+    Args:
+        path (str): Caminho do CSV principal
+        
+    Returns:
+        tuple: Assinaturas (mtime_ns, tamanho) dos dois arquivos
+    """
+    return (_assinatura_arquivo(path), _assinatura_arquivo(_append_path(path)))
+
+def _copy_on_write_ativo():
+    """Indica se o pandas usa Copy-on-Write (padrão a partir do pandas 3.0)."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return getattr(pd.options.mode, 'copy_on_write', False) is True
+
+def _visao_somente_leitura(df):
+    """
+    Retorna uma cópia do DataFrame em cache que pode ser alterada sem afetá-lo.
+    
+    Com Copy-on-Write a cópia rasa compartilha os dados e só copia o que for
+    modificado; nas versões antigas do pandas é feita uma cópia completa.
+    
+    Args:
+        df (DataFrame): DataFrame armazenado no cache
+        
+    Returns:
+        DataFrame: Visão do DataFrame
+    """
+    return df.copy(deep=not _copy_on_write_ativo())
+
+def invalidar_cache(path=None):
+    """
+    Remove uma tabela (ou todas) do cache de leitura.
+    
+    Args:
+        path (str, optional): Caminho do CSV. Se None, limpa o cache inteiro.
+    """
+    with _cache_lock:
+        if path is None:
+            _cache_tabelas.clear()
+            _cache_indices.clear()
+        else:
+            _cache_tabelas.pop(path, None)
+            _cache_indices.pop(path, None)
+
+def get_cache_stats():
+    """
+    Retorna os contadores do cache de leitura.
+    
+    Returns:
+        dict: Acertos ('hits'), faltas ('misses') e tabelas em cache ('tabelas')
+    """
+    with _cache_lock:
+        return {
+            'hits': _cache_stats['hits'],
+            'misses': _cache_stats['misses'],
+            'tabelas': len(_cache_tabelas),
+        }
+
+# Funções de escrita incremental (append-only)
+
+def _lock_tabela(path):
+    """
+    Retorna o lock (reentrante) que serializa as escritas em um arquivo de tabela.
+    
+    Args:
+        path (str): Caminho do CSV principal da tabela
+        
+    Returns:
+        threading.RLock: Lock da tabela
+    """
+    with _table_locks_guard:
+        return _table_locks.setdefault(path, threading.RLock())
+
+def _append_path(path):
+    """Retorna o caminho do arquivo de linhas anexadas de uma tabela CSV."""
+    return os.path.splitext(path)[0] + '.append.csv'
+
+def _seq_path(path):
+    """Retorna o caminho do arquivo com o último ID gerado para a tabela."""
+    return os.path.splitext(path)[0] + '.seq'
+
+def _read_header(path):
+    """
+    Lê apenas a linha de cabeçalho de um CSV.
+    
+    Args:
+        path (str): Caminho do arquivo
+        
+    Returns:
+        list: Nomes das colunas (vazio se o arquivo não existir)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return next(csv.reader(f), [])
+    except FileNotFoundError:
+        return []
+
+def _read_csv_table(path):
+    """
+    Lê uma tabela CSV usando o cache compartilhado quando o arquivo não mudou.
+    
+    Args:
+        path (str): Caminho do CSV principal
+        
+    Returns:
+        DataFrame: Conteúdo completo da tabela (visão somente leitura do cache)
+    """
+    assinatura = _assinatura_tabela(path)
+    with _cache_lock:
+        entrada = _cache_tabelas.get(path)
+        if entrada is not None and entrada[0] == assinatura:
+            _cache_stats['hits'] += 1
+            return _visao_somente_leitura(entrada[1])
+        _cache_stats['misses'] += 1
+    
+    df = _parse_csv_table(path)
+    with _cache_lock:
+        _cache_tabelas[path] = (assinatura, df)
+    return _visao_somente_leitura(df)
+
+def _tabela_do_arquivo(path):
+    """Retorna o nome da tabela de um CSV (as caixas de entrada são notificações)."""
+    if os.path.dirname(path) == CAIXAS_DIR:
+        return 'notificacoes'
+    return _TABELA_POR_ARQUIVO.get(path)
+
+def _parse_csv_table(path):
+    """
+    Lê o CSV principal de uma tabela somado às linhas anexadas ainda não compactadas.
+    
+    Args:
+        path (str): Caminho do CSV principal
+        
+    Returns:
+        DataFrame: Conteúdo completo da tabela
+    """
+    tabela = _tabela_do_arquivo(path)
+    categorias = {
+        coluna: 'category'
+        for coluna, tipo in ESQUEMAS.get(tabela, {}).items() if tipo == 'categoria'
+    }
+    colunas = _read_header(path)
+    df = pd.read_csv(path, dtype={c: t for c, t in categorias.items() if c in colunas})
+    append_path = _append_path(path)
+    if os.path.exists(append_path) and os.path.getsize(append_path) > 0:
+        anexos = pd.read_csv(append_path, header=None, names=list(df.columns))
+        df = anexos if df.empty else pd.concat([df, anexos], ignore_index=True)
+    return aplicar_esquema(df, tabela)
+
+def _para_csv(df, tabela):
+    """
+    Prepara um DataFrame tipado para to_csv: booleanos viram 0/1, de largura
+    fixa, para que _sobrescrever_linha possa alterá-los no lugar.
+    
+    Args:
+        df (DataFrame): DataFrame com os tipos do esquema
+        tabela (str): Nome da tabela
+        
+    Returns:
+        DataFrame: DataFrame a gravar
+    """
+    booleanas = {coluna: df[coluna].astype('int8')
+                 for coluna, tipo in ESQUEMAS.get(tabela, {}).items()
+                 if tipo == 'booleano' and coluna in df.columns and df[coluna].dtype == bool}
+    return df.assign(**booleanas) if booleanas else df
+
+def _write_csv_table(path, df, nova_versao=True, destinatarios=None):
+    """
+    Regrava o CSV principal de uma tabela e descarta as linhas anexadas,
+    que já estão contidas no DataFrame.
+    
+    Args:
+        path (str): Caminho do CSV principal
+        df (DataFrame): Conteúdo completo da tabela
+        nova_versao (bool, optional): Incrementar a versão dos dados da tabela.
+            Default é True (False quando o conteúdo não muda, ex.: compactação).
+        destinatarios (set, optional): Notificações: IDs dos destinatários cujas
+            linhas mudaram nesta gravação; só as caixas deles são regravadas.
+            Default é None (sincronização completa das caixas).
+    """
+    with _lock_tabela(path):
+        origem_antes = _origem_tabela(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df = aplicar_esquema(df, _TABELA_POR_ARQUIVO.get(path))
+        # Gravar em arquivo temporário e substituir: leitores nunca veem o arquivo pela metade
+        temp_path = path + '.tmp'
+        _para_csv(df, _TABELA_POR_ARQUIVO.get(path)).to_csv(temp_path, index=False)
+        os.replace(temp_path, path)
+        append_path = _append_path(path)
+        if os.path.exists(append_path):
+            os.remove(append_path)
+        invalidar_cache(path)
+        _sincronizar_sequencia(path, df)
+        if path == NOTIFICACOES_FILE:
+            if destinatarios is None or not _atualizar_caixas(df, destinatarios, origem_antes):
+                _sincronizar_caixas(df)
+        if nova_versao:
+            _registrar_escrita(_TABELA_POR_ARQUIVO.get(path))
+    _agendar_snapshot(path)
+
+def _formatar_valor_csv(valor):
+    """Converte um valor para o texto gravado por _write_csv_table (booleanos como 0/1)."""
+    if valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return ''
+    if isinstance(valor, pd.Timestamp):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if hasattr(valor, 'item'):
+        valor = valor.item()
+    if isinstance(valor, bool):
+        return '1' if valor else '0'
+    return str(valor)
+
+def _append_row(path, registro):
+    """
+    Anexa uma única linha à tabela com uma só escrita bufferizada.
+    
+    Args:
+        path (str): Caminho do CSV principal
+        registro (dict): Dados da linha
+        
+    Returns:
+        bool: True se a linha foi anexada; False se for necessário regravar
+        a tabela (arquivo inexistente ou colunas novas)
+    """
+    with _lock_tabela(path):
+        colunas = _read_header(path)
+        if not colunas or any(chave not in colunas for chave in registro):
+            return False
+        
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator=os.linesep).writerow(
+            [_formatar_valor_csv(registro.get(coluna)) for coluna in colunas]
+        )
+        origem_antes = _origem_tabela(path)
+        with open(_append_path(path), 'a', encoding='utf-8', newline='') as f:
+            f.write(buffer.getvalue())
+        invalidar_cache(path)
+        if path == NOTIFICACOES_FILE:
+            _anexar_na_caixa(colunas, registro, buffer.getvalue(), origem_antes)
+        elif path == COLETAS_FILE:
+            novas = aplicar_esquema(pd.DataFrame([registro]), 'coletas')
+            _atualizar_indicadores(None, novas, origem_antes)
+            _atualizar_coletas_abertas(novas, origem_antes)
+        _registrar_escrita(_TABELA_POR_ARQUIVO.get(path))
+    
+    _agendar_compactacao(path)
+    _agendar_snapshot(path)
+    return True
+
+def _agendar_compactacao(path):
+    """Dispara a compactação em segundo plano quando o arquivo anexo fica grande."""
+    try:
+        tamanho = os.path.getsize(_append_path(path))
+    except OSError:
+        return
+    if tamanho < APPEND_COMPACT_MAX_BYTES:
+        return
+    with _compactacao_lock:
+        if path in _compactacoes_pendentes:
+            return
+        _compactacoes_pendentes.add(path)
+    threading.Thread(target=_executar_compactacao_agendada, args=(path,), daemon=True).start()
+
+def _executar_compactacao_agendada(path):
+    """Executa a compactação disparada em segundo plano e libera a tabela para a próxima."""
+    try:
+        compactar_tabela(path)
+    finally:
+        with _compactacao_lock:
+            _compactacoes_pendentes.discard(path)
+
+def compactar_tabela(path):
+    """
+    Incorpora as linhas anexadas ao CSV principal da tabela.
+    
+    Args:
+        path (str): Caminho do CSV principal
+        
+    Returns:
+        bool: True se havia linhas para compactar
+    """
+    with _lock_tabela(path):
+        if not os.path.exists(path) or not os.path.exists(_append_path(path)):
+            return False
+        origem_antes = _origem_tabela(path)
+        _write_csv_table(path, _read_csv_table(path), nova_versao=False)
+        if path == COLETAS_FILE:
+            # Conteúdo inalterado: os indicadores continuam válidos para o novo arquivo
+            _atualizar_indicadores(None, pd.DataFrame(), origem_antes)
+            _atualizar_coletas_abertas(pd.DataFrame(), origem_antes)
+        return True
+
+def compactar_tabelas():
+    """
+    Compacta as tabelas com escrita incremental (coletas e notificações).
+    
+    Returns:
+        dict: Caminho do arquivo -> True se houve compactação
+    """
+    return {path: compactar_tabela(path) for path in (COLETAS_FILE, NOTIFICACOES_FILE)}
+
+# Funções de leitura e edição pontual (índice de posições das linhas no CSV)
+
+def _posicoes_path(path):
+    """Retorna o caminho do índice de posições (sidecar) de um CSV."""
+    return os.path.splitext(path)[0] + '.pos.json'
+
+def _identidade_arquivo(path):
+    """
+    Identifica o conteúdo estrutural de um CSV: inode e tamanho.
+    
+    A regravação completa (os.replace) troca o inode; a edição pontual mantém
+    inode e tamanho, então as posições das linhas continuam válidas.
+    
+    Returns:
+        list: [inode, tamanho] (None se o arquivo não existir)
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_ino, stat.st_size]
+
+def _construir_posicoes(path):
+    """
+    Percorre o CSV uma vez anotando onde começa cada linha (registros com
+    quebras de linha entre aspas ocupam várias linhas físicas).
+    
+    Args:
+        path (str): Caminho do CSV
+        
+    Returns:
+        dict: {'origem', 'colunas', 'linhas': {id: [deslocamento, tamanho]}}
+    """
+    linhas = {}
+    with open(path, 'rb') as f:
+        origem = [os.fstat(f.fileno()).st_ino, os.fstat(f.fileno()).st_size]
+        cabecalho = f.readline()
+        colunas = next(csv.reader(io.StringIO(cabecalho.decode('utf-8'))), [])
+        pos_id = colunas.index('id') if 'id' in colunas else None
+        inicio = f.tell()
+        partes = []
+        aspas = 0
+        for linha in iter(f.readline, b''):
+            partes.append(linha)
+            aspas += linha.count(b'"')
+            if aspas % 2:
+                continue
+            registro = b''.join(partes)
+            partes = []
+            aspas = 0
+            conteudo = registro.rstrip(b'\r\n')
+            campos = next(csv.reader(io.StringIO(conteudo.decode('utf-8'))), [])
+            if pos_id is not None and len(campos) > pos_id:
+                try:
+                    linhas[str(int(float(campos[pos_id])))] = [inicio, len(conteudo)]
+                except ValueError:
+                    pass
+            inicio += len(registro)
+    return {'origem': origem, 'colunas': colunas, 'linhas': linhas}
+
+def _obter_posicoes(path):
+    """
+    Retorna o índice de posições de um CSV, reconstruindo-o se o arquivo foi
+    regravado desde a última construção.
+    
+    Args:
+        path (str): Caminho do CSV
+        
+    Returns:
+        dict: Índice de posições (None se o CSV não existir)
+    """
+    origem = _identidade_arquivo(path)
+    if origem is None:
+        return None
+    indice = ler_indice_json(_posicoes_path(path), {'origem': None})
+    if indice.get('origem') == origem:
+        return indice
+    indice = _construir_posicoes(path)
+    gravar_indice_json(_posicoes_path(path), indice)
+    return indice
+
+def _ler_linha(path, row_id):
+    """
+    Lê os campos de uma única linha do CSV principal com seek.
+    
+    Args:
+        path (str): Caminho do CSV
+        row_id (int): ID da linha
+        
+    Returns:
+        tuple: (colunas, campos) ou None se a linha não estiver no arquivo principal
+    """
+    indice = _obter_posicoes(path)
+    if indice is None:
+        return None
+    posicao = indice['linhas'].get(str(int(row_id)))
+    if posicao is None:
+        return None
+    with open(path, 'rb') as f:
+        if [os.fstat(f.fileno()).st_ino, os.fstat(f.fileno()).st_size] != indice['origem']:
+            # Arquivo regravado entre a leitura do índice e a abertura
+            return None
+        f.seek(posicao[0])
+        conteudo = f.read(posicao[1])
+    return indice['colunas'], next(csv.reader(io.StringIO(conteudo.decode('utf-8'))), [])
+
+def _linhas_para_df(colunas, linhas, tabela):
+    """Converte linhas de campos (texto do CSV) em DataFrame com o esquema aplicado."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(colunas)
+    escritor.writerows(linhas)
+    buffer.seek(0)
+    return aplicar_esquema(pd.read_csv(buffer), tabela)
+
+def _sobrescrever_linha(path, tabela, row_id, dados):
+    """
+    Sobrescreve uma linha do CSV no lugar, se a versão alterada tiver o mesmo
+    tamanho em bytes. Os booleanos são gravados como 0/1 (largura fixa); linhas
+    de arquivos antigos, com 'True'/'False', mudam de tamanho e são regravadas
+    pelo caminho normal, que já grava 0/1.
+    
+    Deve ser chamada com a trava da tabela.
+    
+    Args:
+        path (str): Caminho do CSV
+        tabela (str): Nome da tabela (esquema de tipos)
+        row_id (int): ID da linha
+        dados (dict): Colunas e novos valores
+        
+    Returns:
+        tuple: (colunas, campos antigos, campos novos) ou None se for preciso regravar a tabela
+    """
+    indice = _obter_posicoes(path)
+    if indice is None:
+        return None
+    posicao = indice['linhas'].get(str(int(row_id)))
+    colunas = indice['colunas']
+    alteradas = [c for c in dados if c not in ('id', COLUNA_VERSAO)]
+    if posicao is None or any(c not in colunas for c in alteradas):
+        return None
+    # Tabela versionada gravada antes da coluna de versão: regravar para criá-la
+    if any(tipo == 'versao' and c not in colunas for c, tipo in ESQUEMAS.get(tabela, {}).items()):
+        return None
+    
+    with open(path, 'r+b') as f:
+        if [os.fstat(f.fileno()).st_ino, os.fstat(f.fileno()).st_size] != indice['origem']:
+            return None
+        f.seek(posicao[0])
+        antigo = f.read(posicao[1])
+        antigos = next(csv.reader(io.StringIO(antigo.decode('utf-8'))), [])
+        if len(antigos) != len(colunas):
+            return None
+        
+        novos = list(antigos)
+        for coluna in alteradas:
+            novos[colunas.index(coluna)] = _formatar_valor_csv(dados[coluna])
+        if COLUNA_VERSAO in colunas:
+            i = colunas.index(COLUNA_VERSAO)
+            novos[i] = str(int(float(antigos[i] or 0)) + 1)
+        
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerow(novos)
+        novo = buffer.getvalue()[:-1].encode('utf-8')
+        if len(novo) != len(antigo):
+            return None
+        
+        f.seek(posicao[0])
+        f.write(novo)
+    return colunas, antigos, novos
+
+def _atualizar_caixa_no_lugar(row_id, dados, colunas, antigos, novos, origem_antes):
+    """
+    Repete na caixa de entrada do destinatário a edição pontual de uma
+    notificação e ajusta o contador de não lidas.
+    """
+    coluna = _coluna_destinatario(colunas)
+    destinatario = antigos[colunas.index(coluna)] if coluna else ''
+    with trava_arquivo(INDICE_CAIXAS_FILE + '.lock'):
+        indice = _ler_indice_caixas()
+        usuarios = dict(indice.get('usuarios', {}))
+        chave = str(int(float(destinatario))) if destinatario else None
+        if (indice.get('origem') != origem_antes or chave not in usuarios
+                or _sobrescrever_linha(_caixa_path(chave), 'notificacoes', row_id, dados) is None):
+            # Caixa desatualizada: ressincronizar na próxima leitura
+            _gravar_indice_caixas({'origem': None, 'usuarios': usuarios})
+            return
+        invalidar_cache(_caixa_path(chave))
+        
+        entrada = dict(usuarios[chave])
+        entrada['hash'] = None
+        if 'lida' in colunas:
+            i = colunas.index('lida')
+            lida_antes = antigos[i].strip().lower() in ('true', '1', '1.0')
+            lida_depois = novos[i].strip().lower() in ('true', '1', '1.0')
+            entrada['nao_lidas'] = entrada.get('nao_lidas', 0) + int(lida_antes) - int(lida_depois)
+        usuarios[chave] = entrada
+        _gravar_indice_caixas({'origem': _origem_tabela(NOTIFICACOES_FILE), 'usuarios': usuarios})
+
+@_escrita
+def _atualizar_no_lugar(tabela, row_id, dados):
+    """
+    Tenta gravar a alteração de uma linha sobrescrevendo apenas os seus bytes
+    no CSV, mantendo atualizados as caixas de entrada e os índices das coletas.
+    
+    Args:
+        tabela (str): Nome da tabela
+        row_id (int): ID da linha
+        dados (dict): Colunas e novos valores
+        
+    Returns:
+        bool: True se a alteração foi gravada; False se for preciso regravar a tabela
+    """
+    if not EDICAO_NO_LUGAR or _usar_sqlite() or tabela not in TABELAS_CSV:
+        return False
+    try:
+        row_id = int(row_id)
+    except (TypeError, ValueError):
+        return False
+    
+    path = TABELAS_CSV[tabela]
+    with _lock_tabela(path):
+        origem_antes = _origem_tabela(path)
+        resultado = _sobrescrever_linha(path, tabela, row_id, dados)
+        if resultado is None:
+            return False
+        colunas, antigos, novos = resultado
+        invalidar_cache(path)
+        
+        if tabela == 'notificacoes':
+            _atualizar_caixa_no_lugar(row_id, dados, colunas, antigos, novos, origem_antes)
+        elif tabela == 'coletas':
+            antes = _linhas_para_df(colunas, [antigos], 'coletas')
+            depois = _linhas_para_df(colunas, [novos], 'coletas')
+            _atualizar_indicadores(antes, depois, origem_antes)
+            _atualizar_coletas_abertas(depois, origem_antes)
+        _registrar_escrita(tabela)
+    
+    _agendar_snapshot(path)
+    return True
+
+def ler_registro(tabela, row_id):
+    """
+    Lê uma única linha pelo ID, posicionando a leitura direto nela no CSV em
+    vez de carregar a tabela inteira.
+    
+    Args:
+        tabela (str): Nome da tabela ('usuarios', 'coletas' ou 'notificacoes')
+        row_id (int): ID da linha
+        
+    Returns:
+        dict: Dados da linha (tipos do esquema) ou None se não existir
+    """
+    try:
+        row_id = int(row_id)
+    except (TypeError, ValueError):
+        return None
+    
+    if _usar_sqlite():
+        df = aplicar_esquema(sqlite_backend.select_rows(tabela, {'id': row_id}), tabela)
+    else:
+        linha = _ler_linha(TABELAS_CSV[tabela], row_id)
+        if linha is not None:
+            df = _linhas_para_df(linha[0], [linha[1]], tabela)
+        else:
+            # Linha ainda no arquivo de anexos (ou índice indisponível): leitura completa
+            df = FUNCOES_CARGA[tabela]()
+            df = df[df['id'] == row_id]
+    
+    if df.empty:
+        return None
+    registro = df.iloc[0].to_dict()
+    registro['id'] = row_id
+    return registro
+
+# Funções de leitura em blocos (consultas com memória limitada em tabelas grandes)
+
+def _tamanho_tabela(path):
+    """Retorna o tamanho em bytes do CSV principal somado ao das linhas anexadas."""
+    total = 0
+    for arquivo in (path, _append_path(path)):
+        try:
+            total += os.path.getsize(arquivo)
+        except OSError:
+            pass
+    return total
+
+def _usar_blocos(path):
+    """
+    Indica se as consultas a uma tabela devem ler o CSV em blocos: a tabela
+    passou de STREAMING_MIN_BYTES e não está no cache de leitura (nesse caso
+    filtrar o DataFrame em memória não custa nada).
+    
+    Args:
+        path (str): Caminho do CSV principal
+        
+    Returns:
+        bool: True para ler em blocos
+    """
+    if STREAMING_MIN_BYTES <= 0 or _tamanho_tabela(path) < STREAMING_MIN_BYTES:
+        return False
+    with _cache_lock:
+        entrada = _cache_tabelas.get(path)
+    return entrada is None or entrada[0] != _assinatura_tabela(path)
+
+def _ler_em_blocos(path):
+    """
+    Percorre uma tabela CSV (principal e linhas anexadas) em blocos de linhas.
+    
+    Os dois arquivos são abertos juntos sob o lock da tabela, para que uma
+    compactação durante a leitura não perca nem duplique linhas. Os blocos vêm
+    com os valores como gravados (sem o esquema aplicado).
+    
+    Args:
+        path (str): Caminho do CSV principal
+        
+    Yields:
+        DataFrame: Bloco com até STREAMING_BLOCO_LINHAS linhas
+    """
+    with _lock_tabela(path):
+        try:
+            principal = open(path, 'r', encoding='utf-8', newline='')
+        except FileNotFoundError:
+            return
+        try:
+            anexos = open(_append_path(path), 'r', encoding='utf-8', newline='')
+        except FileNotFoundError:
+            anexos = None
+    
+    with contextlib.ExitStack() as pilha:
+        pilha.enter_context(principal)
+        if anexos is not None:
+            pilha.enter_context(anexos)
+        
+        colunas = next(csv.reader(principal), [])
+        if not colunas:
+            return
+        principal.seek(0)
+        for bloco in pd.read_csv(principal, chunksize=STREAMING_BLOCO_LINHAS):
+            yield bloco
+        if anexos is not None and os.fstat(anexos.fileno()).st_size > 0:
+            for bloco in pd.read_csv(anexos, header=None, names=colunas, chunksize=STREAMING_BLOCO_LINHAS):
+                yield bloco
+
+def _filtrar_em_blocos(path, filtros):
+    """
+    Lê uma tabela em blocos, mantendo de cada bloco apenas as linhas que
+    atendem aos filtros.
+    
+    Args:
+        path (str): Caminho do CSV principal
+        filtros (dict): Coluna -> valor (igualdade) ou função que recebe a
+            coluna do bloco e retorna a máscara das linhas a manter
+        
+    Yields:
+        DataFrame: Linhas de cada bloco que atendem aos filtros
+    """
+    for bloco in _ler_em_blocos(path):
+        mascara = pd.Series(True, index=bloco.index)
+        for coluna, valor in filtros.items():
+            if coluna not in bloco.columns:
+                mascara[:] = False
+                break
+            if callable(valor):
+                mascara &= valor(bloco[coluna]).fillna(False).astype(bool)
+            else:
+                mascara &= bloco[coluna] == valor
+        if mascara.any():
+            yield bloco[mascara]
+
+def _consultar_em_blocos(path, filtros):
+    """
+    Retorna as linhas de uma tabela que atendem aos filtros, lendo o CSV em
+    blocos: a memória usada é a de um bloco mais a do resultado.
+    
+    Args:
+        path (str): Caminho do CSV principal
+        filtros (dict): Filtros aceitos por _filtrar_em_blocos
+        
+    Returns:
+        DataFrame: Linhas encontradas (com o esquema da tabela aplicado)
+    """
+    tabela = _tabela_do_arquivo(path)
+    partes = list(_filtrar_em_blocos(path, filtros))
+    if partes:
+        df = pd.concat(partes, ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=_read_header(path))
+    return aplicar_esquema(df, tabela)
+
+# Funções de snapshot colunar (Parquet) para análises
+
+def _assinatura_fonte(tabela):
+    """
+    Identifica a versão atual da origem de uma tabela (CSV ou banco SQLite).
+    
+    Args:
+        tabela (str): Nome da tabela
+        
+    Returns:
+        list: Assinaturas (mtime_ns, tamanho) dos arquivos de origem
+    """
+    if _usar_sqlite():
+        arquivos = (SQLITE_FILE, SQLITE_FILE + '-wal')
+    else:
+        arquivos = (TABELAS_CSV[tabela], _append_path(TABELAS_CSV[tabela]))
+    return [list(a) if a else None for a in map(_assinatura_arquivo, arquivos)]
+
+def _snapshot_path(tabela):
+    """Retorna o caminho do snapshot Parquet de uma tabela."""
+    return os.path.join(SNAPSHOT_DIR, f'{tabela}.parquet')
+
+def _snapshot_atualizado(tabela):
+    """
+    Verifica se o snapshot foi gerado a partir da versão atual da tabela,
+    lendo apenas o rodapé (metadados) do arquivo Parquet.
+    
+    Args:
+        tabela (str): Nome da tabela
+        
+    Returns:
+        bool: True se o snapshot existe e está atualizado
+    """
+    path = _snapshot_path(tabela)
+    if not os.path.exists(path):
+        return False
+    try:
+        metadados = pq.read_schema(path).metadata or {}
+        origem = json.loads(metadados.get(SNAPSHOT_META_KEY, b'null'))
+    except Exception:
+        return False
+    return origem == _assinatura_fonte(tabela)
+
+def atualizar_snapshot(tabela):
+    """
+    Regrava o snapshot Parquet de uma tabela a partir dos dados atuais.
+    
+    Args:
+        tabela (str): Nome da tabela ('coletas' ou 'usuarios')
+        
+    Returns:
+        bool: True se o snapshot foi gravado
+    """
+    if not PARQUET_AVAILABLE or tabela not in SNAPSHOT_TABELAS:
+        return False
+    
+    with _lock_tabela(_snapshot_path(tabela)):
+        # Assinatura obtida antes da leitura: escritas concorrentes deixam o snapshot desatualizado
+        origem = _assinatura_fonte(tabela)
+        df = SNAPSHOT_TABELAS[tabela]()
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            metadados = dict(table.schema.metadata or {})
+            metadados[SNAPSHOT_META_KEY] = json.dumps(origem).encode('utf-8')
+            table = table.replace_schema_metadata(metadados)
+            
+            os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+            path = _snapshot_path(tabela)
+            temp_path = path + '.tmp'
+            pq.write_table(table, temp_path)
+            os.replace(temp_path, path)
+            return True
+        except Exception as e:
+            print(f"Erro ao gravar snapshot de {tabela}: {e}")
+            return False
+
+def _agendar_snapshot(path):
+    """
+    Agenda a atualização do snapshot da tabela alguns segundos após a escrita,
+    agrupando várias escritas seguidas em uma única regravação.
+    
+    Args:
+        path (str): Caminho do CSV alterado
+    """
+    tabela = _TABELA_POR_ARQUIVO.get(path)
+    if not PARQUET_AVAILABLE or tabela not in SNAPSHOT_TABELAS:
+        return
+    with _snapshot_lock:
+        if tabela in _snapshot_timers:
+            return
+        timer = threading.Timer(SNAPSHOT_INTERVALO, _executar_snapshot_agendado, args=(tabela,))
+        timer.daemon = True
+        _snapshot_timers[tabela] = timer
+    timer.start()
+
+def _executar_snapshot_agendado(tabela):
+    """Executa a atualização agendada do snapshot de uma tabela."""
+    with _snapshot_lock:
+        _snapshot_timers.pop(tabela, None)
+    atualizar_snapshot(tabela)
+
+def load_snapshot(tabela, colunas=None):
+    """
+    Carrega colunas de uma tabela a partir do snapshot Parquet (memory-mapped),
+    para consultas analíticas que não precisam da tabela inteira.
+    
+    Se o snapshot estiver desatualizado ele é regravado; sem pyarrow, a tabela
+    é carregada normalmente.
+    
+    Args:
+        tabela (str): Nome da tabela ('coletas' ou 'usuarios')
+        colunas (list, optional): Colunas desejadas. Se None, todas.
+        
+    Returns:
+        DataFrame: DataFrame com as colunas solicitadas que existirem na tabela
+    """
+    if PARQUET_AVAILABLE and tabela in SNAPSHOT_TABELAS:
+        try:
+            if _snapshot_atualizado(tabela) or atualizar_snapshot(tabela):
+                path = _snapshot_path(tabela)
+                if colunas is not None:
+                    existentes = set(pq.read_schema(path).names)
+                    colunas = [c for c in colunas if c in existentes]
+                return pd.read_parquet(path, columns=colunas, memory_map=True)
+        except Exception as e:
+            print(f"Erro ao ler snapshot de {tabela}: {e}")
+    
+    df = SNAPSHOT_TABELAS[tabela]()
+    if colunas is not None:
+        df = df[[c for c in colunas if c in df.columns]]
+    return df
+
+# Funções de índices derivados (arquivos JSON atualizados a cada escrita)
+
+def _origem_tabela(path):
+    """Assinatura atual de uma tabela CSV, no formato gravado nos índices JSON."""
+    return [list(a) if a else None for a in _assinatura_tabela(path)]
+
+def ler_indice_json(path, padrao):
+    """
+    Lê um índice JSON (reaproveitado enquanto o arquivo não mudar). O dict
+    retornado é compartilhado com o cache: copie-o antes de alterar.
+    
+    Args:
+        path (str): Caminho do índice
+        padrao (dict): Valor retornado se o índice não existir ou estiver inválido
+        
+    Returns:
+        dict: Conteúdo do índice
+    """
+    assinatura = _assinatura_arquivo(path)
+    if assinatura is None:
+        return padrao
+    em_cache = _indices_json_cache.get(path)
+    if em_cache is not None and em_cache[0] == assinatura:
+        return em_cache[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            indice = json.load(f)
+    except (OSError, ValueError):
+        indice = padrao
+    _indices_json_cache[path] = (assinatura, indice)
+    return indice
+
+def gravar_indice_json(path, indice):
+    """
+    Grava um índice JSON de forma atômica (arquivo temporário e substituição).
+    
+    Para leitura e escrita concorrentes entre processos, chame dentro de
+    trava_arquivo(path + '.lock').
+    
+    Args:
+        path (str): Caminho do índice
+        indice (dict): Conteúdo a gravar
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(indice, f)
+    os.replace(temp_path, path)
+
+# Funções de caixa de entrada de notificações (uma partição por destinatário)
+
+def _coluna_destinatario(colunas):
+    """Retorna a coluna com o ID do destinatário ('usuario_id' ou 'para_usuario_id')."""
+    if 'usuario_id' in colunas:
+        return 'usuario_id'
+    if 'para_usuario_id' in colunas:
+        return 'para_usuario_id'
+    return None
+
+def _caixa_path(usuario_id):
+    """Retorna o caminho da caixa de entrada (CSV) de um usuário."""
+    return os.path.join(CAIXAS_DIR, f'usuario_{int(usuario_id)}.csv')
+
+def _ler_indice_caixas():
+    """
+    Lê o índice das caixas de entrada.
+    
+    Returns:
+        dict: {'origem': assinatura da tabela, 'usuarios': {id: {...}}}
+    """
+    return ler_indice_json(INDICE_CAIXAS_FILE, {'origem': None, 'usuarios': {}})
+
+def _gravar_indice_caixas(indice):
+    """Grava o índice das caixas de entrada de forma atômica."""
+    gravar_indice_json(INDICE_CAIXAS_FILE, indice)
+
+def _resumo_caixa(grupo):
+    """Retorna a entrada do índice (hash, não lidas e total) da caixa de um destinatário."""
+    if 'lida' in grupo.columns:
+        nao_lidas = int((~grupo['lida'].fillna(False).astype(bool)).sum())
+    else:
+        nao_lidas = len(grupo)
+    hash_grupo = str(int(pd.util.hash_pandas_object(grupo, index=False).sum()))
+    return {'hash': hash_grupo, 'nao_lidas': nao_lidas, 'total': len(grupo)}
+
+def _gravar_caixa(usuario_id, grupo):
+    """Grava de forma atômica a caixa de entrada de um destinatário."""
+    caixa = _caixa_path(usuario_id)
+    temp_path = caixa + '.tmp'
+    _para_csv(grupo, 'notificacoes').to_csv(temp_path, index=False)
+    os.replace(temp_path, caixa)
+    invalidar_cache(caixa)
+
+def _remover_caixa(chave):
+    """Remove a caixa de entrada de um destinatário sem notificações."""
+    caixa = _caixa_path(chave)
+    if os.path.exists(caixa):
+        os.remove(caixa)
+    invalidar_cache(caixa)
+
+def _destinatarios(df, ids):
+    """
+    Retorna os IDs dos destinatários das notificações indicadas.
+    
+    Args:
+        df (DataFrame): Tabela de notificações
+        ids (list): IDs das notificações
+        
+    Returns:
+        set: IDs (int) dos destinatários
+    """
+    coluna = _coluna_destinatario(df.columns)
+    if coluna is None or not len(ids):
+        return set()
+    return {int(d) for d in df.loc[df['id'].isin(ids), coluna].dropna()}
+
+def _atualizar_caixas(df, destinatarios, origem_antes):
+    """
+    Regrava apenas as caixas de entrada dos destinatários indicados, depois
+    de uma gravação da tabela que só alterou notificações deles.
+    
+    Args:
+        df (DataFrame): Tabela completa de notificações, já gravada
+        destinatarios (set): IDs dos destinatários cujas notificações mudaram
+        origem_antes (list): Assinatura da tabela antes da gravação
+        
+    Returns:
+        bool: False se o índice das caixas não correspondia à tabela anterior
+        (é preciso a sincronização completa)
+    """
+    coluna = _coluna_destinatario(df.columns)
+    with trava_arquivo(INDICE_CAIXAS_FILE + '.lock'):
+        indice = _ler_indice_caixas()
+        if coluna is None or indice.get('origem') != origem_antes:
+            return False
+        usuarios = dict(indice.get('usuarios', {}))
+        chaves = {int(d) for d in destinatarios}
+        os.makedirs(CAIXAS_DIR, exist_ok=True)
+        
+        # Só as linhas dos destinatários alterados são agrupadas e gravadas
+        grupos = dict(tuple(df[df[coluna].isin(chaves)].groupby(coluna, sort=False))) if chaves else {}
+        for usuario_id in chaves:
+            chave = str(usuario_id)
+            grupo = grupos.get(usuario_id)
+            if grupo is None:
+                usuarios.pop(chave, None)
+                _remover_caixa(chave)
+            else:
+                usuarios[chave] = _resumo_caixa(grupo)
+                _gravar_caixa(usuario_id, grupo)
+        
+        _gravar_indice_caixas({'origem': _origem_tabela(NOTIFICACOES_FILE), 'usuarios': usuarios})
+    return True
+
+def _sincronizar_caixas(df):
+    """
+    Atualiza as caixas de entrada a partir da tabela completa de notificações
+    (compactação, gravações sem destinatários conhecidos e reparo).
+    
+    Só as caixas cujo conteúdo mudou (comparando um hash por destinatário) são
+    regravadas; caixas de usuários sem notificações são removidas.
+    
+    Args:
+        df (DataFrame): Tabela completa de notificações
+    """
+    with trava_arquivo(INDICE_CAIXAS_FILE + '.lock'):
+        anterior = _ler_indice_caixas().get('usuarios', {})
+        usuarios = {}
+        coluna = _coluna_destinatario(df.columns)
+        os.makedirs(CAIXAS_DIR, exist_ok=True)
+        
+        if coluna is not None and not df.empty:
+            for usuario_id, grupo in df.groupby(coluna, sort=False):
+                chave = str(int(usuario_id))
+                usuarios[chave] = _resumo_caixa(grupo)
+                if anterior.get(chave, {}).get('hash') != usuarios[chave]['hash'] or not os.path.exists(_caixa_path(usuario_id)):
+                    _gravar_caixa(usuario_id, grupo)
+        
+        for chave in set(anterior) - set(usuarios):
+            _remover_caixa(chave)
+        
+        _gravar_indice_caixas({'origem': _origem_tabela(NOTIFICACOES_FILE), 'usuarios': usuarios})
+
+def _sincronizar_caixas_em_blocos():
+    """
+    Versão de _sincronizar_caixas para tabelas grandes: lê as notificações em
+    blocos e monta cada caixa num arquivo temporário, bloco a bloco.
+    
+    O hash por destinatário é a soma (módulo 2**64) dos hashes das linhas,
+    acumulada bloco a bloco.
+    """
+    with trava_arquivo(INDICE_CAIXAS_FILE + '.lock'):
+        anterior = _ler_indice_caixas().get('usuarios', {})
+        usuarios = {}
+        coluna = _coluna_destinatario(_read_header(NOTIFICACOES_FILE))
+        os.makedirs(CAIXAS_DIR, exist_ok=True)
+        
+        if coluna is not None:
+            for bloco in _ler_em_blocos(NOTIFICACOES_FILE):
+                bloco = aplicar_esquema(bloco, 'notificacoes')
+                for usuario_id, grupo in bloco.groupby(coluna, sort=False):
+                    chave = str(int(usuario_id))
+                    temp_path = _caixa_path(usuario_id) + '.tmp'
+                    entrada = usuarios.get(chave)
+                    if entrada is None:
+                        entrada = usuarios[chave] = {'hash': 0, 'nao_lidas': 0, 'total': 0}
+                        _para_csv(grupo, 'notificacoes').to_csv(temp_path, index=False)
+                    else:
+                        _para_csv(grupo, 'notificacoes').to_csv(temp_path, index=False, header=False, mode='a')
+                    
+                    hash_grupo = int(pd.util.hash_pandas_object(grupo, index=False).sum())
+                    entrada['hash'] = (entrada['hash'] + hash_grupo) % 2**64
+                    if 'lida' in grupo.columns:
+                        entrada['nao_lidas'] += int((~grupo['lida'].fillna(False).astype(bool)).sum())
+                    else:
+                        entrada['nao_lidas'] += len(grupo)
+                    entrada['total'] += len(grupo)
+        
+        for chave, entrada in usuarios.items():
+            entrada['hash'] = str(entrada['hash'])
+            caixa = _caixa_path(chave)
+            if anterior.get(chave, {}).get('hash') != entrada['hash'] or not os.path.exists(caixa):
+                os.replace(caixa + '.tmp', caixa)
+                invalidar_cache(caixa)
+            else:
+                os.remove(caixa + '.tmp')
+        
+        for chave in set(anterior) - set(usuarios):
+            caixa = _caixa_path(chave)
+            if os.path.exists(caixa):
+                os.remove(caixa)
+            invalidar_cache(caixa)
+        
+        _gravar_indice_caixas({'origem': _origem_tabela(NOTIFICACOES_FILE), 'usuarios': usuarios})
+
+def _anexar_na_caixa(colunas, registro, linha, origem_antes):
+    """
+    Anexa uma notificação recém-gravada à caixa de entrada do destinatário e
+    atualiza o contador de não lidas.
+    
+    Args:
+        colunas (list): Cabeçalho da tabela de notificações
+        registro (dict): Notificação anexada
+        linha (str): Linha CSV já formatada
+        origem_antes (list): Assinatura da tabela antes da escrita
+    """
+    coluna = _coluna_destinatario(colunas)
+    usuario_id = registro.get(coluna) if coluna else None
+    with trava_arquivo(INDICE_CAIXAS_FILE + '.lock'):
+        indice = _ler_indice_caixas()
+        if indice.get('origem') != origem_antes or usuario_id is None or pd.isna(usuario_id):
+            # Índice desatualizado (ou sem destinatário): ressincronizar na próxima leitura
+            indice = {'origem': None, 'usuarios': indice.get('usuarios', {})}
+            _gravar_indice_caixas(indice)
+            return
+        
+        caixa = _caixa_path(usuario_id)
+        if _read_header(caixa) not in ([], colunas):
+            _gravar_indice_caixas({'origem': None, 'usuarios': indice.get('usuarios', {})})
+            return
+        
+        os.makedirs(CAIXAS_DIR, exist_ok=True)
+        with open(caixa, 'a', encoding='utf-8', newline='') as f:
+            if os.path.getsize(caixa) == 0:
+                csv.writer(f, lineterminator=os.linesep).writerow(colunas)
+            f.write(linha)
+        invalidar_cache(caixa)
+        
+        usuarios = dict(indice.get('usuarios', {}))
+        chave = str(int(usuario_id))
+        entrada = dict(usuarios.get(chave, {'nao_lidas': 0, 'total': 0}))
+        # O hash deixa de valer: a próxima sincronização completa regrava esta caixa
+        entrada['hash'] = None
+        entrada['total'] = entrada.get('total', 0) + 1
+        if str(registro.get('lida', False)).strip().lower() not in ('true', '1'):
+            entrada['nao_lidas'] = entrada.get('nao_lidas', 0) + 1
+        usuarios[chave] = entrada
+        _gravar_indice_caixas({'origem': _origem_tabela(NOTIFICACOES_FILE), 'usuarios': usuarios})
+
+@_sem_contexto
+def _garantir_caixas():
+    """Ressincroniza as caixas de entrada se a tabela de notificações mudou."""
+    if _ler_indice_caixas().get('origem') != _origem_tabela(NOTIFICACOES_FILE):
+        with _lock_tabela(NOTIFICACOES_FILE):
+            if _ler_indice_caixas().get('origem') != _origem_tabela(NOTIFICACOES_FILE):
+                if _usar_blocos(NOTIFICACOES_FILE):
+                    _sincronizar_caixas_em_blocos()
+                else:
+                    _sincronizar_caixas(load_notificacoes())
+
+def contar_nao_lidas(usuario_id):
+    """
+    Retorna a quantidade de notificações não lidas de um usuário, pelo índice
+    das caixas de entrada (sem carregar notificações).
+    
+    Args:
+        usuario_id (int): ID do usuário
+        
+    Returns:
+        int: Quantidade de notificações não lidas
+    """
+    if _usar_sqlite():
+        colunas = sqlite_backend.get_columns('notificacoes')
+        coluna = _coluna_destinatario(colunas)
+        if coluna is None:
+            return 0
+        filtros = {coluna: usuario_id}
+        if 'lida' in colunas:
+            filtros['lida'] = False
+        return len(sqlite_backend.select_rows('notificacoes', filtros))
+    
+    if not os.path.exists(NOTIFICACOES_FILE):
+        return 0
+    _garantir_caixas()
+    try:
+        chave = str(int(usuario_id))
+    except (TypeError, ValueError):
+        return 0
+    return _ler_indice_caixas().get('usuarios', {}).get(chave, {}).get('nao_lidas', 0)
+
+# Funções de indicadores de coletas (contadores materializados para os painéis)
+
+def _indicador_vazio():
+    """Retorna os contadores de um grupo sem coletas."""
+    return {'total': 0, 'status': {}, 'peso_kg': 0.0, 'peso_concluido': 0.0}
+
+def _chave_indicador(valor):
+    """Normaliza a chave de um grupo (IDs como texto do inteiro, bairros como texto)."""
+    try:
+        return str(int(valor))
+    except (TypeError, ValueError):
+        return str(valor)
+
+def _agregar_coletas(df):
+    """
+    Calcula os contadores de um conjunto de coletas, por morador, catador,
+    bairro e no total, com operações vetorizadas.
+    
+    Args:
+        df (DataFrame): Coletas (a tabela completa ou só as linhas alteradas)
+        
+    Returns:
+        dict: Escopo ('geral', 'morador', 'catador', 'bairro') -> {chave: contadores}
+    """
+    indicadores = {escopo: {} for escopo in ESCOPOS_INDICADORES}
+    if df.empty:
+        return indicadores
+    
+    vazio = pd.Series('', index=df.index)
+    status = df['status'].astype(object).fillna('').astype(str) if 'status' in df.columns else vazio
+    # O esquema já converte o peso para número (peso_kg)
+    if 'peso_kg' in df.columns:
+        peso = df['peso_kg'].astype(float).fillna(0.0)
+    else:
+        peso = pd.Series(0.0, index=df.index)
+    
+    base = pd.DataFrame({
+        'status': status,
+        'total': 1,
+        'peso_kg': peso,
+        'peso_concluido': peso.where(status == 'concluida', 0.0),
+        'geral': 'todas',
+    })
+    
+    for escopo, coluna in ESCOPOS_INDICADORES.items():
+        if coluna != 'geral':
+            if coluna not in df.columns:
+                continue
+            base[coluna] = df[coluna].astype(object)
+        somas = base.groupby(coluna)[['total', 'peso_kg', 'peso_concluido']].sum()
+        grupos = indicadores[escopo]
+        for chave, valores in somas.to_dict('index').items():
+            grupos[_chave_indicador(chave)] = {
+                'total': int(valores['total']),
+                'status': {},
+                'peso_kg': float(valores['peso_kg']),
+                'peso_concluido': float(valores['peso_concluido']),
+            }
+        for (chave, valor_status), quantidade_status in base.groupby([coluna, 'status']).size().items():
+            grupos[_chave_indicador(chave)]['status'][valor_status] = int(quantidade_status)
+    
+    return indicadores
+
+def _somar_indicadores(indicadores, parcial, sinal):
+    """
+    Soma (sinal=1) ou subtrai (sinal=-1) contadores parciais dos indicadores.
+    
+    Args:
+        indicadores (dict): Indicadores a atualizar (alterados no lugar)
+        parcial (dict): Contadores de _agregar_coletas
+        sinal (int): 1 para somar, -1 para subtrair
+    """
+    for escopo, grupos in parcial.items():
+        destino = indicadores.setdefault(escopo, {})
+        for chave, valores in grupos.items():
+            atual = destino.setdefault(chave, _indicador_vazio())
+            atual['total'] += sinal * valores['total']
+            for campo in ('peso_kg', 'peso_concluido'):
+                # Arredondar evita acumular erro de ponto flutuante
+                atual[campo] = round(atual[campo] + sinal * valores[campo], 6)
+            for valor_status, quantidade in valores['status'].items():
+                atual['status'][valor_status] = atual['status'].get(valor_status, 0) + sinal * quantidade
+                if atual['status'][valor_status] <= 0:
+                    del atual['status'][valor_status]
+            if atual['total'] <= 0:
+                del destino[chave]
+
+def _atualizar_indicadores(antes, depois, origem_antes):
+    """
+    Aplica aos indicadores a diferença entre as versões antiga e nova das
+    coletas alteradas por uma escrita.
+    
+    Se os indicadores não correspondiam à tabela antes da escrita, eles são
+    marcados para recálculo completo na próxima leitura.
+    
+    Args:
+        antes (DataFrame): Coletas alteradas, antes da escrita (None para inserções)
+        depois (DataFrame): Coletas alteradas ou inseridas, depois da escrita
+        origem_antes (list): Assinatura da tabela de coletas antes da escrita
+    """
+    with trava_arquivo(INDICADORES_FILE + '.lock'):
+        indice = ler_indice_json(INDICADORES_FILE, {'origem': None})
+        if indice.get('origem') != origem_antes:
+            if indice.get('origem') is not None:
+                gravar_indice_json(INDICADORES_FILE, {'origem': None})
+            return
+        
+        indicadores = json.loads(json.dumps(indice['indicadores']))
+        if antes is not None:
+            _somar_indicadores(indicadores, _agregar_coletas(antes), -1)
+        _somar_indicadores(indicadores, _agregar_coletas(depois), 1)
+        gravar_indice_json(INDICADORES_FILE, {
+            'origem': _origem_tabela(COLETAS_FILE), 'indicadores': indicadores
+        })
+
+@_sem_contexto
+def _carregar_indicadores():
+    """
+    Retorna os indicadores de coletas, recalculando-os se a tabela foi alterada
+    sem atualizar os contadores (ex.: compactação ou edição externa do CSV).
+    
+    Returns:
+        dict: Escopo -> {chave: contadores}
+    """
+    if _usar_sqlite():
+        return _agregar_coletas(load_coletas())
+    
+    indice = ler_indice_json(INDICADORES_FILE, {'origem': None})
+    if indice.get('origem') == _origem_tabela(COLETAS_FILE):
+        return indice['indicadores']
+    
+    with _lock_tabela(COLETAS_FILE):
+        with trava_arquivo(INDICADORES_FILE + '.lock'):
+            origem = _origem_tabela(COLETAS_FILE)
+            indice = ler_indice_json(INDICADORES_FILE, {'origem': None})
+            if indice.get('origem') != origem:
+                # Os indicadores contam também as coletas arquivadas
+                todas = _juntar_com_arquivo(load_coletas(), load_coletas_arquivadas())
+                indice = {'origem': origem, 'indicadores': _agregar_coletas(todas)}
+                gravar_indice_json(INDICADORES_FILE, indice)
+    return indice['indicadores']
+
+def get_indicadores(escopo='geral', chave=None):
+    """
+    Retorna os contadores de coletas de um morador, catador, bairro ou do sistema.
+    
+    Args:
+        escopo (str): 'geral', 'morador', 'catador' ou 'bairro'
+        chave: ID do morador/catador ou nome do bairro (ignorado no escopo 'geral')
+        
+    Returns:
+        dict: {'total', 'status' (status -> quantidade), 'peso_kg', 'peso_concluido'}
+    """
+    if escopo not in ESCOPOS_INDICADORES:
+        raise ValueError(f"Escopo desconhecido: {escopo}")
+    chave = 'todas' if escopo == 'geral' else _chave_indicador(chave)
+    try:
+        indicador = _carregar_indicadores().get(escopo, {}).get(chave)
+    except Exception:
+        indicador = None
+    return copy.deepcopy(indicador) if indicador else _indicador_vazio()
+
+def get_indicadores_por_grupo(escopo):
+    """
+    Retorna os contadores de todos os grupos de um escopo (ex.: todos os bairros).
+    
+    Args:
+        escopo (str): 'morador', 'catador' ou 'bairro'
+        
+    Returns:
+        dict: Chave do grupo -> contadores
+    """
+    if escopo not in ESCOPOS_INDICADORES:
+        raise ValueError(f"Escopo desconhecido: {escopo}")
+    try:
+        return copy.deepcopy(_carregar_indicadores().get(escopo, {}))
+    except Exception:
+        return {}
+
+# Funções de sequência de IDs
+
+@contextlib.contextmanager
+def trava_arquivo(lock_path):
+    """
+    Trava exclusiva entre processos baseada em um arquivo de lock
+    (fcntl no Linux/macOS, msvcrt no Windows).
+    
+    Args:
+        lock_path (str): Caminho do arquivo de lock
+    """
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK desiste após ~10s; continuar tentando
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextlib.contextmanager
+def _trava_sequencia(path):
+    """
+    Serializa o acesso à sequência de IDs de uma tabela entre threads e
+    entre processos (várias instâncias do Streamlit).
+    
+    Args:
+        path (str): Caminho do CSV principal da tabela
+    """
+    seq_path = _seq_path(path)
+    with _lock_tabela(seq_path):
+        with trava_arquivo(seq_path + '.lock'):
+            yield seq_path
+
+def _ler_sequencia(seq_path):
+    """Retorna o último ID registrado na sequência (None se ela não existir)."""
+    try:
+        with open(seq_path, 'r', encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return None
+
+def _gravar_sequencia(seq_path, ultimo):
+    """Grava o último ID da sequência de forma atômica."""
+    temp_path = seq_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(str(ultimo))
+    os.replace(temp_path, seq_path)
+
+def _maior_id(df):
+    """Retorna o maior ID do DataFrame (0 se não houver IDs)."""
+    if df.empty or 'id' not in df.columns:
+        return 0
+    maior = pd.to_numeric(df['id'], errors='coerce').max()
+    return 0 if pd.isna(maior) else int(maior)
+
+def _sincronizar_sequencia(path, df):
+    """Garante que a sequência de IDs não fique atrás do maior ID gravado."""
+    if not os.path.exists(_seq_path(path)):
+        return
+    maior = _maior_id(df)
+    with _trava_sequencia(path) as seq_path:
+        atual = _ler_sequencia(seq_path)
+        if atual is not None and maior > atual:
+            _gravar_sequencia(seq_path, maior)
+
+def reservar_ids(tabela, quantidade=1):
+    """
+    Reserva um bloco de IDs consecutivos para uma tabela, sem ler a tabela.
+    
+    A sequência fica em app/data/<tabela>.seq e é protegida por lock entre
+    threads e processos, então sessões simultâneas nunca recebem o mesmo ID.
+    Na primeira reserva ela é inicializada com o maior ID existente.
+    
+    Args:
+        tabela (str): Nome da tabela ('usuarios', 'coletas' ou 'notificacoes')
+        quantidade (int, optional): Quantidade de IDs. Default é 1.
+        
+    Returns:
+        list: IDs reservados, em ordem crescente
+    """
+    if quantidade < 1:
+        return []
+    path = TABELAS_CSV[tabela]
+    with _trava_sequencia(path) as seq_path:
+        ultimo = _ler_sequencia(seq_path)
+        if ultimo is None:
+            ultimo = _maior_id(FUNCOES_CARGA[tabela]())
+            if tabela == 'coletas':
+                # IDs de coletas arquivadas não podem ser reutilizados
+                ultimo = max(ultimo, _maior_id_arquivado())
+        _gravar_sequencia(seq_path, ultimo + quantidade)
+    return list(range(ultimo + 1, ultimo + quantidade + 1))
+
+def proximo_id(tabela):
+    """
+    Gera o próximo ID de uma tabela.
+    
+    Args:
+        tabela (str): Nome da tabela ('usuarios', 'coletas' ou 'notificacoes')
+        
+    Returns:
+        int: Novo ID
+    """
+    return reservar_ids(tabela, 1)[0]
+
+# Funções de versão dos dados (detecção de mudanças entre execuções da página)
+
+def _versao_path(tabela):
+    """Retorna o caminho do arquivo com a versão dos dados de uma tabela."""
+    return os.path.splitext(TABELAS_CSV[tabela])[0] + '.versao'
+
+def _registrar_escrita(tabela):
+    """
+    Incrementa a versão dos dados de uma tabela após uma escrita.
+    
+    Args:
+        tabela (str): Nome da tabela (ignorado se não for uma das tabelas)
+    """
+    if tabela not in TABELAS_CSV:
+        return
+    versao_path = _versao_path(tabela)
+    with _lock_tabela(versao_path):
+        with trava_arquivo(versao_path + '.lock'):
+            _gravar_sequencia(versao_path, (_ler_sequencia(versao_path) or 0) + 1)
+
+def get_versao_dados(tabela):
+    """
+    Retorna a versão dos dados de uma tabela: um contador que só cresce e é
+    incrementado a cada escrita, em qualquer processo. A leitura é de um único
+    arquivo pequeno, sem tocar na tabela.
+    
+    Args:
+        tabela (str): Nome da tabela ('usuarios', 'coletas' ou 'notificacoes')
+        
+    Returns:
+        int: Versão atual (0 se a tabela nunca foi gravada)
+    """
+    return _ler_sequencia(_versao_path(tabela)) or 0
+
+def get_versoes_dados():
+    """
+    Retorna a versão dos dados de todas as tabelas. Guardar o resultado e
+    comparar na próxima execução indica se algo mudou desde então.
+    
+    Returns:
+        dict: Tabela -> versão
+    """
+    return {tabela: get_versao_dados(tabela) for tabela in TABELAS_CSV}
+
+def memorizar_por_versao(*tabelas):
+    """
+    Decora uma função cujo resultado depende só do conteúdo das tabelas
+    indicadas (ex.: contagens dos cards, dados dos gráficos, fragmentos HTML).
+    O resultado é compartilhado entre as sessões e só é recalculado quando a
+    versão de alguma dessas tabelas muda ou os argumentos são outros; quem
+    chama não deve alterá-lo.
+    
+    Args:
+        *tabelas (str): Tabelas das quais o resultado depende
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def executar(*args):
+            # Versões lidas antes do cálculo: uma escrita durante ele só
+            # provoca um novo cálculo na próxima chamada
+            versoes = tuple(get_versao_dados(tabela) for tabela in tabelas)
+            chave = (funcao.__module__, funcao.__qualname__, args)
+            with _cache_lock:
+                entrada = _cache_por_versao.get(chave)
+            if entrada is not None and entrada[0] == versoes:
+                return entrada[1]
+            resultado = funcao(*args)
+            with _cache_lock:
+                _cache_por_versao[chave] = (versoes, resultado)
+            return resultado
+        return executar
+    return decorador
+
+# Funções de atualização em lote (transações)
+
+def _aplicar_atualizacoes(df, linhas):
+    """
+    Aplica no DataFrame as atualizações de várias linhas, avaliando uma única
+    máscara para todo o conjunto de IDs e atribuindo cada coluna de uma vez.
+    
+    Args:
+        df (DataFrame): Tabela carregada (alterada no lugar)
+        linhas (dict): ID -> {coluna: valor}
+        
+    Returns:
+        list: IDs que não existem na tabela
+    """
+    alvo = df['id'].isin(list(linhas.keys()))
+    rotulos = {}
+    for rotulo, row_id in zip(df.index[alvo], df.loc[alvo, 'id']):
+        rotulos.setdefault(row_id, []).append(rotulo)
+    
+    ausentes = [row_id for row_id in linhas if row_id not in rotulos]
+    
+    # Agrupar por coluna: rótulos das linhas e valores a atribuir
+    por_coluna = {}
+    for row_id, dados in linhas.items():
+        for campo, valor in dados.items():
+            # A versão é mantida pelo próprio lote (ver _incrementar_versoes)
+            if campo in ('id', COLUNA_VERSAO) or campo not in df.columns or row_id not in rotulos:
+                continue
+            destino = por_coluna.setdefault(campo, ([], []))
+            for rotulo in rotulos[row_id]:
+                destino[0].append(rotulo)
+                destino[1].append(valor)
+    
+    for campo, (destino_rotulos, valores) in por_coluna.items():
+        valores = [preparar_valor(df, campo, valor) for valor in valores]
+        df.loc[destino_rotulos, campo] = valores
+    return ausentes
+
+def _incrementar_versoes(df, linhas):
+    """
+    Incrementa a versão das linhas atualizadas (tabelas com a coluna de versão).
+    
+    Args:
+        df (DataFrame): Tabela carregada (alterada no lugar)
+        linhas (dict): ID -> {coluna: valor} das linhas atualizadas
+    """
+    if COLUNA_VERSAO not in df.columns:
+        return
+    alvo = df['id'].isin(list(linhas.keys()))
+    df.loc[alvo, COLUNA_VERSAO] = df.loc[alvo, COLUNA_VERSAO] + 1
+
+def _condicoes_atendidas(df, row_id, esperados):
+    """
+    Confere se uma linha tem os valores esperados (compare-and-set).
+    
+    Args:
+        df (DataFrame): Tabela carregada
+        row_id (int): ID da linha
+        esperados (dict): Coluna -> valor esperado (None exige a coluna vazia)
+        
+    Returns:
+        bool: True se a linha existe e todas as colunas têm os valores esperados
+    """
+    if df is None:
+        return False
+    linha = df[df['id'] == row_id]
+    if linha.empty:
+        return False
+    for coluna, esperado in esperados.items():
+        atual = linha[coluna].iloc[0] if coluna in linha.columns else None
+        if esperado is None or (pd.api.types.is_scalar(esperado) and pd.isna(esperado)):
+            if not pd.isna(atual):
+                return False
+        elif pd.isna(atual) or atual != esperado:
+            return False
+    return True
+
+class GravacaoInterrompida(Exception):
+    """
+    Falha ao gravar um lote depois que parte das tabelas do grupo já tinha
+    sido gravada.
+    
+    Attributes:
+        gravadas (list): Tabelas do lote já gravadas
+        nao_gravadas (list): Tabelas do lote não gravadas (ou gravadas só em parte)
+        causa (Exception): Erro da escrita que falhou
+    """
+    def __init__(self, gravadas, nao_gravadas, causa):
+        self.gravadas = gravadas
+        self.nao_gravadas = nao_gravadas
+        self.causa = causa
+        if gravadas:
+            situacao = f"já gravadas: {', '.join(gravadas)}"
+        else:
+            situacao = "nenhuma alteração foi gravada"
+        super().__init__(f"Gravação interrompida ({causa}); não gravadas: {', '.join(nao_gravadas)}; {situacao}")
+
+def _gravar_lotes(lotes):
+    """
+    Grava vários lotes de atualizações e inserções com uma única escrita por tabela.
+    
+    Cada lote é validado separadamente: um lote com registro inexistente (ou
+    cujas condições não são atendidas) é descartado sem afetar os demais. Os
+    lotes são aplicados na ordem recebida, e cada linha atualizada tem a sua
+    versão incrementada.
+    
+    Tudo o que pode falhar antes da gravação (carga, validação, compare-and-set,
+    reserva de IDs e montagem das tabelas) é feito antes da primeira escrita.
+    Se ainda assim a escrita de uma tabela falhar, as seguintes não são
+    gravadas, e só os lotes com alguma tabela não gravada recebem o erro.
+    
+    Args:
+        lotes (list): Triplas (atualizacoes, insercoes, condicoes) no formato de _executar_lote
+        
+    Returns:
+        list: Para cada lote, os pares (tabela, id) não encontrados ou em
+        conflito (vazio se o lote foi gravado), ou GravacaoInterrompida se
+        alguma tabela do lote não foi gravada
+    """
+    tabelas = sorted({tabela for atualizacoes, insercoes, condicoes in lotes
+                      for tabela in list(atualizacoes) + list(insercoes) + list(condicoes or {})})
+    
+    # Travar as tabelas sempre na mesma ordem para evitar deadlock
+    locks = [_lock_tabela(TABELAS_CSV[tabela]) for tabela in tabelas]
+    for lock in locks:
+        lock.acquire()
+    try:
+        carregadas = {}
+        ids_existentes = {}
+        resultados = []
+        validos = []
+        for atualizacoes, insercoes, condicoes in lotes:
+            ausentes = []
+            for tabela in condicoes or {}:
+                if tabela not in carregadas:
+                    carregadas[tabela] = FUNCOES_CARGA[tabela]()
+                    ids_existentes[tabela] = set(carregadas[tabela]['id'])
+            for tabela, linhas in atualizacoes.items():
+                if not linhas:
+                    continue
+                if tabela not in carregadas:
+                    carregadas[tabela] = FUNCOES_CARGA[tabela]()
+                    ids_existentes[tabela] = set(carregadas[tabela]['id'])
+                ausentes.extend((tabela, row_id) for row_id in linhas
+                                if row_id not in ids_existentes[tabela])
+            resultados.append(ausentes)
+            if not ausentes:
+                validos.append((len(resultados) - 1, atualizacoes, insercoes, condicoes))
+        
+        alteradas = {}
+        coletas_atualizadas = []
+        notificacoes_atualizadas = []
+        for _, atualizacoes, insercoes, condicoes in validos:
+            for tabela, linhas in atualizacoes.items():
+                if not linhas:
+                    continue
+                if tabela == 'coletas':
+                    coletas_atualizadas.extend(int(i) for i in linhas)
+                elif tabela == 'notificacoes':
+                    notificacoes_atualizadas.extend(int(i) for i in linhas)
+                alteradas[tabela] = carregadas[tabela]
+        
+        coletas_antes = None
+        if 'coletas' in alteradas:
+            # Versão anterior das coletas alteradas, para atualizar os indicadores
+            df = alteradas['coletas']
+            coletas_antes = df[df['id'].isin(coletas_atualizadas)].copy()
+        # Destinatários anteriores das notificações alteradas (caixas a regravar)
+        destinatarios = _destinatarios(alteradas['notificacoes'], notificacoes_atualizadas) if 'notificacoes' in alteradas else set()
+        
+        aplicados = []
+        modificadas = set()
+        tabelas_por_lote = {}
+        for posicao, atualizacoes, insercoes, condicoes in validos:
+            # Compare-and-set: conferir as condições no estado deixado pelos lotes anteriores
+            conflitos = [(tabela, row_id) for tabela, linhas in (condicoes or {}).items()
+                         for row_id, esperados in linhas.items()
+                         if not _condicoes_atendidas(alteradas.get(tabela, carregadas.get(tabela)), row_id, esperados)]
+            if conflitos:
+                resultados[posicao] = conflitos
+                continue
+            for tabela, linhas in atualizacoes.items():
+                if linhas:
+                    _aplicar_atualizacoes(alteradas[tabela], linhas)
+                    _incrementar_versoes(alteradas[tabela], linhas)
+                    modificadas.add(tabela)
+            aplicados.append((posicao, insercoes))
+            tabelas_por_lote[posicao] = ({tabela for tabela, linhas in atualizacoes.items() if linhas}
+                                         | {tabela for tabela, registros in insercoes.items() if registros})
+        
+        # Montar tudo o que será gravado antes da primeira escrita
+        plano = []
+        for tabela in tabelas:
+            registros = [(posicao, dict(r)) for posicao, insercoes in aplicados for r in insercoes.get(tabela, [])]
+            if tabela not in modificadas and not registros:
+                continue
+            # Um único bloco de IDs para todas as inserções da tabela
+            for (_, registro), novo_id in zip(registros, reservar_ids(tabela, len(registros))):
+                registro['id'] = novo_id
+            
+            df = None
+            opcoes = {}
+            coletas_depois = None
+            if tabela in modificadas:
+                df = alteradas[tabela]
+                if registros:
+                    df = pd.concat([df, pd.DataFrame([r for _, r in registros])], ignore_index=True)
+                if tabela == 'notificacoes':
+                    ids = notificacoes_atualizadas + [r['id'] for _, r in registros]
+                    opcoes['destinatarios'] = destinatarios | _destinatarios(df, ids)
+                elif tabela == 'coletas':
+                    ids = coletas_atualizadas + [r['id'] for _, r in registros]
+                    coletas_depois = aplicar_esquema(df[df['id'].isin(ids)], 'coletas')
+            plano.append((tabela, registros, df, opcoes, coletas_depois))
+        
+        # Por tabela: linhas (ou, na regravação, a tabela inteira) gravadas de cada lote
+        totais = {}
+        gravadas = {}
+        falha = None
+        for tabela, registros, df, opcoes, coletas_depois in plano:
+            path = TABELAS_CSV[tabela]
+            if df is not None:
+                totais[tabela] = {posicao: 1 for posicao, tabelas_lote in tabelas_por_lote.items()
+                                  if tabela in tabelas_lote}
+            else:
+                totais[tabela] = {}
+                for posicao, _ in registros:
+                    totais[tabela][posicao] = totais[tabela].get(posicao, 0) + 1
+            gravadas[tabela] = {}
+            origem_antes = _origem_tabela(path)
+            try:
+                if df is not None:
+                    _write_csv_table(path, df, **opcoes)
+                    gravadas[tabela] = dict(totais[tabela])
+                else:
+                    # Tabela só com inserções: anexar as linhas sem regravar o arquivo
+                    pendentes = []
+                    for posicao, registro in registros:
+                        if APPEND_MODE and _append_row(path, registro):
+                            gravadas[tabela][posicao] = gravadas[tabela].get(posicao, 0) + 1
+                        else:
+                            pendentes.append((posicao, registro))
+                    if pendentes:
+                        df_pendentes = pd.concat([FUNCOES_CARGA[tabela](), pd.DataFrame([r for _, r in pendentes])],
+                                                 ignore_index=True)
+                        if tabela == 'notificacoes':
+                            opcoes['destinatarios'] = _destinatarios(df_pendentes, [r['id'] for _, r in pendentes])
+                        _write_csv_table(path, df_pendentes, **opcoes)
+                        for posicao, _ in pendentes:
+                            gravadas[tabela][posicao] = gravadas[tabela].get(posicao, 0) + 1
+            except Exception as e:
+                if df is not None and _origem_tabela(path) != origem_antes:
+                    # O arquivo já foi trocado: falhou só a sincronização das caixas,
+                    # que é refeita na próxima leitura
+                    print(f"Erro ao sincronizar as caixas de entrada após gravar {tabela}: {e}")
+                    gravadas[tabela] = dict(totais[tabela])
+                else:
+                    print(f"Erro ao gravar {tabela}: {e}")
+                    falha = e
+                    break
+            
+            if coletas_depois is not None:
+                try:
+                    _atualizar_indicadores(coletas_antes, coletas_depois, origem_antes)
+                    _atualizar_coletas_abertas(coletas_depois, origem_antes)
+                except Exception as e:
+                    # Os índices derivados são recalculados quando não correspondem à tabela
+                    print(f"Erro ao atualizar os índices de coletas: {e}")
+        
+        if falha is not None:
+            for posicao, tabelas_lote in tabelas_por_lote.items():
+                completas, faltando = [], []
+                for tabela in sorted(tabelas_lote):
+                    feitas = gravadas.get(tabela, {}).get(posicao, 0)
+                    total = totais.get(tabela, {}).get(posicao, 1)
+                    if feitas >= total:
+                        completas.append(tabela)
+                    else:
+                        faltando.append(f"{tabela} (em parte)" if feitas else tabela)
+                if faltando:
+                    resultados[posicao] = GravacaoInterrompida(completas, faltando, falha)
+        
+        with _gravacao_lock:
+            _gravacao_stats['lotes'] += len(lotes)
+            _gravacao_stats['gravacoes'] += 1
+        return resultados
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+def _iniciar_escritor():
+    """Inicia (uma única vez por processo) a thread que grava os lotes enfileirados"""
+    global _escritor
+    with _gravacao_lock:
+        if _escritor is None or not _escritor.is_alive():
+            _escritor = threading.Thread(target=_laco_escritor, name='coleta-escritor', daemon=True)
+            _escritor.start()
+
+def _laco_escritor():
+    """
+    Laço do escritor em segundo plano: reúne os lotes que chegam dentro da
+    janela de agrupamento e os grava juntos, respondendo a cada sessão pelo
+    seu Future. Lotes cuja sessão desistiu de esperar (Future cancelado) não
+    são gravados.
+    """
+    janela = GROUP_COMMIT_JANELA_MS / 1000.0
+    while True:
+        pendentes = [_fila_gravacao.get()]
+        limite = time.monotonic() + janela
+        while len(pendentes) < GROUP_COMMIT_MAX_LOTES:
+            restante = limite - time.monotonic()
+            try:
+                if restante > 0:
+                    pendentes.append(_fila_gravacao.get(timeout=restante))
+                else:
+                    pendentes.append(_fila_gravacao.get_nowait())
+            except queue.Empty:
+                break
+        
+        pendentes = [(lote, futuro) for lote, futuro in pendentes if futuro.set_running_or_notify_cancel()]
+        if not pendentes:
+            continue
+        try:
+            resultados = _gravar_lotes([lote for lote, _ in pendentes])
+        except Exception as e:
+            # Falha antes da primeira escrita: nenhum lote do grupo foi gravado
+            for _, futuro in pendentes:
+                futuro.set_exception(e)
+            continue
+        # Só os lotes com tabelas não gravadas recebem o erro da escrita
+        for (_, futuro), resultado in zip(pendentes, resultados):
+            if isinstance(resultado, GravacaoInterrompida):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+
+def get_gravacao_stats():
+    """
+    Retorna as estatísticas da gravação agrupada.
+    
+    Returns:
+        dict: Lotes recebidos, gravações feitas e lotes por gravação
+    """
+    with _gravacao_lock:
+        lotes = _gravacao_stats['lotes']
+        gravacoes = _gravacao_stats['gravacoes']
+    return {
+        'lotes': lotes,
+        'gravacoes': gravacoes,
+        'lotes_por_gravacao': lotes / gravacoes if gravacoes else 0.0,
+    }
+
+@_escrita
+def _executar_lote(atualizacoes, insercoes=None, condicoes=None):
+    """
+    Grava um lote de atualizações e inserções com uma única escrita por tabela.
+    
+    Nenhuma tabela é gravada se algum registro a atualizar não existir ou se
+    alguma condição não for atendida. No backend CSV o lote é entregue ao
+    escritor em segundo plano, que o grava junto com os lotes de outras
+    sessões que chegarem na mesma janela.
+    
+    Args:
+        atualizacoes (dict): Tabela -> {id: {coluna: valor}}
+        insercoes (dict, optional): Tabela -> lista de registros (dict)
+        condicoes (dict, optional): Tabela -> {id: {coluna: valor esperado}}
+            (None exige a coluna vazia); usado no compare-and-set
+        
+    Returns:
+        list: Pares (tabela, id) não encontrados ou em conflito; vazio se o lote foi gravado
+
+    Raises:
+        GravacaoInterrompida: Se alguma tabela do lote não foi gravada (a
+            mensagem informa quais tabelas já foram)
+    """
+    insercoes = insercoes or {}
+    condicoes = condicoes or {}
+    tabelas = sorted(set(atualizacoes) | set(insercoes))
+    for tabela in tabelas:
+        if tabela not in FUNCOES_CARGA:
+            raise ValueError(f"Tabela desconhecida: {tabela}")
+    
+    if _usar_sqlite():
+        # O SQLite gera os IDs das novas linhas
+        registros_sem_id = {
+            tabela: [{k: v for k, v in r.items() if k != 'id'} for r in registros]
+            for tabela, registros in insercoes.items()
+        }
+        ausentes = sqlite_backend.apply_batch(atualizacoes, registros_sem_id, condicoes)
+        for tabela in tabelas:
+            _registrar_escrita(tabela)
+        return ausentes
+    
+    # Sem agrupamento (ou já dentro do escritor): gravar diretamente
+    if not GROUP_COMMIT or threading.current_thread() is _escritor:
+        resultado = _gravar_lotes([(atualizacoes, insercoes, condicoes)])[0]
+        if isinstance(resultado, GravacaoInterrompida):
+            raise resultado
+        return resultado
+    
+    _iniciar_escritor()
+    futuro = Future()
+    _fila_gravacao.put(((atualizacoes, insercoes, condicoes), futuro))
+    try:
+        return futuro.result(timeout=GROUP_COMMIT_TIMEOUT)
+    except FutureTimeoutError:
+        if futuro.cancel():
+            raise TimeoutError(f"O escritor não respondeu em {GROUP_COMMIT_TIMEOUT:g}s; as alterações não foram gravadas")
+        raise TimeoutError(f"O escritor não concluiu a gravação em {GROUP_COMMIT_TIMEOUT:g}s; confira se as alterações foram salvas")
+
+def update_many(atualizacoes, insercoes=None):
+    """
+    Atualiza várias linhas de uma ou mais tabelas (e insere novas linhas)
+    com uma única gravação por tabela.
+    
+    Args:
+        atualizacoes (dict): Tabela -> {id: {coluna: valor}}
+            Ex.: {'coletas': {7: {'status': 'agendada', 'catador_id': 2}}}
+        insercoes (dict, optional): Tabela -> lista de registros (dict)
+        
+    Returns:
+        tuple: (bool, str) - Sucesso da operação e mensagem
+    """
+    try:
+        ausentes = _executar_lote(atualizacoes, insercoes)
+        if ausentes:
+            descricao = ", ".join(f"{tabela} #{row_id}" for tabela, row_id in ausentes)
+            return False, f"Registros não encontrados: {descricao}"
+        return True, "Alterações salvas com sucesso!"
+    except Exception as e:
+        return False, f"Erro ao salvar alterações: {str(e)}"
+
+class Transacao:
+    """
+    Agrupa atualizações e inserções para gravá-las juntas com update_many.
+    
+    Uso:
+        with Transacao() as transacao:
+            transacao.update('coletas', coleta_id, {'status': 'agendada'})
+            transacao.insert('notificacoes', notificacao)
+        sucesso, mensagem = transacao.resultado
+    
+    Se ocorrer uma exceção dentro do bloco, nada é gravado.
+    """
+    def __init__(self):
+        """Inicializa uma transação vazia"""
+        self.atualizacoes = {}
+        self.insercoes = {}
+        self.resultado = None
+    
+    def update(self, tabela, row_id, dados):
+        """
+        Registra a atualização de uma linha (campos repetidos prevalecem os últimos).
+        
+        Args:
+            tabela (str): Nome da tabela
+            row_id (int): ID da linha
+            dados (dict): Colunas e novos valores
+        """
+        self.atualizacoes.setdefault(tabela, {}).setdefault(row_id, {}).update(dados)
+    
+    def insert(self, tabela, dados):
+        """
+        Registra a inserção de uma linha (o ID é gerado na gravação).
+        
+        Args:
+            tabela (str): Nome da tabela
+            dados (dict): Valores da linha
+        """
+        self.insercoes.setdefault(tabela, []).append(dict(dados))
+    
+    def commit(self):
+        """
+        Grava as alterações registradas.
+        
+        Returns:
+            tuple: (bool, str) - Sucesso da operação e mensagem
+        """
+        self.resultado = update_many(self.atualizacoes, self.insercoes)
+        self.rollback()
+        return self.resultado
+    
+    def rollback(self):
+        """Descarta as alterações registradas"""
+        self.atualizacoes = {}
+        self.insercoes = {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+class ContextoDados(Transacao):
+    """
+    Unidade de trabalho de uma execução (rerun) da página.
+    
+    Enquanto o contexto está ativo, cada tabela é carregada no máximo uma vez:
+    load_users/load_coletas/load_notificacoes e as consultas que dependem
+    delas reaproveitam a mesma leitura. As alterações registradas com update e
+    insert são gravadas juntas ao final, com uma única escrita por tabela.
+    
+    Uso (em streamlit_app.main):
+        with ContextoDados() as contexto:
+            render_catador_page(user_data, contexto)
+    
+    A gravação também acontece quando a execução é interrompida por st.rerun()
+    ou st.stop(), que não derivam de Exception; erros comuns descartam as
+    alterações registradas.
+    """
+    def __init__(self):
+        """Inicializa um contexto sem tabelas carregadas nem alterações"""
+        super().__init__()
+        self.tabelas = {}
+        self._anterior = None
+    
+    def commit(self):
+        """
+        Grava as alterações registradas (se houver) e descarta as tabelas memorizadas.
+        
+        Returns:
+            tuple: (bool, str) - Sucesso da operação e mensagem
+        """
+        if not self.atualizacoes and not self.insercoes:
+            self.resultado = (True, "Nenhuma alteração pendente")
+            return self.resultado
+        resultado = super().commit()
+        self.tabelas.clear()
+        return resultado
+    
+    def __enter__(self):
+        self._anterior = contexto_atual()
+        _contexto_local.contexto = self
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        _contexto_local.contexto = self._anterior
+        if exc_type is None or not issubclass(exc_type, Exception):
+            self.commit()
+        else:
+            self.rollback()
+        return False
 
 # Funções de manipulação de usuários
 
@@ -206,9 +2573,13 @@ def check_user_exists(email):
     Returns:
         bool: True se o usuário existir, False caso contrário
     """
+    if _usar_sqlite():
+        return not sqlite_backend.select_rows('usuarios', {'email': email}).empty
+    
     users_df = load_users()
     return email in users_df['email'].values
 
+@_escrita
 def save_user(user_data):
     """
     Salva um novo usuário no banco de dados.
@@ -220,13 +2591,14 @@ def save_user(user_data):
         tuple: (bool, str) - Sucesso da operação e mensagem
     """
     try:
-        users_df = load_users()
-        
-        # Adicionar novo usuário
-        new_user_df = pd.DataFrame([user_data])
-        users_df = pd.concat([users_df, new_user_df], ignore_index=True)
+        if _usar_sqlite():
+            user_data['id'] = sqlite_backend.insert_row('usuarios', user_data)
+            _registrar_escrita('usuarios')
+            return True, "Usuário registrado com sucesso!"
         
-        save_users(users_df)
+        # O ID é reservado pelo escritor agrupado, que grava o novo usuário
+        # junto com as demais mutações da mesma janela
+        _executar_lote({}, {'usuarios': [user_data]})
         return True, "Usuário registrado com sucesso!"
     
     except Exception as e:
@@ -244,23 +2616,17 @@ def update_user(user_id, user_data):
         tuple: (bool, str) - Sucesso da operação e mensagem
     """
     try:
-        users_df = load_users()
-        
-        # Verificar se o usuário existe
-        if not (users_df['id'] == user_id).any():
+        # Alterações do mesmo tamanho (ex.: caminho da foto) editam só a linha
+        if _atualizar_no_lugar('usuarios', user_id, user_data):
+            return True, "Usuário atualizado com sucesso!"
+        if _executar_lote({'usuarios': {user_id: user_data}}):
             return False, "Usuário não encontrado"
-        
-        # Atualizar campos
-        for key, value in user_data.items():
-            if key in users_df.columns:
-                users_df.loc[users_df['id'] == user_id, key] = value
-        
-        save_users(users_df)
         return True, "Usuário atualizado com sucesso!"
     
     except Exception as e:
         return False, f"Erro ao atualizar usuário: {str(e)}"
 
+@_escrita
 def delete_user(user_id):
     """
     Remove um usuário do banco de dados.
@@ -272,16 +2638,24 @@ def delete_user(user_id):
         tuple: (bool, str) - Sucesso da operação e mensagem
     """
     try:
-        users_df = load_users()
-        
-        # Verificar se o usuário existe
-        if not (users_df['id'] == user_id).any():
-            return False, "Usuário não encontrado"
-        
-        # Remover usuário
-        users_df = users_df[users_df['id'] != user_id]
+        if _usar_sqlite():
+            if not sqlite_backend.delete_row('usuarios', user_id):
+                return False, "Usuário não encontrado"
+            _registrar_escrita('usuarios')
+            return True, "Usuário removido com sucesso!"
         
-        save_users(users_df)
+        # Ler e regravar sob a trava da tabela para não perder escritas concorrentes
+        with _lock_tabela(USERS_FILE):
+            users_df = load_users()
+            
+            # Verificar se o usuário existe
+            if not (users_df['id'] == user_id).any():
+                return False, "Usuário não encontrado"
+            
+            # Remover usuário
+            users_df = users_df[users_df['id'] != user_id]
+            
+            save_users(users_df)
         return True, "Usuário removido com sucesso!"
     
     except Exception as e:
@@ -310,6 +2684,7 @@ def register_user(user_data):
 
 # Funções de manipulação de coletas
 
+@_escrita
 def save_coleta(coleta_data):
     """
     Salva uma nova coleta no banco de dados.
@@ -321,10 +2696,23 @@ def save_coleta(coleta_data):
         tuple: (bool, str) - Sucesso da operação e mensagem
     """
     try:
-        coletas_df = load_coletas()
+        # Gravar apenas colunas canônicas (ex.: 'quantidade_estimada' vira 'peso_kg')
+        coleta_data = normalizar_registro(coleta_data, 'coletas')
         
-        # Gerar novo ID
-        coleta_data['id'] = 1 if coletas_df.empty else coletas_df['id'].max() + 1
+        if _usar_sqlite():
+            coleta_data.pop('id', None)
+            coleta_data['id'] = sqlite_backend.insert_row('coletas', coleta_data)
+            _registrar_escrita('coletas')
+            return True, "Coleta agendada com sucesso!"
+        
+        # Gerar novo ID sem varrer a tabela
+        coleta_data['id'] = proximo_id('coletas')
+        
+        # Anexar apenas a nova linha, quando o cabeçalho comporta todos os campos
+        if APPEND_MODE and _append_row(COLETAS_FILE, coleta_data):
+            return True, "Coleta agendada com sucesso!"
+        
+        coletas_df = load_coletas()
         
         # Adicionar nova coleta
         new_coleta_df = pd.DataFrame([coleta_data])
@@ -348,48 +2736,95 @@ def update_coleta(coleta_id, coleta_data):
         tuple: (bool, str) - Sucesso da operação e mensagem
     """
     try:
-        coletas_df = load_coletas()
-        
-        # Verificar se a coleta existe
-        if not (coletas_df['id'] == coleta_id).any():
+        # Alterações do mesmo tamanho (ex.: status) editam só a linha
+        if _atualizar_no_lugar('coletas', coleta_id, coleta_data):
+            return True, "Coleta atualizada com sucesso!"
+        if _executar_lote({'coletas': {coleta_id: coleta_data}}):
             return False, "Coleta não encontrada"
-        
-        # Atualizar campos
-        for key, value in coleta_data.items():
-            if key in coletas_df.columns:
-                coletas_df.loc[coletas_df['id'] == coleta_id, key] = value
-        
-        save_coletas(coletas_df)
         return True, "Coleta atualizada com sucesso!"
     
     except Exception as e:
         return False, f"Erro ao atualizar coleta: {str(e)}"
 
-def get_coletas_by_morador(morador_id):
+def claim_coleta(coleta_id, catador_id, expected_version, notificacao=None):
+    """
+    Aceita uma coleta disponível para um catador (compare-and-set).
+    
+    A coleta só é atribuída se ainda estiver sem catador e na versão que o
+    catador viu; caso contrário a operação falha na hora, sem sobrescrever o
+    aceite de outro catador. A notificação, se houver, é gravada junto.
+    
+    Args:
+        coleta_id (int): ID da coleta
+        catador_id (int): ID do catador que aceita a coleta
+        expected_version (int): Versão da coleta lida pelo catador
+        notificacao (dict, optional): Notificação para o morador
+        
+    Returns:
+        tuple: (bool, str) - Sucesso da operação e mensagem
+    """
+    try:
+        atualizacao = {'coletas': {coleta_id: {'status': 'agendada', 'catador_id': catador_id}}}
+        insercoes = {'notificacoes': [notificacao]} if notificacao else None
+        condicoes = {'coletas': {coleta_id: {COLUNA_VERSAO: int(expected_version), 'catador_id': None}}}
+        if _executar_lote(atualizacao, insercoes, condicoes):
+            return False, "Esta solicitação já foi aceita por outro catador ou foi alterada."
+        return True, "Solicitação aceita com sucesso!"
+    
+    except Exception as e:
+        return False, f"Erro ao aceitar coleta: {str(e)}"
+
+def get_coletas_by_morador(morador_id, incluir_arquivo=False):
     """
     Retorna as coletas de um morador específico.
     
     Args:
         morador_id (int): ID do morador
+        incluir_arquivo (bool, optional): Incluir as coletas arquivadas (histórico
+            completo). Default é False (apenas a tabela ativa).
         
     Returns:
         DataFrame: DataFrame com as coletas do morador
     """
-    coletas_df = load_coletas()
-    return coletas_df[coletas_df['morador_id'] == morador_id]
+    if _usar_sqlite():
+        return aplicar_esquema(sqlite_backend.select_rows('coletas', {'morador_id': morador_id}), 'coletas')
+    
+    if _usar_blocos(COLETAS_FILE):
+        # Tabela grande fora do cache: filtrar bloco a bloco
+        coletas = _consultar_em_blocos(COLETAS_FILE, {'morador_id': morador_id})
+    else:
+        coletas_df = load_coletas()
+        coletas = coletas_df[coletas_df['morador_id'] == morador_id]
+    if incluir_arquivo:
+        arquivadas = load_coletas_arquivadas()
+        coletas = _juntar_com_arquivo(coletas, arquivadas[arquivadas['morador_id'] == morador_id])
+    return coletas
 
-def get_coletas_by_catador(catador_id):
+def get_coletas_by_catador(catador_id, incluir_arquivo=False):
     """
     Retorna as coletas de um catador específico.
     
     Args:
         catador_id (int): ID do catador
+        incluir_arquivo (bool, optional): Incluir as coletas arquivadas (histórico
+            completo). Default é False (apenas a tabela ativa).
         
     Returns:
         DataFrame: DataFrame com as coletas do catador
     """
-    coletas_df = load_coletas()
-    return coletas_df[coletas_df['catador_id'] == catador_id]
+    if _usar_sqlite():
+        return aplicar_esquema(sqlite_backend.select_rows('coletas', {'catador_id': catador_id}), 'coletas')
+    
+    if _usar_blocos(COLETAS_FILE):
+        # Tabela grande fora do cache: filtrar bloco a bloco
+        coletas = _consultar_em_blocos(COLETAS_FILE, {'catador_id': catador_id})
+    else:
+        coletas_df = load_coletas()
+        coletas = coletas_df[coletas_df['catador_id'] == catador_id]
+    if incluir_arquivo:
+        arquivadas = load_coletas_arquivadas()
+        coletas = _juntar_com_arquivo(coletas, arquivadas[arquivadas['catador_id'] == catador_id])
+    return coletas
 
 def get_coletas_disponiveis(bairros=None):
     """
@@ -401,6 +2836,12 @@ def get_coletas_disponiveis(bairros=None):
     Returns:
         DataFrame: DataFrame com as coletas disponíveis
     """
+    if _usar_sqlite():
+        filtros = {'catador_id': None}
+        if bairros and len(bairros) > 0:
+            filtros['bairro'] = list(bairros)
+        return aplicar_esquema(sqlite_backend.select_rows('coletas', filtros), 'coletas')
+    
     coletas_df = load_coletas()
     disponivel = coletas_df[coletas_df['catador_id'].isna() | coletas_df['catador_id'].isnull()]
     
@@ -412,8 +2853,463 @@ def get_coletas_disponiveis(bairros=None):
     # Caso contrário, retornar todas as coletas disponíveis
     return disponivel
 
+# Funções do índice de coletas abertas (fila por bairro, da mais recente à mais antiga)
+
+def _chaves_recencia(df):
+    """
+    Calcula a chave de ordenação das coletas: data de criação (ou, nas coletas
+    antigas, a data de solicitação) como inteiro, seguida do ID.
+    
+    Args:
+        df (DataFrame): Coletas com o esquema aplicado
+        
+    Returns:
+        list: Tuplas (data, id) comparáveis entre si
+    """
+    if df.empty:
+        return []
+    datas = _primeira_data(df, ['data_criacao', 'data_solicitacao'])
+    # Coletas sem data ficam no fim da fila
+    numeros = datas.fillna(pd.Timestamp.min).astype('int64')
+    return list(zip(numeros.tolist(), df['id'].astype('int64').tolist()))
+
+def _primeira_data(df, colunas):
+    """
+    Retorna, para cada linha, a primeira data preenchida entre as colunas.
+    
+    Args:
+        df (DataFrame): Coletas
+        colunas (list): Colunas de data em ordem de preferência
+        
+    Returns:
+        Series: Datas (datetime64[ns]; NaT se nenhuma coluna estiver preenchida)
+    """
+    datas = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    for coluna in colunas:
+        if coluna in df.columns:
+            datas = datas.fillna(pd.to_datetime(df[coluna], errors='coerce').astype('datetime64[ns]'))
+    return datas
+
+def _inserir_coleta_aberta(indice, registro, chave):
+    """Inclui (ou reposiciona) uma coleta no índice de coletas abertas."""
+    _remover_coleta_aberta(indice, chave[1])
+    if not pd.isna(registro.get('catador_id')):
+        return
+    bairro = _bairro_do_registro(registro)
+    bisect.insort(indice['bairros'].setdefault(bairro, []), chave)
+    indice['posicoes'][chave[1]] = (bairro, chave)
+    indice['registros'][chave[1]] = registro
+
+def _bairro_do_registro(registro):
+    """Bairro de uma coleta como chave do índice (None quando vazio)."""
+    bairro = registro.get('bairro')
+    return None if pd.isna(bairro) else bairro
+
+def _remover_coleta_aberta(indice, coleta_id):
+    """Retira uma coleta do índice de coletas abertas (se estiver nele)."""
+    posicao = indice['posicoes'].pop(coleta_id, None)
+    if posicao is None:
+        return
+    bairro, chave = posicao
+    fila = indice['bairros'][bairro]
+    del fila[bisect.bisect_left(fila, chave)]
+    if not fila:
+        del indice['bairros'][bairro]
+    indice['registros'].pop(coleta_id, None)
+
+def _construir_coletas_abertas():
+    """
+    Monta o índice de coletas abertas a partir da tabela completa.
+    
+    Returns:
+        dict: Assinatura da tabela, filas por bairro, posições e registros por ID
+    """
+    # Assinatura lida antes dos dados: uma escrita concorrente força a reconstrução
+    origem = _origem_tabela(COLETAS_FILE)
+    coletas_df = load_coletas()
+    abertas = coletas_df[coletas_df['catador_id'].isna()]
+    indice = {'origem': origem, 'colunas': list(coletas_df.columns),
+              'bairros': {}, 'posicoes': {}, 'registros': {}}
+    for registro, chave in zip(abertas.to_dict('records'), _chaves_recencia(abertas)):
+        bairro = _bairro_do_registro(registro)
+        indice['bairros'].setdefault(bairro, []).append(chave)
+        indice['posicoes'][chave[1]] = (bairro, chave)
+        indice['registros'][chave[1]] = registro
+    for fila in indice['bairros'].values():
+        fila.sort()
+    return indice
+
+def _atualizar_coletas_abertas(depois, origem_antes):
+    """
+    Aplica ao índice de coletas abertas as coletas alteradas ou inseridas.
+    
+    Se o índice não correspondia à tabela antes da escrita, ele é descartado e
+    reconstruído na próxima leitura.
+    
+    Args:
+        depois (DataFrame): Coletas alteradas ou inseridas, depois da escrita
+        origem_antes (list): Assinatura da tabela de coletas antes da escrita
+    """
+    global _coletas_abertas
+    with _coletas_abertas_lock:
+        indice = _coletas_abertas
+        if indice is None:
+            return
+        if indice['origem'] != origem_antes:
+            _coletas_abertas = None
+            return
+        for registro, chave in zip(depois.to_dict('records'), _chaves_recencia(depois)):
+            _inserir_coleta_aberta(indice, registro, chave)
+        indice['origem'] = _origem_tabela(COLETAS_FILE)
+
+@_sem_contexto
+def _obter_coletas_abertas():
+    """Retorna o índice de coletas abertas, reconstruindo-o se a tabela mudou."""
+    global _coletas_abertas
+    with _coletas_abertas_lock:
+        indice = _coletas_abertas
+        if indice is not None and indice['origem'] == _origem_tabela(COLETAS_FILE):
+            return indice
+    indice = _construir_coletas_abertas()
+    with _coletas_abertas_lock:
+        _coletas_abertas = indice
+    return indice
+
+def _ordenar_por_recencia(df):
+    """Ordena as coletas da mais recente para a mais antiga (backend SQLite)."""
+    ordem = [i for _, i in sorted(zip(_chaves_recencia(df), range(len(df))), reverse=True)]
+    return df.iloc[ordem]
+
+def get_coletas_abertas(bairros=None, limite=None, inicio=0):
+    """
+    Retorna as coletas disponíveis (sem catador atribuído), da mais recente
+    para a mais antiga, lendo apenas as posições pedidas do índice por bairro.
+    
+    Args:
+        bairros (list, optional): Bairros a considerar. Default é None (todos).
+        limite (int, optional): Quantidade máxima de coletas. Default é None (todas).
+        inicio (int, optional): Posição inicial (paginação). Default é 0.
+        
+    Returns:
+        DataFrame: Coletas disponíveis na ordem de recência
+    """
+    if _usar_sqlite():
+        disponiveis = _ordenar_por_recencia(get_coletas_disponiveis(bairros))
+        fim = None if limite is None else inicio + limite
+        return disponiveis.iloc[inicio:fim]
+    
+    indice = _obter_coletas_abertas()
+    with _coletas_abertas_lock:
+        if bairros and len(bairros) > 0:
+            filas = [indice['bairros'][b] for b in set(bairros) if b in indice['bairros']]
+        else:
+            filas = list(indice['bairros'].values())
+        # Intercalar as filas dos bairros já ordenadas: custo proporcional ao que é lido
+        recentes = heapq.merge(*(reversed(fila) for fila in filas), reverse=True)
+        fim = None if limite is None else inicio + limite
+        registros = [indice['registros'][coleta_id]
+                     for _, coleta_id in itertools.islice(recentes, inicio, fim)]
+    
+    if not registros:
+        return aplicar_esquema(pd.DataFrame(columns=indice['colunas']), 'coletas')
+    return aplicar_esquema(pd.DataFrame(registros), 'coletas')
+
+def contar_coletas_abertas(bairros=None):
+    """
+    Conta as coletas disponíveis (sem catador atribuído) nos bairros.
+    
+    Args:
+        bairros (list, optional): Bairros a considerar. Default é None (todos).
+        
+    Returns:
+        int: Quantidade de coletas disponíveis
+    """
+    if _usar_sqlite():
+        return len(get_coletas_disponiveis(bairros))
+    
+    indice = _obter_coletas_abertas()
+    with _coletas_abertas_lock:
+        if bairros and len(bairros) > 0:
+            return sum(len(indice['bairros'].get(b, [])) for b in set(bairros))
+        return len(indice['posicoes'])
+
+# Funções de arquivamento das coletas encerradas (dados frios)
+
+def _particao_arquivo_path(periodo):
+    """Caminho da partição do arquivo de um mês ('AAAA-MM')."""
+    return os.path.join(ARQUIVO_COLETAS_DIR, f'coletas_{periodo}.csv.gz')
+
+def _periodos_arquivados():
+    """Meses ('AAAA-MM') com partição no arquivo, em ordem cronológica."""
+    try:
+        nomes = os.listdir(ARQUIVO_COLETAS_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(nome[len('coletas_'):-len('.csv.gz')] for nome in nomes
+                  if nome.startswith('coletas_') and nome.endswith('.csv.gz'))
+
+def _ler_particao_arquivo(path):
+    """
+    Lê uma partição do arquivo usando o cache compartilhado de leitura.
+    
+    Args:
+        path (str): Caminho da partição (.csv.gz)
+        
+    Returns:
+        DataFrame: Coletas da partição (visão somente leitura do cache)
+    """
+    assinatura = _assinatura_arquivo(path)
+    with _cache_lock:
+        entrada = _cache_tabelas.get(path)
+        if entrada is not None and entrada[0] == assinatura:
+            _cache_stats['hits'] += 1
+            return _visao_somente_leitura(entrada[1])
+        _cache_stats['misses'] += 1
+    
+    df = aplicar_esquema(pd.read_csv(path, compression='gzip'), 'coletas')
+    with _cache_lock:
+        _cache_tabelas[path] = (assinatura, df)
+    return _visao_somente_leitura(df)
+
+def _juntar_com_arquivo(ativas_df, arquivadas_df):
+    """
+    Soma as coletas arquivadas às ativas. Se uma coleta estiver nos dois
+    lugares (arquivamento interrompido), a versão ativa prevalece.
+    
+    Args:
+        ativas_df (DataFrame): Coletas da tabela ativa
+        arquivadas_df (DataFrame): Coletas do arquivo
+        
+    Returns:
+        DataFrame: Coletas ativas seguidas das arquivadas
+    """
+    if arquivadas_df.empty:
+        return ativas_df
+    arquivadas_df = arquivadas_df[~arquivadas_df['id'].isin(ativas_df['id'])]
+    return aplicar_esquema(pd.concat([ativas_df, arquivadas_df], ignore_index=True), 'coletas')
+
+def _maior_id_arquivado():
+    """Maior ID de coleta já arquivado (0 se o arquivo estiver vazio)."""
+    indice = ler_indice_json(INDICE_ARQUIVO_FILE, {'particoes': {}})
+    return max((p.get('maior_id', 0) for p in indice.get('particoes', {}).values()), default=0)
+
+def listar_particoes_arquivo():
+    """
+    Lista as partições do arquivo de coletas.
+    
+    Returns:
+        dict: Mês ('AAAA-MM') -> {'coletas': quantidade, 'maior_id': maior ID}
+    """
+    indice = ler_indice_json(INDICE_ARQUIVO_FILE, {'particoes': {}})
+    return dict(sorted(indice.get('particoes', {}).items()))
+
+def load_coletas_arquivadas(desde=None, ate=None):
+    """
+    Carrega as coletas arquivadas, lendo apenas as partições do período pedido.
+    
+    Args:
+        desde (str, optional): Primeiro mês ('AAAA-MM'). Default é None (sem limite).
+        ate (str, optional): Último mês ('AAAA-MM'). Default é None (sem limite).
+        
+    Returns:
+        DataFrame: Coletas arquivadas (vazio, com as colunas da tabela, se não houver)
+    """
+    quadros = [
+        _ler_particao_arquivo(_particao_arquivo_path(periodo))
+        for periodo in _periodos_arquivados()
+        if (desde is None or periodo >= desde) and (ate is None or periodo <= ate)
+    ]
+    if not quadros:
+        return load_coletas().iloc[0:0]
+    if len(quadros) == 1:
+        return quadros[0]
+    return aplicar_esquema(pd.concat(quadros, ignore_index=True), 'coletas')
+
+@_escrita
+def arquivar_coletas(dias=None, simular=False):
+    """
+    Move para o arquivo as coletas concluídas ou recusadas mais antigas que o
+    limite, deixando na tabela ativa apenas o trabalho aberto e recente.
+    
+    Cada coleta vai para a partição do mês da sua data de conclusão (ou, na
+    falta dela, da data da coleta, de criação ou de solicitação). Os
+    indicadores continuam contando as coletas arquivadas. Disponível apenas
+    no backend CSV: no SQLite as consultas já usam índices.
+    
+    Args:
+        dias (int, optional): Idade mínima em dias. Default é ARQUIVAMENTO_DIAS.
+        simular (bool, optional): Apenas calcula o que seria arquivado. Default é False.
+        
+    Returns:
+        dict: Mês ('AAAA-MM') -> quantidade de coletas arquivadas
+    """
+    if _usar_sqlite():
+        return {}
+    
+    dias = ARQUIVAMENTO_DIAS if dias is None else dias
+    limite = pd.Timestamp(datetime.now()) - pd.Timedelta(days=dias)
+    
+    with _lock_tabela(COLETAS_FILE):
+        coletas_df = load_coletas()
+        datas = _primeira_data(coletas_df, COLUNAS_DATA_ARQUIVO)
+        elegiveis = (coletas_df['status'].astype(object).isin(STATUS_ARQUIVAVEIS)
+                     & datas.notna() & (datas < limite))
+        if not elegiveis.any():
+            return {}
+        
+        periodos = datas[elegiveis].dt.strftime('%Y-%m')
+        resumo = {periodo: int(total) for periodo, total in periodos.value_counts().sort_index().items()}
+        if simular:
+            return resumo
+        
+        # Gravar primeiro as partições: uma interrupção deixa a coleta nos dois
+        # lugares (a versão ativa prevalece), nunca em nenhum
+        os.makedirs(ARQUIVO_COLETAS_DIR, exist_ok=True)
+        with trava_arquivo(INDICE_ARQUIVO_FILE + '.lock'):
+            indice = copy.deepcopy(ler_indice_json(INDICE_ARQUIVO_FILE, {'particoes': {}}))
+            indice.setdefault('particoes', {})
+            for periodo, grupo in coletas_df[elegiveis].groupby(periodos, sort=True):
+                path = _particao_arquivo_path(periodo)
+                if os.path.exists(path):
+                    grupo = _juntar_com_arquivo(grupo, _ler_particao_arquivo(path))
+                temp_path = path + '.tmp'
+                grupo.to_csv(temp_path, index=False, compression='gzip')
+                os.replace(temp_path, path)
+                indice['particoes'][periodo] = {'coletas': len(grupo), 'maior_id': _maior_id(grupo)}
+            gravar_indice_json(INDICE_ARQUIVO_FILE, indice)
+        
+        origem_antes = _origem_tabela(COLETAS_FILE)
+        _write_csv_table(COLETAS_FILE, coletas_df[~elegiveis])
+        # Os indicadores somam tabela ativa e arquivo: continuam válidos
+        _atualizar_indicadores(None, pd.DataFrame(), origem_antes)
+    return resumo
+
+# Funções de consulta combinada (coletas + usuários)
+
+def _indexar_por_id(df):
+    """Retorna o DataFrame indexado pela coluna 'id' (um registro por ID)."""
+    return df.drop_duplicates(subset='id', keep='last').set_index('id')
+
+@_memorizar_no_contexto('usuarios:indice')
+def get_users_index():
+    """
+    Retorna os usuários indexados pelo ID, para buscas diretas com .loc/.reindex
+    em vez de comparar a coluna 'id' inteira a cada consulta.
+    
+    O índice é reaproveitado enquanto o arquivo de usuários não mudar.
+    
+    Returns:
+        DataFrame: Usuários com índice 'id'
+    """
+    if _usar_sqlite():
+        return _indexar_por_id(load_users())
+    
+    assinatura = _assinatura_tabela(USERS_FILE)
+    with _cache_lock:
+        entrada = _cache_indices.get(USERS_FILE)
+        if entrada is not None and entrada[0] == assinatura:
+            return _visao_somente_leitura(entrada[1])
+    
+    indice = _indexar_por_id(load_users())
+    with _cache_lock:
+        _cache_indices[USERS_FILE] = (assinatura, indice)
+    return _visao_somente_leitura(indice)
+
+def get_user_by_id(user_id):
+    """
+    Busca um usuário pelo ID usando o índice de usuários (ou, fora de uma
+    execução da página e sem o índice em cache, lendo apenas a linha do CSV).
+    
+    Args:
+        user_id (int): ID do usuário
+        
+    Returns:
+        dict: Dados do usuário ou None se não existir
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    
+    if not _usar_sqlite() and contexto_atual() is None:
+        with _cache_lock:
+            entrada = _cache_indices.get(USERS_FILE)
+        if entrada is None or entrada[0] != _assinatura_tabela(USERS_FILE):
+            # Consulta avulsa com o índice frio: ler só a linha do usuário. Numa
+            # execução da página o índice é montado uma vez e serve às demais buscas
+            return ler_registro('usuarios', user_id)
+    
+    indice = get_users_index()
+    if user_id not in indice.index:
+        return None
+    registro = indice.loc[user_id].to_dict()
+    registro['id'] = user_id
+    return registro
+
+def _juntar_usuario(coletas_df, coluna_id, prefixo, padroes):
+    """
+    Acrescenta às coletas os dados do usuário referenciado em uma coluna de ID,
+    com uma única junção vetorizada pelo índice de usuários.
+    
+    Args:
+        coletas_df (DataFrame): Coletas a completar
+        coluna_id (str): Coluna com o ID do usuário ('morador_id' ou 'catador_id')
+        prefixo (str): Prefixo das novas colunas ('morador_' ou 'catador_')
+        padroes (dict): Campo do usuário -> texto usado quando o dado não existir
+        
+    Returns:
+        DataFrame: Coletas com as colunas <prefixo><campo>
+    """
+    campos = list(padroes.keys())
+    if coletas_df.empty or coluna_id not in coletas_df.columns:
+        resultado = coletas_df.copy()
+        for campo, padrao in padroes.items():
+            resultado[prefixo + campo] = pd.Series(padrao, index=resultado.index, dtype=object)
+        return resultado
+    
+    usuarios = get_users_index().reindex(columns=campos).astype(object)
+    resultado = coletas_df.join(usuarios.add_prefix(prefixo), on=coluna_id)
+    for campo, padrao in padroes.items():
+        resultado[prefixo + campo] = resultado[prefixo + campo].fillna(padrao)
+    return resultado
+
+def get_coletas_with_morador(coletas_df=None):
+    """
+    Retorna as coletas com os dados do morador prontos para exibição.
+    
+    Args:
+        coletas_df (DataFrame, optional): Coletas já filtradas. Se None, todas.
+        
+    Returns:
+        DataFrame: Coletas com as colunas morador_nome, morador_endereco e morador_bairro
+    """
+    if coletas_df is None:
+        coletas_df = load_coletas()
+    return _juntar_usuario(coletas_df, 'morador_id', 'morador_', {
+        'nome': 'Morador não encontrado',
+        'endereco': 'Endereço não especificado',
+        'bairro': 'Bairro não especificado',
+    })
+
+def get_coletas_with_catador(coletas_df=None):
+    """
+    Retorna as coletas com os dados do catador prontos para exibição.
+    
+    Args:
+        coletas_df (DataFrame, optional): Coletas já filtradas. Se None, todas.
+        
+    Returns:
+        DataFrame: Coletas com a coluna catador_nome
+    """
+    if coletas_df is None:
+        coletas_df = load_coletas()
+    return _juntar_usuario(coletas_df, 'catador_id', 'catador_', {
+        'nome': 'Catador não encontrado',
+    })
+
 # Funções de manipulação de notificações
 
+@_escrita
 def save_notificacao(notificacao_data):
     """
     Salva uma nova notificação no banco de dados.
@@ -425,21 +3321,33 @@ def save_notificacao(notificacao_data):
         tuple: (bool, str) - Sucesso da operação e mensagem
     """
     try:
-        notificacoes_df = load_notificacoes()
+        if _usar_sqlite():
+            # O ID é sempre gerado pelo banco, como no CSV
+            notificacao_data.pop('id', None)
+            notificacao_data['id'] = sqlite_backend.insert_row('notificacoes', notificacao_data)
+            _registrar_escrita('notificacoes')
+            return True, "Notificação enviada com sucesso!"
         
-        # Gerar novo ID
-        notificacao_data['id'] = 1 if notificacoes_df.empty else notificacoes_df['id'].max() + 1
+        # Gerar novo ID sem varrer a tabela
+        notificacao_data['id'] = proximo_id('notificacoes')
+        
+        # Anexar apenas a nova linha, quando o cabeçalho comporta todos os campos
+        if APPEND_MODE and _append_row(NOTIFICACOES_FILE, notificacao_data):
+            return True, "Notificação enviada com sucesso!"
+        
+        notificacoes_df = load_notificacoes()
         
         # Adicionar nova notificação
         new_notificacao_df = pd.DataFrame([notificacao_data])
         notificacoes_df = pd.concat([notificacoes_df, new_notificacao_df], ignore_index=True)
         
-        save_notificacoes(notificacoes_df)
+        save_notificacoes(notificacoes_df, _destinatarios(notificacoes_df, [notificacao_data['id']]))
         return True, "Notificação enviada com sucesso!"
     
     except Exception as e:
         return False, f"Erro ao enviar notificação: {str(e)}"
 
+@_escrita
 def marcar_notificacao_como_lida(notificacao_id):
     """
     Marca uma notificação como lida.
@@ -451,16 +3359,17 @@ def marcar_notificacao_como_lida(notificacao_id):
         tuple: (bool, str) - Sucesso da operação e mensagem
     """
     try:
-        notificacoes_df = load_notificacoes()
+        if _usar_sqlite():
+            if not sqlite_backend.update_row('notificacoes', notificacao_id, {'lida': True}):
+                return False, "Notificação não encontrada"
+            _registrar_escrita('notificacoes')
+            return True, "Notificação marcada como lida!"
         
-        # Verificar se a notificação existe
-        if not (notificacoes_df['id'] == notificacao_id).any():
+        # Edição pontual da linha no CSV; senão, gravada pelo escritor agrupado
+        if _atualizar_no_lugar('notificacoes', notificacao_id, {'lida': True}):
+            return True, "Notificação marcada como lida!"
+        if _executar_lote({'notificacoes': {notificacao_id: {'lida': True}}}):
             return False, "Notificação não encontrada"
-        
-        # Marcar como lida
-        notificacoes_df.loc[notificacoes_df['id'] == notificacao_id, 'lida'] = True
-        
-        save_notificacoes(notificacoes_df)
         return True, "Notificação marcada como lida!"
     
     except Exception as e:
@@ -477,22 +3386,43 @@ def get_notificacoes_by_usuario(usuario_id, tipo_usuario=None):
     Returns:
         DataFrame: DataFrame com as notificações do usuário
     """
-    notificacoes_df = load_notificacoes()
+    if _usar_sqlite():
+        colunas = sqlite_backend.get_columns('notificacoes')
+        usuario_id_col = 'usuario_id' if 'usuario_id' in colunas else 'para_usuario_id'
+        if usuario_id_col not in colunas:
+            return pd.DataFrame()
+        filtros = {usuario_id_col: usuario_id}
+        if tipo_usuario is not None and 'tipo_usuario' in colunas:
+            filtros['tipo_usuario'] = tipo_usuario
+        return aplicar_esquema(sqlite_backend.select_rows('notificacoes', filtros), 'notificacoes')
+    
+    if not os.path.exists(NOTIFICACOES_FILE):
+        load_notificacoes()
     
     # Verificar os nomes das colunas para garantir compatibilidade
-    if 'usuario_id' in notificacoes_df.columns:
-        usuario_id_col = 'usuario_id'
-    elif 'para_usuario_id' in notificacoes_df.columns:
-        usuario_id_col = 'para_usuario_id'
-    else:
+    colunas = _read_header(NOTIFICACOES_FILE)
+    if _coluna_destinatario(colunas) is None:
         # Se não encontrar nenhuma coluna esperada, retorna DataFrame vazio
         return pd.DataFrame()
     
-    # Filtrar por ID do usuário usando a coluna identificada
-    notificacoes = notificacoes_df[notificacoes_df[usuario_id_col] == usuario_id]
+    # Ler apenas a caixa de entrada do usuário
+    _garantir_caixas()
+    try:
+        caixa = _caixa_path(usuario_id)
+    except (TypeError, ValueError):
+        return pd.DataFrame(columns=colunas)
+    if not os.path.exists(caixa):
+        return aplicar_esquema(pd.DataFrame(columns=colunas), 'notificacoes')
+    if _usar_blocos(caixa):
+        # Caixa grande fora do cache: filtrar por tipo bloco a bloco
+        filtros = {}
+        if tipo_usuario is not None and 'tipo_usuario' in _read_header(caixa):
+            filtros['tipo_usuario'] = tipo_usuario
+        return _consultar_em_blocos(caixa, filtros)
+    notificacoes = _read_csv_table(caixa)
     
     # Se tipo_usuario for especificado e a coluna existir, filtrar também por tipo
-    if tipo_usuario is not None and 'tipo_usuario' in notificacoes_df.columns:
+    if tipo_usuario is not None and 'tipo_usuario' in notificacoes.columns:
         notificacoes = notificacoes[notificacoes['tipo_usuario'] == tipo_usuario]
     
     return notificacoes
@@ -578,9 +3508,14 @@ def save_profile_photo(user_id, uploaded_file):
     Salva a foto de perfil de um usuário.
     
     Implementa a lógica para:
-    1. Salvar foto com nome padronizado (user_{id}_foto_perfil.ext)
-    2. Remover fotos antigas do mesmo usuário
-    3. Garantir que cada usuário tenha apenas uma foto
+    1. Recomprimir a foto na thread de fotos (orientação EXIF, lado máximo,
+       WebP ou JPEG progressivo)
+    2. Gravar a foto com o hash do conteúdo no nome (envios idênticos são
+       gravados uma única vez)
+    3. Gerar as miniaturas (avatar e preview) e registrar a foto no manifesto
+    4. Atualizar o cadastro e só então remover a foto anterior do usuário,
+       se nenhum outro usuário a usar (se o cadastro falhar, o manifesto
+       volta à foto anterior)
     
     Args:
         user_id (int): ID do usuário
@@ -593,63 +3528,126 @@ def save_profile_photo(user_id, uploaded_file):
         # Garantir que user_id seja um inteiro
         user_id = int(user_id)
         
-        # Cria o diretório de uploads se não existir
-        import os
-        upload_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'uploads')
-        if not os.path.exists(upload_dir):
-            os.makedirs(upload_dir)
-            
-        # Cria também o diretório específico para fotos de perfil
-        fotos_perfil_dir = os.path.join(upload_dir, 'fotos_perfil')
-        if not os.path.exists(fotos_perfil_dir):
-            os.makedirs(fotos_perfil_dir)
-        
         # Verificar se é uma extensão de imagem válida
         file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif']
+        valid_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
         if file_extension not in valid_extensions:
-            return False, "Arquivo inválido. Por favor, envie uma imagem (jpg, png ou gif)."
-        
-        # Nome padronizado para a foto do usuário (sem timestamp)
-        filename = f"user_{user_id}_foto_perfil{file_extension}"
-        filepath = os.path.join(fotos_perfil_dir, filename)
-        
-        # Remover fotos antigas do mesmo usuário, se existirem
-        for ext in valid_extensions:
-            old_file = os.path.join(fotos_perfil_dir, f"user_{user_id}_foto_perfil{ext}")
-            if os.path.exists(old_file) and old_file != filepath:
-                try:
-                    os.remove(old_file)
-                except Exception as e:
-                    # Continuar mesmo se não conseguir remover o arquivo antigo
-                    print(f"Aviso: Não foi possível remover a foto antiga: {str(e)}")
+            return False, "Arquivo inválido. Por favor, envie uma imagem (jpg, png, gif ou webp)."
         
-        # Salvar o arquivo novo
-        with open(filepath, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Import local: o módulo de fotos usa as funções de índice deste módulo
+        from app.utils.fotos import foto_manifesto, processar_foto, descartar_foto, restaurar_foto
+        anterior = foto_manifesto(user_id)
+        entrada = processar_foto(user_id, uploaded_file.getbuffer())
+        if entrada is None:
+            return False, "Arquivo inválido. Não foi possível ler a imagem enviada."
         
-        # Verificar se o arquivo foi salvo corretamente
-        if not os.path.exists(filepath):
-            return False, f"Erro: Arquivo não foi salvo em {filepath}"
-            
         # Caminho relativo para o banco de dados (sempre com barras normais)
-        relative_path = 'uploads/fotos_perfil/' + filename
+        relative_path = entrada['path']
+        
+        # Atualizar o caminho da foto no cadastro do usuário
+        sucesso, mensagem = update_user(user_id, {'foto_perfil': relative_path})
+        if not sucesso:
+            # Cadastro inalterado: o manifesto volta à foto anterior
+            restaurar_foto(user_id, anterior, entrada)
+            return False, f"Erro ao salvar foto: {mensagem}"
         
-        # Carregar usuários e atualizar o caminho
-        import pandas as pd
-        # Usar USERS_FILE já definido no início do arquivo em vez de criar um novo caminho
-        users_df = pd.read_csv(USERS_FILE)
-        users_df.loc[users_df['id'] == user_id, 'foto_perfil'] = relative_path
-        users_df.to_csv(USERS_FILE, index=False)
+        # Foto anterior removida só depois que o cadastro aponta para a nova
+        if anterior is not None and anterior['path'] != relative_path:
+            descartar_foto(anterior)
         
-        print(f"Foto salva com sucesso em: {filepath}")
-        print(f"Caminho relativo no CSV: {relative_path}")
+        print(f"Foto salva com sucesso em: {relative_path} ({entrada['largura']}x{entrada['altura']} {entrada['formato']})")
         return True, relative_path
     
     except Exception as e:
         print(f"Erro ao salvar foto: {str(e)}")
         return False, f"Erro ao salvar foto: {str(e)}"
 
+def _chat_path(coleta_id):
+    """Retorna o caminho do log de conversa de uma coleta."""
+    return os.path.join(CHAT_DIR, f'coleta_{int(coleta_id)}.csv')
+
+def _anexar_mensagem_chat(registro):
+    """
+    Anexa uma mensagem ao log de conversa da coleta (criando o log se necessário).
+    
+    Args:
+        registro (dict): Mensagem com as colunas de CHAT_COLUNAS
+    """
+    os.makedirs(CHAT_DIR, exist_ok=True)
+    path = _chat_path(registro['coleta_id'])
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow([_formatar_valor_csv(registro.get(coluna)) for coluna in CHAT_COLUNAS])
+    
+    with _lock_tabela(path):
+        try:
+            # Modo 'x': só um processo cria o log e grava o cabeçalho
+            with open(path, 'x', encoding='utf-8', newline='') as f:
+                csv.writer(f, lineterminator='\n').writerow(CHAT_COLUNAS)
+        except FileExistsError:
+            pass
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            f.write(buffer.getvalue())
+
+@_sem_contexto
+def _migrar_chats():
+    """
+    Cria os logs de conversa a partir das mensagens de chat antigas, gravadas
+    apenas em notificações (executado uma única vez).
+    """
+    marcador = os.path.join(CHAT_DIR, '.migrado')
+    if os.path.exists(marcador):
+        return
+    
+    with _lock_tabela(CHAT_DIR):
+        if os.path.exists(marcador):
+            return
+        os.makedirs(CHAT_DIR, exist_ok=True)
+        if _usar_blocos(NOTIFICACOES_FILE):
+            # Tabela grande: trazer só as mensagens de chat, bloco a bloco
+            notificacoes_df = _consultar_em_blocos(
+                NOTIFICACOES_FILE, {'tipo': 'chat_coleta', 'referencia_id': pd.Series.notna}
+            )
+        else:
+            notificacoes_df = load_notificacoes()
+        
+        if 'tipo' in notificacoes_df.columns and 'referencia_id' in notificacoes_df.columns:
+            mensagens = notificacoes_df[
+                (notificacoes_df['tipo'] == 'chat_coleta') &
+                notificacoes_df['referencia_id'].notna()
+            ]
+            if not mensagens.empty:
+                mensagens = mensagens.sort_values(['data', 'id'], kind='stable')
+                destino = _coluna_destinatario(mensagens.columns)
+                remetente_tipo = mensagens.get('remetente_tipo', pd.Series('', index=mensagens.index))
+                remetente_tipo = remetente_tipo.astype(object).fillna('').astype(str)
+                # As notificações guardam o texto como "Catador: mensagem"
+                prefixo = remetente_tipo.str.title() + ': '
+                texto = mensagens['mensagem'].astype(object).fillna('').astype(str)
+                sem_prefixo = [
+                    t[len(p):] if t.startswith(p) else t for t, p in zip(texto, prefixo)
+                ]
+                
+                log = pd.DataFrame({
+                    'id': mensagens['id'],
+                    'coleta_id': mensagens['referencia_id'],
+                    'remetente_id': mensagens.get('remetente_id'),
+                    'remetente_tipo': remetente_tipo,
+                    'destinatario_id': mensagens[destino] if destino else pd.NA,
+                    'destinatario_tipo': mensagens.get('tipo_usuario'),
+                    'mensagem': sem_prefixo,
+                    'data': mensagens['data'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+                }, columns=CHAT_COLUNAS)
+                
+                for coleta_id, conversa in log.groupby('coleta_id', sort=False):
+                    path = _chat_path(coleta_id)
+                    temp_path = path + '.tmp'
+                    conversa.to_csv(temp_path, index=False, lineterminator='\n')
+                    os.replace(temp_path, path)
+        
+        with open(marcador, 'w', encoding='utf-8') as f:
+            f.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
 def save_chat_message(coleta_id, remetente_id, remetente_tipo, destinatario_id, destinatario_tipo, mensagem):
     """
     Salva uma mensagem de chat entre catador e morador para uma coleta específica.
@@ -666,7 +3664,9 @@ def save_chat_message(coleta_id, remetente_id, remetente_tipo, destinatario_id,
         tuple: (bool, str) - Sucesso da operação e mensagem
     """
     try:
-        # Usar as notificações existentes para implementar o chat
+        _migrar_chats()
+        
+        # A notificação avisa o destinatário; o log da coleta guarda a conversa
         nova_mensagem = {
             "usuario_id": destinatario_id,
             "tipo_usuario": destinatario_tipo,
@@ -680,33 +3680,99 @@ def save_chat_message(coleta_id, remetente_id, remetente_tipo, destinatario_id,
             "remetente_tipo": remetente_tipo
         }
         
-        return save_notificacao(nova_mensagem)
+        sucesso, msg = save_notificacao(nova_mensagem)
+        if not sucesso:
+            return sucesso, msg
+        
+        _anexar_mensagem_chat({
+            "id": nova_mensagem.get("id"),
+            "coleta_id": coleta_id,
+            "remetente_id": remetente_id,
+            "remetente_tipo": remetente_tipo,
+            "destinatario_id": destinatario_id,
+            "destinatario_tipo": destinatario_tipo,
+            "mensagem": mensagem,
+            "data": nova_mensagem["data"]
+        })
+        return sucesso, msg
         
     except Exception as e:
         return False, f"Erro ao enviar mensagem: {str(e)}"
 
-def get_chat_messages(coleta_id):
+def _fim_registros_completos(dados):
     """
-    Retorna todas as mensagens de chat de uma coleta específica.
+    Retorna a posição logo após o último registro CSV completo em dados.
+    
+    Uma quebra de linha só encerra um registro fora de aspas: mensagens com
+    várias linhas ficam entre aspas e não são cortadas no meio.
     
     Args:
-        coleta_id (int): ID da coleta
+        dados (bytes): Conteúdo lido a partir do início de um registro
         
     Returns:
-        DataFrame: DataFrame com as mensagens do chat
+        int: Quantidade de bytes que formam registros completos
     """
-    try:
-        notificacoes_df = load_notificacoes()
+    fim = 0
+    aspas = 0
+    inicio = 0
+    posicao = dados.find(b'\n')
+    while posicao != -1:
+        aspas += dados.count(b'"', inicio, posicao)
+        inicio = posicao
+        if aspas % 2 == 0:
+            fim = posicao + 1
+        posicao = dados.find(b'\n', posicao + 1)
+    return fim
+
+def get_chat_messages(coleta_id, since=None):
+    """
+    Retorna as mensagens de chat de uma coleta específica, lidas do log da conversa.
+    
+    Com since (cursor devolvido por uma chamada anterior), só as mensagens
+    gravadas depois do cursor são lidas. O novo cursor fica em
+    resultado.attrs['cursor'] e a posição lida em resultado.attrs['desde']
+    (0 quando o log foi lido desde o início).
+    
+    Args:
+        coleta_id (int): ID da coleta
+        since (int, optional): Cursor da última leitura
         
-        # Filtrar mensagens de chat desta coleta específica
-        if 'tipo' in notificacoes_df.columns and 'referencia_id' in notificacoes_df.columns:
-            chat_messages = notificacoes_df[
-                (notificacoes_df['tipo'] == 'chat_coleta') & 
-                (notificacoes_df['referencia_id'] == coleta_id)
-            ]
-            return chat_messages.sort_values('data', ascending=True) if not chat_messages.empty else pd.DataFrame()
-        else:
-            return pd.DataFrame()
-            
-    except Exception as e:
-        return pd.DataFrame()
\ No newline at end of file
+    Returns:
+        DataFrame: DataFrame com as mensagens do chat, em ordem de envio
+        
+    Raises:
+        OSError: Se o log não puder ser lido
+        ValueError: Se o log estiver corrompido (CSV ou UTF-8 inválido)
+    """
+    _migrar_chats()
+    path = _chat_path(coleta_id)
+    vazio = pd.DataFrame(columns=CHAT_COLUNAS)
+    vazio.attrs.update(cursor=since or 0, desde=since or 0)
+    if not os.path.exists(path):
+        return vazio
+    
+    with open(path, 'rb') as f:
+        tamanho = f.seek(0, os.SEEK_END)
+        # Cursor além do fim: o log foi recriado, ler desde o início
+        desde = since if since and since <= tamanho else 0
+        f.seek(desde)
+        dados = f.read()
+    
+    # Considerar apenas registros completos (uma escrita pode estar em andamento)
+    fim = _fim_registros_completos(dados)
+    dados = dados[:fim]
+    cursor = desde + fim
+    
+    if not dados:
+        vazio.attrs.update(cursor=cursor, desde=desde)
+        return vazio
+    if desde == 0:
+        chat_messages = pd.read_csv(io.BytesIO(dados), dtype={'mensagem': str})
+    else:
+        chat_messages = pd.read_csv(
+            io.BytesIO(dados), header=None, names=CHAT_COLUNAS, dtype={'mensagem': str}
+        )
+    chat_messages['mensagem'] = chat_messages['mensagem'].fillna('')
+    
+    chat_messages.attrs.update(cursor=cursor, desde=desde)
+    return chat_messages
@@ -0,0 +1,622 @@
+"""
+Fotos de perfil do sistema Coleta Seletiva Conectada
+
+Este módulo processa as fotos enviadas no upload em uma thread própria: a
+imagem é decodificada, girada conforme a orientação EXIF, reduzida a um lado
+máximo e recodificada (WebP ou JPEG progressivo, sem os metadados da câmera).
+O resultado é gravado com o hash do conteúdo no nome, de modo que envios
+idênticos ocupam um único arquivo e cada versão de uma foto nunca muda.
+
+Cada foto tem miniaturas de tamanho fixo (avatar de 120px e pré-visualização de
+300px) e é registrada em um manifesto (uploads/fotos_perfil/manifesto.json:
+caminho, formato, dimensões, mtime e hash do conteúdo da foto e das
+miniaturas). As páginas localizam as fotos por consulta ao manifesto, sem
+verificar arquivos, e as miniaturas são publicadas como arquivos estáticos
+(app/utils/assets.py) ou, sem servidor estático, viram data URIs em um cache
+LRU. Cada execução da página envia uma URL ou alguns kilobytes em vez da foto
+original, que pode ter megabytes.
+"""
+
+import os
+import io
+import re
+import time
+import queue
+import base64
+import functools
+import threading
+from concurrent.futures import Future
+
+from PIL import Image, ImageOps, features
+
+from app.utils.assets import hash_conteudo, hash_dados, url_asset
+from app.utils.database import trava_arquivo, ler_indice_json, gravar_indice_json, load_users
+
+# Diretórios das fotos de perfil e das miniaturas geradas a partir delas
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FOTOS_PERFIL_DIR = os.path.join(BASE_DIR, 'uploads', 'fotos_perfil')
+MINIATURAS_DIR = os.path.join(FOTOS_PERFIL_DIR, 'miniaturas')
+# Manifesto das fotos: user_id -> caminho, formato, dimensões, mtime, hash e miniaturas
+MANIFESTO_FILE = os.path.join(FOTOS_PERFIL_DIR, 'manifesto.json')
+# Segundos entre as conferências do manifesto em disco (alterações de outros processos)
+MANIFESTO_TTL = float(os.environ.get('COLETA_MANIFESTO_TTL', 1))
+# Nome das fotos enviadas antes do armazenamento por conteúdo (user_{id}_foto_perfil.ext)
+PADRAO_FOTO = re.compile(r'user_(\d+)_foto_perfil\.(?:jpg|jpeg|png|gif)', re.IGNORECASE)
+
+# Lado máximo (pixels) da foto gravada no upload
+LADO_MAXIMO_FOTO = int(os.environ.get('COLETA_FOTO_LADO_MAXIMO', 1024))
+# Formato da foto gravada: 'webp' ou 'jpeg' (JPEG progressivo); WebP exige suporte no Pillow
+FORMATO_FOTO = os.environ.get('COLETA_FOTO_FORMATO', 'webp' if features.check('webp') else 'jpeg').lower()
+# Qualidade da recompressão da foto
+QUALIDADE_FOTO = int(os.environ.get('COLETA_QUALIDADE_FOTO', 82))
+
+# Lado (pixels) de cada miniatura quadrada
+TAMANHOS_MINIATURA = {
+    'avatar': 120,
+    'preview': 300,
+}
+# Qualidade JPEG das miniaturas
+QUALIDADE_MINIATURA = int(os.environ.get('COLETA_QUALIDADE_MINIATURA', 85))
+# Quantidade de data URIs mantidos no cache LRU
+MINIATURAS_CACHE_MAX = int(os.environ.get('COLETA_MINIATURAS_CACHE_MAX', 512))
+
+# Tipo MIME de cada extensão de foto aceita no upload
+TIPOS_MIME = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+# Cópia em memória do manifesto: (instante da leitura, fotos)
+_manifesto_cache = None
+
+# Fila de fotos enviadas, processadas uma a uma pela thread de fotos
+_fila_fotos = queue.Queue()
+_processador = None
+_processador_lock = threading.Lock()
+_processamento_stats = {'fotos': 0, 'duplicadas': 0, 'bytes_recebidos': 0, 'bytes_gravados': 0}
+
+
+def caminho_foto(foto_perfil):
+    """
+    Resolve o caminho gravado no cadastro (relativo à raiz do projeto).
+
+    Args:
+        foto_perfil (str): Valor da coluna foto_perfil
+
+    Returns:
+        str: Caminho absoluto da foto, ou None se não houver foto
+    """
+    if not foto_perfil or not isinstance(foto_perfil, str):
+        return None
+    foto_perfil = foto_perfil.strip().replace('\\', '/')
+    if not foto_perfil or foto_perfil.lower() == 'nan':
+        return None
+    return os.path.join(BASE_DIR, foto_perfil)
+
+
+def foto_path(hash_foto):
+    """Retorna o caminho de uma foto armazenada pelo hash do conteúdo."""
+    extensao = '.webp' if FORMATO_FOTO == 'webp' else '.jpg'
+    return os.path.join(FOTOS_PERFIL_DIR, f'{hash_foto}{extensao}')
+
+
+def miniatura_path(hash_foto, tamanho):
+    """Retorna o caminho da miniatura de uma foto no tamanho indicado."""
+    return os.path.join(MINIATURAS_DIR, f'{hash_foto}_{tamanho}.jpg')
+
+
+def _sem_transparencia(imagem):
+    """Converte a imagem para RGB, compondo a transparência sobre fundo branco."""
+    if imagem.mode in ('RGBA', 'LA', 'P'):
+        imagem = imagem.convert('RGBA')
+        fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+        fundo.paste(imagem, mask=imagem.getchannel('A'))
+        return fundo
+    if imagem.mode != 'RGB':
+        return imagem.convert('RGB')
+    return imagem
+
+
+def _reduzir(imagem, lado):
+    """
+    Recorta a imagem no centro e a reduz para um quadrado de lado fixo,
+    respeitando a orientação EXIF e sem transparência (JPEG).
+
+    Args:
+        imagem (Image): Imagem original
+        lado (int): Lado da miniatura em pixels
+
+    Returns:
+        Image: Miniatura em RGB
+    """
+    imagem = _sem_transparencia(ImageOps.exif_transpose(imagem))
+    return ImageOps.fit(imagem, (lado, lado), Image.LANCZOS)
+
+
+def _codificar_jpeg(imagem):
+    """Codifica uma miniatura em JPEG e retorna os bytes."""
+    buffer = io.BytesIO()
+    imagem.save(buffer, format='JPEG', quality=QUALIDADE_MINIATURA, optimize=True)
+    return buffer.getvalue()
+
+
+def _gravar_arquivo(destino, dados):
+    """Grava em arquivo temporário e substitui: leitores nunca veem o arquivo pela metade."""
+    temp_path = f'{destino}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(dados)
+    os.replace(temp_path, destino)
+
+
+def gerar_miniaturas(hash_foto, origem):
+    """
+    Gera as miniaturas (avatar e preview) de uma foto. Miniaturas já geradas
+    para o mesmo conteúdo são reaproveitadas.
+
+    Args:
+        hash_foto (str): Hash do conteúdo da foto
+        origem (str): Caminho da foto
+
+    Returns:
+        dict: Tamanho -> caminho da miniatura (vazio se a imagem for inválida)
+    """
+    os.makedirs(MINIATURAS_DIR, exist_ok=True)
+    destinos = {tamanho: miniatura_path(hash_foto, tamanho) for tamanho in TAMANHOS_MINIATURA}
+    if all(os.path.exists(destino) for destino in destinos.values()):
+        return destinos
+    try:
+        with Image.open(origem) as imagem:
+            imagem.load()
+            for tamanho, lado in TAMANHOS_MINIATURA.items():
+                _gravar_arquivo(destinos[tamanho], _codificar_jpeg(_reduzir(imagem, lado)))
+    except Exception as e:
+        print(f"Erro ao gerar miniaturas da foto {hash_foto}: {e}")
+        return {}
+    return destinos
+
+
+def remover_miniaturas(hash_foto):
+    """Remove as miniaturas de uma foto (ex.: ao remover a foto)."""
+    for tamanho in TAMANHOS_MINIATURA:
+        try:
+            os.remove(miniatura_path(hash_foto, tamanho))
+        except FileNotFoundError:
+            pass
+
+
+def caminho_relativo(path):
+    """
+    Retorna o caminho relativo à raiz do projeto, sempre com barras normais
+    (formato gravado no manifesto e na coluna foto_perfil).
+
+    Args:
+        path (str): Caminho absoluto
+
+    Returns:
+        str: Caminho relativo
+    """
+    return os.path.relpath(path, BASE_DIR).replace(os.sep, '/')
+
+
+def descrever_foto(origem, hash_foto=None):
+    """
+    Gera as miniaturas de uma foto e monta a entrada do manifesto.
+
+    Args:
+        origem (str): Caminho da foto
+        hash_foto (str, optional): Hash do conteúdo já calculado. Default é None.
+
+    Returns:
+        dict: Entrada do manifesto, ou None se a imagem for inválida
+    """
+    try:
+        with Image.open(origem) as imagem:
+            formato, (largura, altura) = imagem.format, imagem.size
+    except Exception as e:
+        print(f"Erro ao ler a foto {origem}: {e}")
+        return None
+    hash_foto = hash_foto or hash_conteudo(origem)
+    miniaturas = gerar_miniaturas(hash_foto, origem)
+    if len(miniaturas) != len(TAMANHOS_MINIATURA):
+        return None
+    return {
+        'path': caminho_relativo(origem),
+        'formato': formato,
+        'largura': largura,
+        'altura': altura,
+        'mtime': os.stat(origem).st_mtime_ns,
+        'hash': hash_foto,
+        'miniaturas': {
+            tamanho: {'path': caminho_relativo(path), 'hash': hash_conteudo(path)}
+            for tamanho, path in miniaturas.items()
+        },
+    }
+
+
+def _gravar_manifesto(fotos):
+    """Grava o manifesto e atualiza a cópia em memória do processo."""
+    global _manifesto_cache
+    gravar_indice_json(MANIFESTO_FILE, {'fotos': fotos})
+    _manifesto_cache = (time.monotonic(), fotos)
+
+
+def regravar_manifesto(fotos):
+    """
+    Substitui todo o conteúdo do manifesto (ex.: depois de um reparo).
+
+    Args:
+        fotos (dict): user_id (str) -> entrada do manifesto
+    """
+    with trava_arquivo(MANIFESTO_FILE + '.lock'):
+        _gravar_manifesto(fotos)
+
+
+def reconstruir_manifesto():
+    """
+    Monta o manifesto a partir do cadastro de usuários (coluna foto_perfil) e
+    das fotos com nome padronizado enviadas antes do manifesto, gerando as
+    miniaturas que faltarem.
+
+    Returns:
+        dict: user_id (str) -> entrada do manifesto
+    """
+    encontradas = {}
+    if os.path.isdir(FOTOS_PERFIL_DIR):
+        for nome in os.listdir(FOTOS_PERFIL_DIR):
+            correspondencia = PADRAO_FOTO.fullmatch(nome)
+            if correspondencia is None:
+                continue
+            path = os.path.join(FOTOS_PERFIL_DIR, nome)
+            chave = correspondencia.group(1)
+            # Mais de uma foto do mesmo usuário: vale a mais recente
+            if chave not in encontradas or os.path.getmtime(path) > os.path.getmtime(encontradas[chave]):
+                encontradas[chave] = path
+    try:
+        usuarios = load_users()
+        if 'foto_perfil' in usuarios.columns:
+            for user_id, foto_perfil in zip(usuarios['id'], usuarios['foto_perfil']):
+                path = caminho_foto(foto_perfil)
+                # O cadastro prevalece sobre os nomes antigos
+                if path is not None and os.path.isfile(path):
+                    encontradas[str(int(user_id))] = path
+    except Exception as e:
+        print(f"Aviso: cadastro de usuários indisponível para o manifesto de fotos: {e}")
+
+    with trava_arquivo(MANIFESTO_FILE + '.lock'):
+        fotos = {}
+        descricoes = {}
+        for chave, path in encontradas.items():
+            if path not in descricoes:
+                descricoes[path] = descrever_foto(path)
+            if descricoes[path] is not None:
+                fotos[chave] = descricoes[path]
+        _gravar_manifesto(fotos)
+    return fotos
+
+
+def carregar_manifesto():
+    """
+    Retorna o manifesto das fotos de perfil. A cópia em memória é conferida
+    com o arquivo no máximo a cada MANIFESTO_TTL segundos (outros processos).
+
+    Returns:
+        dict: user_id (str) -> {'path', 'formato', 'largura', 'altura',
+        'mtime', 'hash', 'miniaturas'}
+    """
+    global _manifesto_cache
+    agora = time.monotonic()
+    if _manifesto_cache is not None and agora - _manifesto_cache[0] < MANIFESTO_TTL:
+        return _manifesto_cache[1]
+    if not os.path.exists(MANIFESTO_FILE):
+        return reconstruir_manifesto()
+    fotos = ler_indice_json(MANIFESTO_FILE, {'fotos': {}}).get('fotos', {})
+    _manifesto_cache = (agora, fotos)
+    return fotos
+
+
+def foto_manifesto(user_id):
+    """
+    Retorna a entrada do manifesto da foto de um usuário.
+
+    Args:
+        user_id (int): ID do usuário
+
+    Returns:
+        dict: Entrada do manifesto, ou None se o usuário não tiver foto
+    """
+    try:
+        chave = str(int(user_id))
+    except (TypeError, ValueError):
+        return None
+    return carregar_manifesto().get(chave)
+
+
+def _definir_entrada(user_id, entrada):
+    """
+    Grava no manifesto a entrada da foto de um usuário (None remove a entrada).
+
+    Args:
+        user_id (int): ID do usuário
+        entrada (dict): Entrada do manifesto, ou None
+
+    Returns:
+        dict: Entrada que o usuário tinha antes (ou None)
+    """
+    carregar_manifesto()
+    with trava_arquivo(MANIFESTO_FILE + '.lock'):
+        fotos = dict(ler_indice_json(MANIFESTO_FILE, {'fotos': {}}).get('fotos', {}))
+        if entrada is None:
+            anterior = fotos.pop(str(int(user_id)), None)
+        else:
+            anterior = fotos.get(str(int(user_id)))
+            fotos[str(int(user_id))] = entrada
+        _gravar_manifesto(fotos)
+    return anterior
+
+
+def descartar_foto(entrada):
+    """
+    Remove o arquivo de uma foto (e suas miniaturas) se nenhum usuário do
+    manifesto o estiver usando, ex.: a foto anterior depois de uma troca.
+
+    Args:
+        entrada (dict): Entrada do manifesto da foto
+    """
+    if entrada is None:
+        return
+    with trava_arquivo(MANIFESTO_FILE + '.lock'):
+        fotos = ler_indice_json(MANIFESTO_FILE, {'fotos': {}}).get('fotos', {})
+        if any(outra['path'] == entrada['path'] for outra in fotos.values()):
+            return
+        try:
+            os.remove(os.path.join(BASE_DIR, entrada['path']))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Continuar mesmo se não conseguir remover o arquivo antigo
+            print(f"Aviso: Não foi possível remover a foto antiga: {str(e)}")
+        if not any(outra['hash'] == entrada['hash'] for outra in fotos.values()):
+            remover_miniaturas(entrada['hash'])
+
+
+def restaurar_foto(user_id, anterior, nova):
+    """
+    Desfaz o registro de uma nova foto (ex.: quando o cadastro não pôde ser
+    atualizado): o manifesto volta à entrada anterior e a nova foto é
+    removida se ninguém mais a usar.
+
+    Args:
+        user_id (int): ID do usuário
+        anterior (dict): Entrada anterior do usuário (ou None)
+        nova (dict): Entrada da foto que não foi confirmada
+    """
+    _definir_entrada(user_id, anterior)
+    if anterior is None or anterior['path'] != nova['path']:
+        descartar_foto(nova)
+
+
+def registrar_foto(user_id, origem):
+    """
+    Gera as miniaturas de uma foto já gravada, registra-a no manifesto e
+    descarta a foto anterior do usuário.
+
+    Args:
+        user_id (int): ID do usuário
+        origem (str): Caminho da foto
+
+    Returns:
+        dict: Entrada do manifesto, ou None se a imagem for inválida
+    """
+    entrada = descrever_foto(origem)
+    if entrada is not None:
+        anterior = _definir_entrada(user_id, entrada)
+        if anterior is not None and anterior['path'] != entrada['path']:
+            descartar_foto(anterior)
+    return entrada
+
+
+def _recomprimir(dados):
+    """
+    Decodifica uma foto enviada, aplica a orientação EXIF, reduz ao lado
+    máximo e recodifica no formato configurado. Os metadados (EXIF, GPS) não
+    são copiados.
+
+    Args:
+        dados (bytes): Conteúdo do arquivo enviado
+
+    Returns:
+        bytes: Foto recodificada
+    """
+    with Image.open(io.BytesIO(dados)) as imagem:
+        # JPEG: decodificar já em escala reduzida (bem mais rápido para fotos de câmera)
+        imagem.draft(imagem.mode, (LADO_MAXIMO_FOTO, LADO_MAXIMO_FOTO))
+        imagem = ImageOps.exif_transpose(imagem)
+        imagem.thumbnail((LADO_MAXIMO_FOTO, LADO_MAXIMO_FOTO), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if FORMATO_FOTO == 'webp':
+            if imagem.mode not in ('RGB', 'RGBA'):
+                imagem = imagem.convert('RGBA' if 'transparency' in imagem.info or imagem.mode in ('LA', 'P') else 'RGB')
+            imagem.save(buffer, format='WEBP', quality=QUALIDADE_FOTO, method=4)
+        else:
+            _sem_transparencia(imagem).save(buffer, format='JPEG', quality=QUALIDADE_FOTO,
+                                            optimize=True, progressive=True)
+        return buffer.getvalue()
+
+
+def _processar_foto(user_id, dados):
+    """
+    Recomprime uma foto enviada, grava-a pelo hash do conteúdo (se ainda não
+    existir) e a registra no manifesto. A foto anterior do usuário não é
+    removida aqui: quem chama a descarta (descartar_foto) depois de atualizar
+    o cadastro, ou desfaz o registro (restaurar_foto).
+
+    Args:
+        user_id (int): ID do usuário
+        dados (bytes): Conteúdo do arquivo enviado
+
+    Returns:
+        dict: Entrada do manifesto, ou None se a imagem for inválida
+    """
+    try:
+        recomprimida = _recomprimir(dados)
+    except Exception as e:
+        print(f"Erro ao ler a foto do usuário {user_id}: {e}")
+        return None
+    hash_foto = hash_dados(recomprimida)
+    destino = foto_path(hash_foto)
+    duplicada = os.path.exists(destino)
+    if not duplicada:
+        os.makedirs(FOTOS_PERFIL_DIR, exist_ok=True)
+        _gravar_arquivo(destino, recomprimida)
+
+    entrada = descrever_foto(destino, hash_foto)
+    if entrada is None:
+        return None
+    _definir_entrada(user_id, entrada)
+    with _processador_lock:
+        _processamento_stats['fotos'] += 1
+        _processamento_stats['duplicadas'] += int(duplicada)
+        _processamento_stats['bytes_recebidos'] += len(dados)
+        _processamento_stats['bytes_gravados'] += 0 if duplicada else len(recomprimida)
+    return entrada
+
+
+def _iniciar_processador():
+    """Inicia (uma única vez por processo) a thread que processa as fotos enfileiradas"""
+    global _processador
+    with _processador_lock:
+        if _processador is None or not _processador.is_alive():
+            _processador = threading.Thread(target=_laco_processador, name='coleta-fotos', daemon=True)
+            _processador.start()
+
+
+def _laco_processador():
+    """Laço da thread de fotos: processa cada envio e responde pelo seu Future."""
+    while True:
+        (user_id, dados), futuro = _fila_fotos.get()
+        try:
+            futuro.set_result(_processar_foto(user_id, dados))
+        except Exception as e:
+            futuro.set_exception(e)
+
+
+def processar_foto(user_id, dados):
+    """
+    Entrega uma foto enviada à thread de fotos e aguarda o resultado. A
+    decodificação e a recompressão de envios simultâneos acontecem uma de
+    cada vez, fora das sessões.
+
+    Args:
+        user_id (int): ID do usuário
+        dados (bytes): Conteúdo do arquivo enviado
+
+    Returns:
+        dict: Entrada do manifesto, ou None se a imagem for inválida
+    """
+    _iniciar_processador()
+    futuro = Future()
+    _fila_fotos.put(((int(user_id), bytes(dados)), futuro))
+    return futuro.result()
+
+
+def get_processamento_fotos_stats():
+    """
+    Retorna os contadores do processamento de fotos enviadas.
+
+    Returns:
+        dict: Fotos processadas, duplicadas (já armazenadas), bytes recebidos,
+        bytes gravados e fila pendente
+    """
+    with _processador_lock:
+        stats = dict(_processamento_stats)
+    stats['fila'] = _fila_fotos.qsize()
+    return stats
+
+
+@functools.lru_cache(maxsize=MINIATURAS_CACHE_MAX)
+def _data_uri(path):
+    """
+    Lê uma miniatura e monta o data URI. As miniaturas têm o hash da foto no
+    nome e nunca mudam, então o caminho basta como chave do cache.
+    """
+    mime_type = TIPOS_MIME.get(os.path.splitext(path)[1].lower(), 'image/jpeg')
+    with open(path, 'rb') as f:
+        return f"data:{mime_type};base64,{base64.b64encode(f.read()).decode()}"
+
+
+def foto_perfil_data_uri(user_id, tamanho='avatar'):
+    """
+    Retorna o data URI da miniatura da foto de perfil de um usuário, para uso
+    em <img src="..."> no HTML das páginas.
+
+    Args:
+        user_id (int): ID do usuário
+        tamanho (str, optional): 'avatar' (120px) ou 'preview' (300px). Default é 'avatar'.
+
+    Returns:
+        str: Data URI da imagem, ou None se o usuário não tiver foto
+    """
+    entrada = foto_manifesto(user_id)
+    if entrada is None:
+        return None
+    try:
+        path = os.path.join(BASE_DIR, entrada['miniaturas'][tamanho]['path'])
+        return _data_uri(path)
+    except (KeyError, OSError):
+        return None
+
+
+def foto_perfil_src(user_id, tamanho='avatar'):
+    """
+    Retorna o src da miniatura da foto de perfil: a URL curta publicada em
+    static/fotos (com o hash do conteúdo, guardada em cache pelo navegador) ou,
+    sem servidor de arquivos estáticos, o data URI em cache. A foto é
+    localizada pelo manifesto, sem consultar o sistema de arquivos.
+
+    Args:
+        user_id (int): ID do usuário
+        tamanho (str, optional): 'avatar' (120px) ou 'preview' (300px). Default é 'avatar'.
+
+    Returns:
+        str: URL ou data URI da imagem, ou None se o usuário não tiver foto
+    """
+    entrada = foto_manifesto(user_id)
+    if entrada is None or tamanho not in entrada.get('miniaturas', {}):
+        return None
+    miniatura = entrada['miniaturas'][tamanho]
+    path = os.path.join(BASE_DIR, miniatura['path'])
+    return url_asset(path, 'fotos', miniatura['hash']) or foto_perfil_data_uri(user_id, tamanho)
+
+
+def upload_data_uri(uploaded_file, tamanho='preview'):
+    """
+    Retorna o data URI de uma miniatura de um arquivo recém-carregado (ainda
+    não salvo), para a pré-visualização do formulário.
+
+    Args:
+        uploaded_file: Arquivo de imagem carregado via streamlit
+        tamanho (str, optional): 'avatar' ou 'preview'. Default é 'preview'.
+
+    Returns:
+        str: Data URI da miniatura em JPEG
+    """
+    try:
+        with Image.open(uploaded_file) as imagem:
+            dados = _codificar_jpeg(_reduzir(imagem, TAMANHOS_MINIATURA[tamanho]))
+    finally:
+        uploaded_file.seek(0)  # Reset do buffer para o salvamento
+    return f"data:image/jpeg;base64,{base64.b64encode(dados).decode()}"
+
+
+def get_miniaturas_cache_stats():
+    """
+    Retorna os contadores do cache de data URIs.
+
+    Returns:
+        dict: Acertos ('hits'), faltas ('misses') e entradas ('entradas')
+    """
+    info = _data_uri.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'entradas': info.currsize}
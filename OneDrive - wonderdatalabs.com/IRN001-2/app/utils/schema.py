@@ -0,0 +1,331 @@
+"""
+Esquema de tipos das tabelas do sistema Coleta Seletiva Conectada
+
+Este módulo declara os tipos de cada coluna das tabelas CSV (usuários, coletas e
+notificações) e aplica esses tipos aos DataFrames carregados ou salvos:
+IDs como inteiros anuláveis (Int32), enumerações como 'category' e colunas de
+data como datetime64, e a versão das linhas (controle de concorrência otimista)
+como inteiro. Também unifica as colunas equivalentes das coletas em um
+conjunto canônico, com o peso numérico em 'peso_kg'.
+"""
+
+import pandas as pd
+
+# Tipos declarados por tabela: coluna -> 'id', 'categoria', 'data', 'booleano' ou 'versao'
+ESQUEMAS = {
+    'usuarios': {
+        'id': 'id',
+        'tipo': 'categoria',
+        'bairro': 'categoria',
+        'status': 'categoria',
+        'data_cadastro': 'data',
+        'ultimo_login': 'data',
+    },
+    'coletas': {
+        'id': 'id',
+        'morador_id': 'id',
+        'catador_id': 'id',
+        'status': 'categoria',
+        'bairro': 'categoria',
+        'data_solicitacao': 'data',
+        'data_coleta': 'data',
+        'data_conclusao': 'data',
+        'data_criacao': 'data',
+        'version': 'versao',
+    },
+    'notificacoes': {
+        'id': 'id',
+        'usuario_id': 'id',
+        'para_usuario_id': 'id',
+        'de_usuario_id': 'id',
+        'referencia_id': 'id',
+        'remetente_id': 'id',
+        'tipo_usuario': 'categoria',
+        'tipo': 'categoria',
+        'remetente_tipo': 'categoria',
+        'data': 'data',
+        'lida': 'booleano',
+    },
+}
+
+# Colunas antigas das coletas e a coluna canônica que as substitui (em ordem de preferência)
+COLUNAS_EQUIVALENTES = {
+    'coletas': {
+        'data_coleta': ['data'],
+        'horario_coleta': ['hora'],
+        'tipos_materiais': ['tipo_material', 'materiais'],
+        'endereco_coleta': ['endereco'],
+    },
+}
+
+# Coluna numérica de peso das coletas e coluna de texto livre ("5kg") incorporada a ela
+COLUNA_PESO = 'peso_kg'
+COLUNA_PESO_TEXTO = 'quantidade_estimada'
+
+# Tipo pandas usado para as colunas de ID
+ID_DTYPE = 'Int32'
+
+# Coluna com a versão de cada linha, incrementada a cada atualização (compare-and-set)
+COLUNA_VERSAO = 'version'
+
+# Formato de texto das datas ao converter registros para tipos nativos
+FORMATO_DATA = '%Y-%m-%d %H:%M:%S'
+
+
+def _converter_datas(serie):
+    """
+    Converte uma coluna de texto para datetime64, aceitando formatos mistos
+    ('2025-06-27' e '2025-06-27 14:00:00' na mesma coluna).
+
+    Args:
+        serie (Series): Coluna a converter
+
+    Returns:
+        Series: Coluna datetime64 (valores inválidos viram NaT)
+    """
+    try:
+        return pd.to_datetime(serie, errors='coerce', format='mixed')
+    except (TypeError, ValueError):
+        # pandas < 2.0 não aceita format='mixed' e já infere por elemento
+        return pd.to_datetime(serie, errors='coerce')
+
+
+def _converter_coluna(serie, tipo):
+    """
+    Converte uma coluna para o tipo declarado no esquema.
+
+    Args:
+        serie (Series): Coluna a converter
+        tipo (str): Tipo declarado ('id', 'categoria', 'data', 'booleano' ou 'versao')
+
+    Returns:
+        Series: Coluna convertida (ou a original, se a conversão não for possível)
+    """
+    if tipo == 'id':
+        if serie.dtype == ID_DTYPE:
+            return serie
+        numeros = pd.to_numeric(serie, errors='coerce')
+        try:
+            return numeros.astype(ID_DTYPE)
+        except (TypeError, ValueError):
+            # IDs fracionários: manter a coluna numérica sem conversão
+            return numeros
+    if tipo == 'categoria':
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return serie
+        return serie.astype('category')
+    if tipo == 'data':
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+        return _converter_datas(serie)
+    if tipo == 'booleano':
+        if serie.dtype == bool:
+            return serie
+        texto = serie.astype(str).str.strip().str.lower()
+        return texto.isin(['true', '1', '1.0'])
+    if tipo == 'versao':
+        if serie.dtype == 'int64':
+            return serie
+        # Linhas gravadas antes da coluna existir começam na versão 0
+        return pd.to_numeric(serie, errors='coerce').fillna(0).astype('int64')
+    return serie
+
+
+def _texto_ou_na(serie):
+    """Trata textos vazios como ausentes, para preencher colunas canônicas."""
+    if serie.dtype == object or isinstance(serie.dtype, pd.CategoricalDtype) or serie.dtype == 'string':
+        return serie.astype(object).where(serie.astype(object).astype(str).str.strip() != '', None)
+    return serie
+
+
+def extrair_peso(serie):
+    """
+    Converte pesos em texto livre ("5kg", "2,5 kg", "3") para número.
+
+    Args:
+        serie (Series): Coluna com os pesos
+
+    Returns:
+        Series: Pesos em kg (float; NaN quando não há número no texto)
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    numero = serie.astype(object).astype(str).str.extract(r'(\d+(?:[.,]\d+)?)', expand=False)
+    return pd.to_numeric(numero.str.replace(',', '.', regex=False), errors='coerce')
+
+
+def normalizar_colunas(df, tabela):
+    """
+    Unifica as colunas equivalentes de uma tabela no conjunto canônico.
+
+    Cada coluna canônica é preenchida com os valores das colunas antigas
+    onde estiver vazia, e as colunas antigas são removidas. Nas coletas, o
+    texto de 'quantidade_estimada' completa o peso numérico de 'peso_kg'.
+    Tabelas já normalizadas são retornadas sem cópia.
+
+    Args:
+        df (DataFrame): DataFrame carregado ou a ser salvo
+        tabela (str): Nome da tabela
+
+    Returns:
+        DataFrame: DataFrame com as colunas canônicas
+    """
+    equivalentes = COLUNAS_EQUIVALENTES.get(tabela, {})
+    antigas = [c for colunas in equivalentes.values() for c in colunas if c in df.columns]
+    peso_texto = tabela == 'coletas' and COLUNA_PESO_TEXTO in df.columns
+    peso_nao_numerico = (
+        tabela == 'coletas' and COLUNA_PESO in df.columns
+        and not pd.api.types.is_float_dtype(df[COLUNA_PESO])
+    )
+    if not antigas and not peso_texto and not peso_nao_numerico:
+        return df
+
+    novas = {}
+    for canonica, colunas in equivalentes.items():
+        presentes = [c for c in colunas if c in df.columns]
+        if not presentes:
+            continue
+        valores = _texto_ou_na(df[canonica]) if canonica in df.columns else pd.Series(None, index=df.index, dtype=object)
+        for coluna in presentes:
+            antiga = _texto_ou_na(df[coluna])
+            if coluna == 'tipo_material':
+                # Formato antigo: "Plástico;Papel"
+                antiga = antiga.str.replace(';', ', ', regex=False)
+            valores = valores.astype(object).fillna(antiga.astype(object))
+        novas[canonica] = valores
+
+    if tabela == 'coletas':
+        peso = extrair_peso(df[COLUNA_PESO]) if COLUNA_PESO in df.columns else pd.Series(float('nan'), index=df.index)
+        if peso_texto:
+            peso = peso.fillna(extrair_peso(df[COLUNA_PESO_TEXTO]))
+        novas[COLUNA_PESO] = peso
+
+    descartar = antigas + ([COLUNA_PESO_TEXTO] if peso_texto else [])
+    return df.drop(columns=descartar).assign(**novas)
+
+
+def aplicar_esquema(df, tabela):
+    """
+    Aplica os tipos declarados de uma tabela às colunas existentes no DataFrame.
+
+    Args:
+        df (DataFrame): DataFrame carregado ou a ser salvo
+        tabela (str): Nome da tabela ('usuarios', 'coletas' ou 'notificacoes')
+
+    Returns:
+        DataFrame: DataFrame com as colunas canônicas e os tipos do esquema
+        (colunas extras inalteradas)
+    """
+    df = normalizar_colunas(df, tabela)
+    esquema = ESQUEMAS.get(tabela, {})
+    convertidas = {}
+    for coluna, tipo in esquema.items():
+        if coluna in df.columns:
+            convertida = _converter_coluna(df[coluna], tipo)
+            if convertida is not df[coluna]:
+                convertidas[coluna] = convertida
+        elif tipo == 'versao':
+            # Tabelas anteriores à coluna de versão: todas as linhas na versão 0
+            convertidas[coluna] = pd.Series(0, index=df.index, dtype='int64')
+    if not convertidas:
+        return df
+    return df.assign(**convertidas)
+
+
+def preparar_valor(df, coluna, valor):
+    """
+    Ajusta um valor para ser atribuído a uma coluna tipada com df.loc.
+
+    Para colunas 'category' o valor é incluído nas categorias; para colunas de
+    data o texto é convertido em Timestamp; para IDs o valor vira inteiro.
+
+    Args:
+        df (DataFrame): DataFrame que será alterado (categorias ajustadas no lugar)
+        coluna (str): Nome da coluna
+        valor: Valor a atribuir
+
+    Returns:
+        Valor compatível com o tipo da coluna
+    """
+    if coluna not in df.columns:
+        return valor
+    dtype = df[coluna].dtype
+    vazio = valor is None or (pd.api.types.is_scalar(valor) and pd.isna(valor))
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        if not vazio and valor not in dtype.categories:
+            df[coluna] = df[coluna].cat.add_categories([valor])
+        return valor
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.NaT if vazio or valor == '' else pd.to_datetime(valor, errors='coerce')
+    if dtype == ID_DTYPE:
+        if vazio or valor == '':
+            return pd.NA
+        try:
+            return int(valor)
+        except (TypeError, ValueError):
+            df[coluna] = df[coluna].astype(object)
+            return valor
+    return valor
+
+
+def normalizar_registro(registro, tabela):
+    """
+    Aplica normalizar_colunas a um único registro (dict) antes de gravá-lo.
+
+    Args:
+        registro (dict): Registro a gravar
+        tabela (str): Nome da tabela
+
+    Returns:
+        dict: O próprio registro, se já estiver no formato canônico, ou uma cópia normalizada
+    """
+    df = pd.DataFrame([registro])
+    normalizado = normalizar_colunas(df, tabela)
+    if normalizado is df:
+        return registro
+    return valores_nativos(normalizado.iloc[0].to_dict())
+
+
+def formatar_data(valor, padrao='Não especificada', formato='%d/%m/%Y'):
+    """
+    Formata uma data (coluna datetime64 ou texto) para exibição nas páginas.
+
+    Args:
+        valor: Timestamp, texto ou valor vazio (None, NaN, NaT)
+        padrao (str, optional): Texto exibido quando não há data. Default é 'Não especificada'.
+        formato (str, optional): Formato do strftime. Default é '%d/%m/%Y'.
+
+    Returns:
+        str: Data formatada, o padrão se não houver data ou o texto original
+        se ele não for uma data reconhecível
+    """
+    if valor is None or valor == '' or (pd.api.types.is_scalar(valor) and pd.isna(valor)):
+        return padrao
+    data = valor if isinstance(valor, pd.Timestamp) else pd.to_datetime(valor, errors='coerce')
+    if pd.isna(data):
+        return str(valor)
+    return data.strftime(formato)
+
+
+def valores_nativos(registro):
+    """
+    Converte os valores de um registro (dict) para tipos nativos do Python,
+    adequados para json e para o estado da sessão.
+
+    Args:
+        registro (dict): Linha do DataFrame convertida com to_dict()
+
+    Returns:
+        dict: Registro com Timestamp como texto, NA/NaT como None e inteiros nativos
+    """
+    convertido = {}
+    for chave, valor in registro.items():
+        if isinstance(valor, pd.Timestamp):
+            valor = None if pd.isna(valor) else valor.strftime(FORMATO_DATA)
+        elif valor is pd.NA or valor is pd.NaT:
+            valor = None
+        elif hasattr(valor, 'item'):
+            valor = valor.item()
+        convertido[chave] = valor
+    return convertido
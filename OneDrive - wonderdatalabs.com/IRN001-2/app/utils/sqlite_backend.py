@@ -0,0 +1,491 @@
+"""
+Backend SQLite do sistema Coleta Seletiva Conectada
+
+Este módulo implementa o armazenamento opcional em SQLite usado por
+app/utils/database.py quando a variável de ambiente COLETA_STORAGE_BACKEND
+vale 'sqlite'. As tabelas espelham os arquivos CSV (usuarios, coletas e
+notificacoes), o banco roda em modo WAL e as colunas usadas em filtros
+são indexadas, de modo que leituras pontuais e atualizações de uma linha
+tocam apenas as linhas envolvidas.
+"""
+
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+# Colunas indexadas por tabela (o id é sempre a chave primária)
+INDICES = {
+    'usuarios': ['email', 'bairro', 'status'],
+    'coletas': ['morador_id', 'catador_id', 'bairro', 'status'],
+    'notificacoes': ['usuario_id', 'para_usuario_id', 'tipo', 'referencia_id'],
+}
+
+# Afinidade de tipo das colunas conhecidas; as demais são TEXT
+TIPOS_COLUNAS = {
+    'morador_id': 'INTEGER',
+    'catador_id': 'INTEGER',
+    'usuario_id': 'INTEGER',
+    'para_usuario_id': 'INTEGER',
+    'de_usuario_id': 'INTEGER',
+    'remetente_id': 'INTEGER',
+    'referencia_id': 'INTEGER',
+    'peso_kg': 'REAL',
+    'avaliacao': 'REAL',
+    'lida': 'INTEGER',
+    'version': 'INTEGER',
+}
+
+# Coluna com a versão de cada linha, incrementada a cada UPDATE (compare-and-set)
+COLUNA_VERSAO = 'version'
+TABELAS_VERSIONADAS = ['coletas']
+
+# Colunas booleanas que o SQLite armazena como 0/1
+COLUNAS_BOOLEANAS = ['lida']
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_db_path = None
+
+
+def configure(db_path):
+    """
+    Define o arquivo do banco SQLite usado pelo backend.
+
+    Args:
+        db_path (str): Caminho do arquivo .db
+    """
+    global _db_path
+    _db_path = db_path
+
+
+def get_connection():
+    """
+    Retorna a conexão SQLite da thread atual, criando-a se necessário.
+
+    Cada thread do Streamlit recebe sua própria conexão; o modo WAL permite
+    leituras concorrentes enquanto outra sessão escreve.
+
+    Returns:
+        sqlite3.Connection: Conexão aberta com o banco
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'path', None) == _db_path:
+        return conn
+
+    if _db_path is None:
+        raise RuntimeError("Backend SQLite não configurado")
+
+    os.makedirs(os.path.dirname(_db_path), exist_ok=True)
+    conn = sqlite3.connect(_db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    _local.conn = conn
+    _local.path = _db_path
+    return conn
+
+
+def database_exists():
+    """
+    Verifica se o arquivo do banco já foi criado.
+
+    Returns:
+        bool: True se o banco existir
+    """
+    return _db_path is not None and os.path.exists(_db_path)
+
+
+def _quote(nome):
+    """Escapa o nome de uma tabela ou coluna para uso em SQL."""
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+def table_exists(tabela):
+    """
+    Verifica se a tabela existe no banco.
+
+    Args:
+        tabela (str): Nome da tabela
+
+    Returns:
+        bool: True se a tabela existir
+    """
+    cur = get_connection().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)
+    )
+    return cur.fetchone() is not None
+
+
+def get_columns(tabela):
+    """
+    Retorna as colunas da tabela na ordem em que foram criadas.
+
+    Args:
+        tabela (str): Nome da tabela
+
+    Returns:
+        list: Lista com os nomes das colunas
+    """
+    cur = get_connection().execute(f"PRAGMA table_info({_quote(tabela)})")
+    return [row[1] for row in cur.fetchall()]
+
+
+def _criar_indices(conn, tabela, colunas):
+    """Cria os índices declarados em INDICES para as colunas existentes."""
+    for coluna in INDICES.get(tabela, []):
+        if coluna in colunas:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{tabela}_{coluna}')} "
+                f"ON {_quote(tabela)} ({_quote(coluna)})"
+            )
+    # Consulta do chat filtra por tipo e referência ao mesmo tempo
+    if tabela == 'notificacoes' and 'tipo' in colunas and 'referencia_id' in colunas:
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_notificacoes_tipo_referencia "
+            "ON notificacoes (tipo, referencia_id)"
+        )
+
+
+def create_table(tabela, colunas):
+    """
+    Cria a tabela com as colunas informadas, se ainda não existir.
+
+    Args:
+        tabela (str): Nome da tabela
+        colunas (list): Colunas da tabela (o id vira a chave primária)
+    """
+    conn = get_connection()
+    with _schema_lock:
+        definicoes = ['"id" INTEGER PRIMARY KEY']
+        for coluna in colunas:
+            if coluna == 'id':
+                continue
+            definicoes.append(f"{_quote(coluna)} {TIPOS_COLUNAS.get(coluna, 'TEXT')}")
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(tabela)} ({', '.join(definicoes)})")
+            _criar_indices(conn, tabela, ['id'] + list(colunas))
+
+
+def _garantir_colunas(tabela, colunas):
+    """Adiciona à tabela as colunas que ainda não existem."""
+    existentes = get_columns(tabela)
+    novas = [c for c in colunas if c not in existentes]
+    if not novas:
+        return
+    conn = get_connection()
+    with _schema_lock, conn:
+        for coluna in novas:
+            conn.execute(
+                f"ALTER TABLE {_quote(tabela)} ADD COLUMN {_quote(coluna)} {TIPOS_COLUNAS.get(coluna, 'TEXT')}"
+            )
+        _criar_indices(conn, tabela, existentes + novas)
+
+
+def _normalizar_valor(valor):
+    """Converte valores do pandas/numpy para tipos aceitos pelo sqlite3."""
+    if valor is None:
+        return None
+    try:
+        if pd.isna(valor):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(valor, 'item'):
+        return valor.item()
+    if isinstance(valor, pd.Timestamp):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    return valor
+
+
+def _ajustar_tipos(df):
+    """Restaura os tipos que o SQLite não preserva (booleanos)."""
+    for coluna in COLUNAS_BOOLEANAS:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].fillna(0).astype(bool)
+    return df
+
+
+def load_table(tabela):
+    """
+    Carrega a tabela inteira como DataFrame.
+
+    Args:
+        tabela (str): Nome da tabela
+
+    Returns:
+        DataFrame: Conteúdo da tabela (vazio se a tabela não existir)
+    """
+    if not table_exists(tabela):
+        return pd.DataFrame()
+    df = pd.read_sql_query(f"SELECT * FROM {_quote(tabela)} ORDER BY id", get_connection())
+    return _ajustar_tipos(df)
+
+
+def select_rows(tabela, filtros=None, order_by=None):
+    """
+    Seleciona as linhas que atendem aos filtros usando os índices.
+
+    Args:
+        tabela (str): Nome da tabela
+        filtros (dict, optional): Coluna -> valor. None gera IS NULL e
+            listas/tuplas geram IN. Default é None (sem filtro).
+        order_by (str, optional): Coluna usada na ordenação crescente
+
+    Returns:
+        DataFrame: Linhas encontradas
+    """
+    if not table_exists(tabela):
+        return pd.DataFrame()
+
+    colunas = get_columns(tabela)
+    condicoes = []
+    parametros = []
+    for coluna, valor in (filtros or {}).items():
+        if coluna not in colunas:
+            # Coluna inexistente nunca casa com nenhum valor
+            return pd.DataFrame(columns=colunas)
+        if valor is None:
+            condicoes.append(f"{_quote(coluna)} IS NULL")
+        elif isinstance(valor, (list, tuple, set)):
+            valores = list(valor)
+            if not valores:
+                return pd.DataFrame(columns=colunas)
+            condicoes.append(f"{_quote(coluna)} IN ({', '.join('?' * len(valores))})")
+            parametros.extend(_normalizar_valor(v) for v in valores)
+        else:
+            condicoes.append(f"{_quote(coluna)} = ?")
+            parametros.append(_normalizar_valor(valor))
+
+    sql = f"SELECT * FROM {_quote(tabela)}"
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+    if order_by and order_by in colunas:
+        sql += f" ORDER BY {_quote(order_by)}"
+
+    df = pd.read_sql_query(sql, get_connection(), params=parametros)
+    return _ajustar_tipos(df)
+
+
+def insert_row(tabela, dados):
+    """
+    Insere uma linha na tabela, criando colunas novas se necessário.
+
+    Args:
+        tabela (str): Nome da tabela
+        dados (dict): Valores da linha. Sem 'id', o SQLite gera um novo.
+
+    Returns:
+        int: ID da linha inserida
+    """
+    if not table_exists(tabela):
+        create_table(tabela, list(dados.keys()))
+    _garantir_colunas(tabela, list(dados.keys()))
+
+    conn = get_connection()
+    with conn:
+        return _executar_insert(conn, tabela, dados)
+
+
+def _executar_insert(conn, tabela, dados):
+    """Executa o INSERT de uma linha sem confirmar a transação."""
+    colunas = list(dados.keys())
+    cur = conn.execute(
+        f"INSERT INTO {_quote(tabela)} ({', '.join(_quote(c) for c in colunas)}) "
+        f"VALUES ({', '.join('?' * len(colunas))})",
+        [_normalizar_valor(dados[c]) for c in colunas]
+    )
+    return cur.lastrowid
+
+
+def update_row(tabela, row_id, dados):
+    """
+    Atualiza uma única linha pelo id.
+
+    Args:
+        tabela (str): Nome da tabela
+        row_id (int): ID da linha
+        dados (dict): Colunas e novos valores (colunas inexistentes são ignoradas)
+
+    Returns:
+        bool: True se a linha existia
+    """
+    if not table_exists(tabela):
+        return False
+    conn = get_connection()
+    with conn:
+        return _executar_update(conn, tabela, row_id, dados)
+
+
+def _executar_update(conn, tabela, row_id, dados, esperados=None):
+    """
+    Executa o UPDATE de uma linha sem confirmar a transação.
+
+    Com esperados ({coluna: valor}, None exige a coluna vazia) a linha só é
+    alterada se tiver esses valores (compare-and-set).
+    """
+    existentes = get_columns(tabela)
+    colunas = [c for c in dados.keys() if c in existentes and c not in ('id', COLUNA_VERSAO)]
+    filtros = ["id = ?"]
+    parametros_filtro = [_normalizar_valor(row_id)]
+    for coluna, valor in (esperados or {}).items():
+        if coluna == COLUNA_VERSAO:
+            # Linhas anteriores à coluna de versão estão na versão 0
+            filtros.append(f"COALESCE({_quote(coluna)}, 0) = ?")
+            parametros_filtro.append(_normalizar_valor(valor))
+        elif _normalizar_valor(valor) is None:
+            filtros.append(f"{_quote(coluna)} IS NULL")
+        else:
+            filtros.append(f"{_quote(coluna)} = ?")
+            parametros_filtro.append(_normalizar_valor(valor))
+    where = " AND ".join(filtros)
+    if not colunas:
+        cur = conn.execute(f"SELECT 1 FROM {_quote(tabela)} WHERE {where}", parametros_filtro)
+        return cur.fetchone() is not None
+    atribuicoes = [f'{_quote(c)} = ?' for c in colunas]
+    if COLUNA_VERSAO in existentes:
+        atribuicoes.append(f"{_quote(COLUNA_VERSAO)} = COALESCE({_quote(COLUNA_VERSAO)}, 0) + 1")
+    cur = conn.execute(
+        f"UPDATE {_quote(tabela)} SET {', '.join(atribuicoes)} WHERE {where}",
+        [_normalizar_valor(dados[c]) for c in colunas] + parametros_filtro
+    )
+    return cur.rowcount > 0
+
+
+def apply_batch(atualizacoes=None, insercoes=None, condicoes=None):
+    """
+    Aplica atualizações e inserções em uma única transação: ou todas são
+    gravadas, ou nenhuma (se algum registro a atualizar não existir ou não
+    atender às condições).
+
+    Args:
+        atualizacoes (dict, optional): Tabela -> {id: {coluna: valor}}
+        insercoes (dict, optional): Tabela -> lista de registros (dict)
+        condicoes (dict, optional): Tabela -> {id: {coluna: valor esperado}}
+
+    Returns:
+        list: IDs (tabela, id) não encontrados ou em conflito; vazio se o lote foi gravado
+    """
+    atualizacoes = atualizacoes or {}
+    insercoes = insercoes or {}
+    condicoes = condicoes or {}
+
+    for tabela in TABELAS_VERSIONADAS:
+        if tabela in atualizacoes and table_exists(tabela):
+            _garantir_colunas(tabela, [COLUNA_VERSAO])
+
+    # Alterações de esquema fora da transação (ALTER/CREATE confirmam sozinhos)
+    for tabela, registros in insercoes.items():
+        for dados in registros:
+            if not table_exists(tabela):
+                create_table(tabela, list(dados.keys()))
+            _garantir_colunas(tabela, list(dados.keys()))
+
+    conn = get_connection()
+    ausentes = []
+    try:
+        with conn:
+            for tabela, linhas in atualizacoes.items():
+                for row_id, dados in linhas.items():
+                    esperados = condicoes.get(tabela, {}).get(row_id)
+                    if not table_exists(tabela) or not _executar_update(conn, tabela, row_id, dados, esperados):
+                        ausentes.append((tabela, row_id))
+            if ausentes:
+                # Desfaz o lote inteiro
+                raise _LoteInvalido()
+            for tabela, registros in insercoes.items():
+                for dados in registros:
+                    _executar_insert(conn, tabela, dados)
+    except _LoteInvalido:
+        pass
+    return ausentes
+
+
+class _LoteInvalido(Exception):
+    """Sinaliza que o lote deve ser desfeito (registro inexistente ou em conflito)."""
+
+
+def delete_row(tabela, row_id):
+    """
+    Remove uma linha pelo id.
+
+    Args:
+        tabela (str): Nome da tabela
+        row_id (int): ID da linha
+
+    Returns:
+        bool: True se a linha existia
+    """
+    if not table_exists(tabela):
+        return False
+    conn = get_connection()
+    with conn:
+        cur = conn.execute(f"DELETE FROM {_quote(tabela)} WHERE id = ?", (_normalizar_valor(row_id),))
+    return cur.rowcount > 0
+
+
+def replace_table(tabela, df):
+    """
+    Substitui todo o conteúdo da tabela pelo DataFrame, preservando índices.
+
+    Args:
+        tabela (str): Nome da tabela
+        df (DataFrame): Novo conteúdo da tabela
+    """
+    if not table_exists(tabela):
+        create_table(tabela, list(df.columns))
+    _garantir_colunas(tabela, list(df.columns))
+
+    colunas = list(df.columns)
+    registros = [
+        [_normalizar_valor(v) for v in linha]
+        for linha in df[colunas].itertuples(index=False, name=None)
+    ]
+    conn = get_connection()
+    with conn:
+        conn.execute(f"DELETE FROM {_quote(tabela)}")
+        if registros:
+            conn.executemany(
+                f"INSERT INTO {_quote(tabela)} ({', '.join(_quote(c) for c in colunas)}) "
+                f"VALUES ({', '.join('?' * len(colunas))})",
+                registros
+            )
+
+
+def import_csv_files(arquivos, substituir=True):
+    """
+    Importa os arquivos CSV existentes para o banco (execução única).
+
+    Args:
+        arquivos (dict): Nome da tabela -> caminho do CSV
+        substituir (bool, optional): Se True, apaga o conteúdo atual das
+            tabelas antes de importar. Default é True.
+
+    Returns:
+        dict: Nome da tabela -> quantidade de linhas importadas
+    """
+    resultado = {}
+    for tabela, caminho in arquivos.items():
+        if not os.path.exists(caminho):
+            continue
+        df = pd.read_csv(caminho)
+        if 'id' not in df.columns:
+            continue
+        create_table(tabela, list(df.columns))
+        if substituir:
+            replace_table(tabela, df)
+        else:
+            _garantir_colunas(tabela, list(df.columns))
+            for registro in df.to_dict('records'):
+                insert_row(tabela, registro)
+        resultado[tabela] = len(df)
+    return resultado
+
+
+if __name__ == "__main__":
+    # Importação manual: python -m app.utils.sqlite_backend
+    from app.utils.database import importar_csv_para_sqlite
+
+    for tabela, linhas in importar_csv_para_sqlite().items():
+        print(f"{tabela}: {linhas} linhas importadas")
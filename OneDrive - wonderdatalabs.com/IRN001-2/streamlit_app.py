@@ -9,7 +9,6 @@ recicláveis e moradores, facilitando o processo de coleta seletiva.
 import streamlit as st
 import os
 import sys
-import base64
 
 # Adiciona o diretório app ao path do Python
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
@@ -20,6 +19,9 @@ from pages.morador import render_morador_page
 from pages.catador import render_catador_page
 from pages.admin import render_admin_page
 from utils.auth import check_authentication, logout, load_session
+# O contexto vem do mesmo módulo importado pelas páginas (app.utils.database)
+from app.utils.database import ContextoDados
+from app.utils.assets import src_imagem
 
 # Configuração da página
 st.set_page_config(
@@ -68,14 +70,9 @@ def main():
             logo_path = os.path.join(os.path.dirname(__file__), "app", "assets", "logo.jpg")
             
             if os.path.exists(logo_path):
-                # Função para converter imagem para base64
-                def get_base64_image(image_path):
-                    with open(image_path, "rb") as img_file:
-                        return base64.b64encode(img_file.read()).decode('utf-8')
-                
-                # Exibe a imagem JPG como base64
+                # Exibe a imagem JPG pela URL publicada (nome com o hash do conteúdo, cache no navegador)
                 st.markdown(f"""<div style="text-align: center; margin-bottom: 1.5rem;">
-                            <img src="data:image/jpeg;base64,{get_base64_image(logo_path)}" 
+                            <img src="{src_imagem(logo_path)}" 
                                  style="max-width: 100px; height: auto; border-radius: 6px; box-shadow: 0 2px 8px rgba(0, 0, 0, 0.08);">
                             </div>""", unsafe_allow_html=True)
             else:
@@ -99,23 +96,34 @@ def main():
             user_name = st.session_state.user_data.get('nome', 'Usuário') if st.session_state.user_data else 'Usuário'
             st.success(f"{icon} Olá, {user_name}!")
         
-        # Renderiza a página de acordo com o tipo de usuário
+        # Falha na gravação das alterações da execução anterior
+        if 'erro_gravacao' in st.session_state:
+            st.error(f"Não foi possível salvar as últimas alterações: {st.session_state.pop('erro_gravacao')}")
+        
+        # Renderiza a página de acordo com o tipo de usuário, com um contexto de dados
+        # por execução: cada tabela é lida uma vez e as alterações são gravadas ao final
+        contexto = ContextoDados()
         try:
-            if st.session_state.user_type == "morador":
-                render_morador_page(st.session_state.user_data)
-            elif st.session_state.user_type == "catador":
-                render_catador_page(st.session_state.user_data)
-            elif st.session_state.user_type == "admin":
-                render_admin_page(st.session_state.user_data)
-            else:
-                st.error("Tipo de usuário não reconhecido!")
-                logout()
-                st.rerun()
+            with contexto:
+                if st.session_state.user_type == "morador":
+                    render_morador_page(st.session_state.user_data, contexto)
+                elif st.session_state.user_type == "catador":
+                    render_catador_page(st.session_state.user_data, contexto)
+                elif st.session_state.user_type == "admin":
+                    render_admin_page(st.session_state.user_data, contexto)
+                else:
+                    st.error("Tipo de usuário não reconhecido!")
+                    logout()
+                    st.rerun()
         except Exception as e:
             st.error(f"Erro ao carregar página: {e}")
             st.info("Tente fazer login novamente.")
             logout()
             st.rerun()
+        finally:
+            # st.rerun() interrompe a execução: o erro é mostrado na próxima
+            if contexto.resultado is not None and not contexto.resultado[0]:
+                st.session_state.erro_gravacao = contexto.resultado[1]
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
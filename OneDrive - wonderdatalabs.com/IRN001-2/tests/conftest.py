@@ -0,0 +1,62 @@
+"""
+Configuração dos testes do armazenamento do sistema Coleta Seletiva Conectada
+
+Cada teste recebe o módulo app.utils.database apontando para uma cópia dos
+dados de exemplo em um diretório temporário, com os caches em memória vazios,
+para que as gravações não alterem app/data.
+"""
+
+import os
+import sys
+import shutil
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from app.utils import database  # noqa: E402
+
+# Arquivos versionados de app/data copiados para cada teste
+ARQUIVOS_DADOS = ['usuarios.csv', 'coletas.csv', 'notificacoes.csv', 'conteudo_educativo.json']
+
+# Caminhos do módulo derivados de DATA_DIR
+CAMINHOS = [
+    'USERS_FILE', 'COLETAS_FILE', 'NOTIFICACOES_FILE', 'CONTEUDO_FILE', 'SQLITE_FILE',
+    'SNAPSHOT_DIR', 'CAIXAS_DIR', 'INDICE_CAIXAS_FILE', 'INDICADORES_FILE',
+    'ARQUIVO_COLETAS_DIR', 'INDICE_ARQUIVO_FILE', 'CHAT_DIR',
+]
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    Módulo de banco de dados usando uma cópia dos dados de exemplo.
+
+    Returns:
+        module: app.utils.database com DATA_DIR em um diretório temporário
+    """
+    dados = tmp_path / 'data'
+    dados.mkdir()
+    for nome in ARQUIVOS_DADOS:
+        shutil.copyfile(os.path.join(database.DATA_DIR, nome), dados / nome)
+
+    original = database.DATA_DIR
+    novo = str(dados)
+    mover = lambda path: novo + path[len(original):]
+    monkeypatch.setattr(database, 'DATA_DIR', novo)
+    for nome in CAMINHOS:
+        monkeypatch.setattr(database, nome, mover(getattr(database, nome)))
+    monkeypatch.setattr(database, 'TABELAS_CSV',
+                        {tabela: mover(path) for tabela, path in database.TABELAS_CSV.items()})
+    monkeypatch.setattr(database, '_TABELA_POR_ARQUIVO',
+                        {mover(path): tabela for path, tabela in database._TABELA_POR_ARQUIVO.items()})
+
+    # Sempre o backend CSV, sem snapshots agendados para depois do teste
+    monkeypatch.setattr(database, 'STORAGE_BACKEND', 'csv')
+    monkeypatch.setattr(database, 'SNAPSHOT_TABELAS', ())
+    for nome in ('_cache_tabelas', '_cache_indices', '_cache_por_versao', '_indices_json_cache'):
+        monkeypatch.setattr(database, nome, {})
+    monkeypatch.setattr(database, '_coletas_abertas', None)
+    return database
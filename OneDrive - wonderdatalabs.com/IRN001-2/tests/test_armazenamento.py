@@ -0,0 +1,82 @@
+"""
+Testes do armazenamento em CSV: edição de linhas no lugar, caixas de entrada
+das notificações (indice.json) e cursor do log do chat.
+"""
+
+import os
+
+
+def _nao_lidas_esperadas(db):
+    """Não lidas por destinatário, calculadas a partir da tabela completa."""
+    notificacoes = db.load_notificacoes()
+    nao_lidas = notificacoes[~notificacoes['lida'].fillna(False).astype(bool)]
+    return nao_lidas.groupby('usuario_id').size().to_dict()
+
+
+def _conferir_caixas(db):
+    """Compara cada caixa de entrada com a tabela completa de notificações."""
+    notificacoes = db.load_notificacoes()
+    esperadas = _nao_lidas_esperadas(db)
+    for usuario_id, grupo in notificacoes.groupby('usuario_id'):
+        usuario_id = int(usuario_id)
+        assert len(db.get_notificacoes_by_usuario(usuario_id)) == len(grupo)
+        assert db.contar_nao_lidas(usuario_id) == esperadas.get(usuario_id, 0)
+
+
+def test_edicao_no_lugar_mantem_arquivo_e_tamanho(db):
+    notificacoes = db.load_notificacoes()
+    notificacao_id = int(notificacoes[~notificacoes['lida'].astype(bool)]['id'].iloc[0])
+    # Os dados de exemplo guardam True/False; regravada, a tabela usa 0/1 de largura fixa
+    db.save_notificacoes(notificacoes)
+    antes = os.stat(db.NOTIFICACOES_FILE)
+
+    sucesso, _ = db.marcar_notificacao_como_lida(notificacao_id)
+
+    depois = os.stat(db.NOTIFICACOES_FILE)
+    assert sucesso
+    assert (depois.st_ino, depois.st_size) == (antes.st_ino, antes.st_size)
+    assert db.ler_registro('notificacoes', notificacao_id)['lida']
+    assert db.load_notificacoes().set_index('id').loc[notificacao_id, 'lida']
+
+
+def test_edicao_que_muda_o_tamanho_regrava_a_tabela(db):
+    sucesso, _ = db.update_coleta(1, {'observacoes': 'um texto bem mais longo do que o original'})
+
+    assert sucesso
+    assert db.ler_registro('coletas', 1)['observacoes'] == 'um texto bem mais longo do que o original'
+    assert db.load_coletas()['id'].is_unique
+
+
+def test_caixas_de_entrada_acompanham_as_escritas(db):
+    _conferir_caixas(db)
+    notificacoes = db.load_notificacoes()
+    nao_lida = int(notificacoes[(notificacoes['usuario_id'] == 1) & ~notificacoes['lida'].astype(bool)]['id'].iloc[0])
+
+    assert db.marcar_notificacao_como_lida(nao_lida)[0]
+    assert db.save_notificacao({'usuario_id': 2, 'tipo_usuario': 'catador', 'titulo': 'nova',
+                                'mensagem': 'nova', 'tipo': 'info', 'lida': False})[0]
+    # Regravação da tabela que troca o destinatário de uma notificação
+    assert db.update_many({'notificacoes': {nao_lida: {'usuario_id': 3, 'lida': False}}})[0]
+
+    _conferir_caixas(db)
+    indice = db._ler_indice_caixas()
+    assert indice['origem'] == db._origem_tabela(db.NOTIFICACOES_FILE)
+
+
+def test_cursor_do_chat_le_so_mensagens_novas_e_completas(db):
+    assert db.save_chat_message(68, 1, 'morador', 2, 'catador', 'primeira')[0]
+    inicial = db.get_chat_messages(68)
+    assert inicial['mensagem'].tolist() == ['primeira']
+
+    assert db.save_chat_message(68, 2, 'catador', 1, 'morador', 'segunda\ncom duas linhas')[0]
+    # Registro pela metade (escrita em andamento): não pode avançar o cursor
+    with open(db._chat_path(68), 'ab') as f:
+        f.write(b'999,68,1,morador,2,catador,"incompleta\n')
+    novas = db.get_chat_messages(68, since=inicial.attrs['cursor'])
+
+    assert novas.attrs['desde'] == inicial.attrs['cursor']
+    assert novas['mensagem'].tolist() == ['segunda\ncom duas linhas']
+    with open(db._chat_path(68), 'ab') as f:
+        f.write(b'continua",2025-01-01 10:00:00\n')
+    restante = db.get_chat_messages(68, since=novas.attrs['cursor'])
+    assert restante['mensagem'].tolist() == ['incompleta\ncontinua']
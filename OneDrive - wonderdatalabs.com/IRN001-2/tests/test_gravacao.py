@@ -0,0 +1,133 @@
+"""
+Testes da gravação agrupada (group commit), do compare-and-set das coletas e
+da reserva de IDs sob escritas concorrentes.
+"""
+
+import threading
+
+from app.utils.schema import COLUNA_VERSAO
+
+# Coleta aberta (sem catador) dos dados de exemplo
+COLETA_ABERTA = 68
+
+
+def _em_paralelo(funcoes):
+    """Executa as funções em threads liberadas juntas e retorna os resultados na ordem."""
+    resultados = [None] * len(funcoes)
+    largada = threading.Barrier(len(funcoes))
+
+    def executar(posicao, funcao):
+        largada.wait()
+        resultados[posicao] = funcao()
+
+    threads = [threading.Thread(target=executar, args=(i, f)) for i, f in enumerate(funcoes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+
+def _notificacao(usuario_id, titulo):
+    return {'usuario_id': usuario_id, 'tipo_usuario': 'morador', 'titulo': titulo,
+            'mensagem': titulo, 'tipo': 'info', 'lida': False}
+
+
+def test_claim_concorrente_tem_um_unico_vencedor(db):
+    versao = int(db.ler_registro('coletas', COLETA_ABERTA).get(COLUNA_VERSAO) or 0)
+    notificacoes_antes = len(db.load_notificacoes())
+    catadores = list(range(100, 130))
+
+    resultados = _em_paralelo([
+        (lambda c=c: db.claim_coleta(COLETA_ABERTA, c, versao, _notificacao(1, f'aceita por {c}')))
+        for c in catadores
+    ])
+
+    vencedores = [c for c, (sucesso, _) in zip(catadores, resultados) if sucesso]
+    assert len(vencedores) == 1
+    coleta = db.ler_registro('coletas', COLETA_ABERTA)
+    assert int(coleta['catador_id']) == vencedores[0]
+    assert coleta['status'] == 'agendada'
+    assert int(coleta[COLUNA_VERSAO]) == versao + 1
+    # Só a notificação do lote vencedor foi gravada
+    assert len(db.load_notificacoes()) == notificacoes_antes + 1
+
+
+def test_claim_com_versao_desatualizada_falha(db):
+    versao = int(db.ler_registro('coletas', COLETA_ABERTA).get(COLUNA_VERSAO) or 0)
+    assert db.update_many({'coletas': {COLETA_ABERTA: {'observacoes': 'alterada'}}})[0]
+
+    sucesso, _ = db.claim_coleta(COLETA_ABERTA, 100, versao)
+
+    assert not sucesso
+    assert db.ler_registro('coletas', COLETA_ABERTA)['catador_id'] is None
+
+
+def test_escritas_concorrentes_nao_repetem_ids(db):
+    coletas_antes = len(db.load_coletas())
+    notificacoes_antes = len(db.load_notificacoes())
+    ids_coletas = list(db.load_coletas()['id'][:20])
+
+    funcoes = []
+    for i in range(20):
+        funcoes.append(lambda i=i: db.save_coleta({
+            'morador_id': 1, 'status': 'pendente', 'bairro': 'Centro', 'observacoes': f'nova {i}'
+        }))
+        funcoes.append(lambda i=i: db.update_many(
+            {'coletas': {ids_coletas[i]: {'observacoes': f'editada {i}'}}},
+            {'notificacoes': [_notificacao(2, f'aviso {i}')]}
+        ))
+    resultados = _em_paralelo(funcoes)
+
+    assert all(sucesso for sucesso, _ in resultados)
+    coletas = db.load_coletas()
+    notificacoes = db.load_notificacoes()
+    assert len(coletas) == coletas_antes + 20
+    assert len(notificacoes) == notificacoes_antes + 20
+    assert coletas['id'].is_unique
+    assert notificacoes['id'].is_unique
+    editadas = coletas.set_index('id').loc[ids_coletas, 'observacoes'].tolist()
+    assert editadas == [f'editada {i}' for i in range(20)]
+
+
+def test_reserva_de_ids_em_paralelo_nao_se_sobrepoe(db):
+    blocos = _em_paralelo([lambda: list(db.reservar_ids('coletas', 5)) for _ in range(20)])
+
+    ids = [novo_id for bloco in blocos for novo_id in bloco]
+    assert len(ids) == len(set(ids)) == 100
+    assert min(ids) > db.load_coletas()['id'].max()
+
+
+def test_lote_invalido_nao_afeta_os_demais_do_grupo(db):
+    resultados = db._gravar_lotes([
+        ({'coletas': {999999: {'observacoes': 'inexistente'}}}, {}, {}),
+        ({'coletas': {1: {'observacoes': 'gravada'}}}, {}, {}),
+    ])
+
+    assert resultados == [[('coletas', 999999)], []]
+    assert db.load_coletas().set_index('id').loc[1, 'observacoes'] == 'gravada'
+
+
+def test_falha_na_escrita_informa_so_os_lotes_afetados(db, monkeypatch):
+    anexar = db._append_row
+
+    def falhar_notificacoes(path, registro):
+        if path == db.NOTIFICACOES_FILE:
+            raise OSError('disco cheio')
+        return anexar(path, registro)
+
+    monkeypatch.setattr(db, '_append_row', falhar_notificacoes)
+    notificacoes_antes = len(db.load_notificacoes())
+
+    resultados = db._gravar_lotes([
+        ({'coletas': {1: {'observacoes': 'lote A'}}}, {}, {}),
+        ({'coletas': {2: {'observacoes': 'lote B'}}}, {'notificacoes': [_notificacao(1, 'lote B')]}, {}),
+    ])
+
+    assert resultados[0] == []
+    assert isinstance(resultados[1], db.GravacaoInterrompida)
+    assert resultados[1].gravadas == ['coletas']
+    assert resultados[1].nao_gravadas == ['notificacoes']
+    coletas = db.load_coletas().set_index('id')
+    assert coletas.loc[[1, 2], 'observacoes'].tolist() == ['lote A', 'lote B']
+    assert len(db.load_notificacoes()) == notificacoes_antes